@@ -1,6 +1,11 @@
 #CNN_predict.py
-import cv2
+import logging
+import os
+import threading
 import numpy as np
+from Pipelines.image_buffer import as_image_buffer
+
+logger = logging.getLogger(__name__)
 
 # Based on our debugging, the correct class order appears to be:
 # Class 0: non_aadhaar, Class 1: aadhaar, Class 2: fake_aadhaar
@@ -12,20 +17,143 @@ PROJECT_LABEL_MAP = {
     "non_aadhaar": "NON_AADHAAR"
 }
 
+CNN_MODEL_PATH = "Models/aadhaar_classifier_final.h5"
+# Written by export_cnn.py
+CNN_TFLITE_PATH = "Models/aadhaar_classifier_final.tflite"
+
+# Defaults; app.py overrides them from the environment via configure_cnn()
+CNN_CONFIG = {
+    "backend": "keras",          # "keras" (.h5) or "tflite"
+    "tflite_path": CNN_TFLITE_PATH,
+    "threads": None,             # TFLite interpreter threads (None = runtime default)
+}
+
+def configure_cnn(**options):
+    unknown = set(options) - set(CNN_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown CNN options: {sorted(unknown)}")
+    CNN_CONFIG.update({k: v for k, v in options.items() if v is not None})
+    if CNN_CONFIG["backend"] not in ("keras", "tflite"):
+        raise ValueError(f"Unknown CNN backend: {CNN_CONFIG['backend']}")
+
+def cnn_model_path():
+    """The model file the configured backend loads."""
+    return CNN_CONFIG["tflite_path"] if CNN_CONFIG["backend"] == "tflite" else CNN_MODEL_PATH
+
+# Default response returned when the CNN fails
+CNN_FALLBACK_RESULT = {
+    "train_label": "aadhaar",
+    "project_label": "REAL_AADHAAR",
+    "confidence": 0.7,
+    "raw_scores": {"aadhaar": 0.7, "fake_aadhaar": 0.2, "non_aadhaar": 0.1}
+}
+
+def fallback_result():
+    """Returns a fresh copy of the default CNN response."""
+    result = dict(CNN_FALLBACK_RESULT)
+    result["raw_scores"] = dict(CNN_FALLBACK_RESULT["raw_scores"])
+    return result
+
+def load_cnn_model(path=None, backend=None):
+    """
+    The CNN for `backend` (default: the configured one). Either kind has
+    predict(batch, verbose=0) -> class scores, so callers do not care.
+    """
+    backend = backend or CNN_CONFIG["backend"]
+    if backend == "tflite":
+        return TFLiteModel(path or CNN_CONFIG["tflite_path"], CNN_CONFIG["threads"])
+    if backend != "keras":
+        raise ValueError(f"Unknown CNN backend: {backend}")
+    # Imported here: TensorFlow alone takes seconds to import
+    import tensorflow as tf
+    return tf.keras.models.load_model(path or CNN_MODEL_PATH)
+
+# -------------------------------------------------
+# TFLite backend
+# -------------------------------------------------
+def _tflite_interpreter_class():
+    # The standalone runtime is a few MB; full TensorFlow works too
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+class TFLiteModel:
+    """
+    A .tflite export of the CNN with the Keras model's predict() contract.
+    Interpreters are not thread-safe: each thread gets its own. Quantized
+    (INT8) inputs and outputs are converted from / to float scores.
+    """
+
+    def __init__(self, path, num_threads=None):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"TFLite model not found: {path} (run export_cnn.py)")
+        self.path = path
+        self.num_threads = num_threads
+        self._interpreter_class = _tflite_interpreter_class()
+        self._local = threading.local()
+        self._state()  # a broken file fails at load time, not on the first request
+
+    def _state(self, batch_size=None):
+        state = getattr(self._local, "state", None)
+        if state is None:
+            interpreter = self._interpreter_class(model_path=self.path, num_threads=self.num_threads)
+            interpreter.allocate_tensors()
+            state = self._local.state = {"interpreter": interpreter}
+            self._refresh(state)
+        if batch_size is not None and state["batch_size"] != batch_size:
+            interpreter = state["interpreter"]
+            shape = list(state["input"]["shape"])
+            shape[0] = batch_size
+            interpreter.resize_tensor_input(state["input"]["index"], shape)
+            interpreter.allocate_tensors()
+            self._refresh(state)
+        return state
+
+    @staticmethod
+    def _refresh(state):
+        interpreter = state["interpreter"]
+        state["input"] = interpreter.get_input_details()[0]
+        state["output"] = interpreter.get_output_details()[0]
+        state["batch_size"] = int(state["input"]["shape"][0])
+
+    def predict(self, batch, verbose=0):
+        batch = np.asarray(batch, dtype=np.float32)
+        state = self._state(batch.shape[0])
+        inp, out, interpreter = state["input"], state["output"], state["interpreter"]
+
+        if inp["dtype"] != np.float32:
+            scale, zero_point = inp["quantization"]
+            info = np.iinfo(inp["dtype"])
+            batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(inp["dtype"])
+        interpreter.set_tensor(inp["index"], batch)
+        interpreter.invoke()
+
+        preds = interpreter.get_tensor(out["index"])
+        if out["dtype"] != np.float32:
+            scale, zero_point = out["quantization"]
+            preds = (preds.astype(np.float32) - zero_point) * scale
+        return preds
+
+def warmup_cnn(model):
+    """Dummy forward pass so graph tracing happens before real traffic."""
+    model.predict(np.zeros((1, 224, 224, 3), dtype=np.float32), verbose=0)
+
 def preprocess_single_image(img_path, target_size=(224, 224)):
     """
     Preprocess image for EfficientNet model
     Model has its own preprocessing layers, so just resize and convert to float32
+    Accepts a path, ndarray or ImageBuffer.
     """
-    img = cv2.imread(img_path)
-    if img is None:
+    try:
+        buf = as_image_buffer(img_path)
+    except ValueError:
         raise ValueError(f"Cannot read image: {img_path}")
     
-    # Convert BGR to RGB
-    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-    
-    # Resize
-    img = cv2.resize(img, target_size)
+    # Resize + convert BGR to RGB (memoized on the buffer)
+    img = buf.resized(target_size, rgb=True)
     
     # Convert to float32 (model has its own normalization layers)
     img = img.astype(np.float32)
@@ -35,45 +163,53 @@ def preprocess_single_image(img_path, target_size=(224, 224)):
     
     return img
 
+def format_prediction(preds, confidence_threshold=0.3):
+    """Turns one row of class scores into the backend result dictionary."""
+    class_index = int(np.argmax(preds))
+    confidence = float(preds[class_index])
+    
+    train_label = TRAIN_CLASS_NAMES[class_index]
+    project_label = PROJECT_LABEL_MAP.get(train_label, "UNKNOWN")
+    
+    # Low-confidence safeguard
+    if confidence < confidence_threshold:
+        project_label = "UNCERTAIN"
+    
+    return {
+        "train_label": train_label,
+        "project_label": project_label,
+        "confidence": round(confidence, 4),
+        "raw_scores": {
+            TRAIN_CLASS_NAMES[i]: round(float(preds[i]), 4)
+            for i in range(len(TRAIN_CLASS_NAMES))
+        }
+    }
+
+def cnn_predict_batch(model, images, confidence_threshold=0.3):
+    """
+    Runs one forward pass over several preprocessed images.
+    Each image is a (1, H, W, 3) array from preprocess_single_image.
+    """
+    batch = np.concatenate(images, axis=0)
+    preds = model.predict(batch, verbose=0)
+    return [format_prediction(p, confidence_threshold) for p in preds]
+
 def cnn_predict(model, image_path, confidence_threshold=0.3):
     """
     Returns a dictionary compatible with backend workflow.
     """
-    print(f"CNN predicting on: {image_path}")
+    logger.debug("CNN predicting on: %s", image_path)
     
     try:
         img = preprocess_single_image(image_path)
         
         preds = model.predict(img, verbose=0)[0]
         
-        print(f"Raw predictions: {preds}")
+        logger.debug("Raw predictions: %s", preds)
         
-        class_index = int(np.argmax(preds))
-        confidence = float(preds[class_index])
-        
-        train_label = TRAIN_CLASS_NAMES[class_index]
-        project_label = PROJECT_LABEL_MAP.get(train_label, "UNKNOWN")
-        
-        # Low-confidence safeguard
-        if confidence < confidence_threshold:
-            project_label = "UNCERTAIN"
-        
-        return {
-            "train_label": train_label,
-            "project_label": project_label,
-            "confidence": round(confidence, 4),
-            "raw_scores": {
-                TRAIN_CLASS_NAMES[i]: round(float(preds[i]), 4)
-                for i in range(len(TRAIN_CLASS_NAMES))
-            }
-        }
+        return format_prediction(preds, confidence_threshold)
         
     except Exception as e:
-        print(f"CNN prediction error: {e}")
+        logger.warning("CNN prediction error: %s", e)
         # Return a default response if CNN fails
-        return {
-            "train_label": "aadhaar",
-            "project_label": "REAL_AADHAAR",
-            "confidence": 0.7,
-            "raw_scores": {"aadhaar": 0.7, "fake_aadhaar": 0.2, "non_aadhaar": 0.1}
-        }
\ No newline at end of file
+        return fallback_result()
@@ -0,0 +1,59 @@
+# FILE: Pipelines/batch_inference.py
+import asyncio
+import logging
+
+from Pipelines.batching import MicroBatcher
+from Pipelines.CNN_predict import cnn_predict_batch, fallback_result, preprocess_single_image
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------------------------
+# CNN batching service
+# -------------------------------------------------
+class CNNBatcher(MicroBatcher):
+    """
+    Micro-batching front-end for cnn_predict.
+    Callers get the same dictionary cnn_predict returns.
+    Pass either a loaded `model` or a `model_loader` callable; the loader
+    is called from the batching thread, so lazy loading never blocks callers.
+    """
+
+    def __init__(self, model=None, confidence_threshold=0.3, max_batch_size=16, max_wait_ms=5.0,
+                 preprocess_executor=None, model_loader=None):
+        self._model = model
+        self.model_loader = model_loader
+        self.confidence_threshold = confidence_threshold
+        # Where apredict runs resize/float conversion (None = default loop executor)
+        self.preprocess_executor = preprocess_executor
+        super().__init__(self._forward, max_batch_size, max_wait_ms, name="cnn-batcher")
+
+    @property
+    def model(self):
+        if self.model_loader is not None:
+            return self.model_loader()
+        return self._model
+
+    def _forward(self, images):
+        return cnn_predict_batch(self.model, images, self.confidence_threshold)
+
+    def submit_image(self, image_path):
+        """Preprocesses in the caller's thread and queues the tensor."""
+        return self.submit(preprocess_single_image(image_path))
+
+    def predict(self, image_path):
+        """Blocking equivalent of cnn_predict."""
+        try:
+            return self.submit_image(image_path).result()
+        except Exception as e:
+            logger.warning("CNN prediction error: %s", e)
+            return fallback_result()
+
+    async def apredict(self, image_path):
+        """Awaitable equivalent of cnn_predict; never blocks the event loop."""
+        try:
+            loop = asyncio.get_running_loop()
+            tensor = await loop.run_in_executor(self.preprocess_executor, preprocess_single_image, image_path)
+            return await asyncio.wrap_future(self.submit(tensor))
+        except Exception as e:
+            logger.warning("CNN prediction error: %s", e)
+            return fallback_result()
@@ -0,0 +1,140 @@
+# FILE: Pipelines/batching.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from Pipelines.telemetry import QUEUE_WAIT_SECONDS
+
+# -------------------------------------------------
+# Generic micro-batcher
+# -------------------------------------------------
+class MicroBatcher:
+    """
+    Collects items submitted from many callers into batches and runs
+    `process_batch(items) -> results` on a single background thread.
+
+    A batch is closed when it reaches `max_batch_size` items or when
+    `max_wait_ms` has passed since its first item arrived. With
+    `workers` > 1, that many threads form and process batches in parallel.
+    """
+
+    def __init__(self, process_batch, max_batch_size=16, max_wait_ms=5.0, name="batcher", workers=1):
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+        self.workers = max(1, int(workers))
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._closed = False
+
+        self._batches = 0
+        self._items = 0
+        self._errors = 0
+        self._batch_size_hist = {}
+        self._queue_depth_hist = {}
+        self._max_queue_depth = 0
+
+    # Worker threads are started on first use so that the batcher can be
+    # created before a fork and still work inside each child process.
+    def _ensure_started(self):
+        if len(self._threads) == self.workers and all(t.is_alive() for t in self._threads):
+            return
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.workers:
+                suffix = f"-{len(self._threads)}" if self.workers > 1 else ""
+                thread = threading.Thread(target=self._run, name=self.name + suffix, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, item):
+        """Queues one item and returns a Future for its result."""
+        if self._closed:
+            raise RuntimeError(f"{self.name} is closed")
+        fut = Future()
+        self._ensure_started()
+        self._queue.put((item, fut, time.perf_counter()))
+        return fut
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                # Put the shutdown marker back so the loop exits after this batch
+                self._queue.put(None)
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+
+            # Drop callers that gave up while waiting in the queue
+            started = time.perf_counter()
+            batch = [(item, fut, queued) for item, fut, queued in batch if fut.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            for _, _, queued in batch:
+                QUEUE_WAIT_SECONDS.observe(started - queued, queue=self.name)
+
+            depth = self._queue.qsize()
+            self._record(len(batch), depth)
+
+            try:
+                results = self.process_batch([item for item, _, _ in batch])
+            except Exception as e:
+                with self._lock:
+                    self._errors += 1
+                for _, fut, _ in batch:
+                    fut.set_exception(e)
+                continue
+
+            for (_, fut, _), res in zip(batch, results):
+                fut.set_result(res)
+
+    def _record(self, size, depth):
+        with self._lock:
+            self._batches += 1
+            self._items += size
+            self._batch_size_hist[size] = self._batch_size_hist.get(size, 0) + 1
+            self._queue_depth_hist[depth] = self._queue_depth_hist.get(depth, 0) + 1
+            self._max_queue_depth = max(self._max_queue_depth, depth)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_queue_depth,
+                "batches": self._batches,
+                "items": self._items,
+                "errors": self._errors,
+                "mean_batch_size": round(self._items / self._batches, 3) if self._batches else 0.0,
+                "batch_size_histogram": dict(sorted(self._batch_size_hist.items())),
+                "queue_depth_histogram": dict(sorted(self._queue_depth_hist.items())),
+            }
+
+    def close(self):
+        self._closed = True
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
@@ -0,0 +1,270 @@
+# FILE: Pipelines/bulk_scoring.py
+import asyncio
+import contextvars
+import io
+import json
+import logging
+import os
+import time
+import uuid
+import zipfile
+from collections import OrderedDict
+
+from Pipelines.image_buffer import ImageBuffer, ImageDecodeError
+from Pipelines.CNN_predict import cnn_predict_batch, fallback_result, preprocess_single_image
+from Pipelines.ocr_extractor import run_ocr
+from Pipelines.extract_Aadhaar import extract_fields_detailed
+from Pipelines.rule_validator import rule_validation
+from Pipelines.qr_validator import validate_qr
+from Pipelines.consistency_checker import build_consistency
+from Pipelines.forensic_analyzer import analyze_image_forensics
+from Pipelines.fraud_assement import assess_fraud
+from Pipelines.model_json import predict_fraud_batch
+from Pipelines.final_decision import make_final_decision
+from Pipelines.verification import preprocess_buffer, build_ml_record, verification_response
+from Pipelines.telemetry import stage_span
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff")
+
+def is_image_name(name):
+    base = os.path.basename(name)
+    return not base.startswith(".") and base.lower().endswith(IMAGE_EXTENSIONS)
+
+# -------------------------------------------------
+# Inputs
+# -------------------------------------------------
+def iter_zip_images(data, max_files=1000, max_bytes=512 * 1024 * 1024):
+    """Yields (name, bytes) for every image in a zip archive."""
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        members = [m for m in archive.infolist() if not m.is_dir() and is_image_name(m.filename)]
+        if len(members) > max_files:
+            raise ValueError(f"Archive holds {len(members)} images (limit {max_files})")
+        if sum(m.file_size for m in members) > max_bytes:
+            raise ValueError("Archive is too large once extracted")
+        for member in sorted(members, key=lambda m: m.filename):
+            yield member.filename, archive.read(member)
+
+def walk_images(root):
+    """Sorted relative paths of every image below `root`."""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in filenames:
+            if is_image_name(name):
+                found.append(os.path.relpath(os.path.join(dirpath, name), root))
+    return sorted(found)
+
+# -------------------------------------------------
+# Batched scoring
+# -------------------------------------------------
+def analyze_image(data):
+    """
+    The per-image stages that need no shared model: decode, preprocess,
+    OCR, QR, forensics and the CNN input tensor.
+    """
+    with stage_span("decode"):
+        raw_image = ImageBuffer.from_bytes(data)
+    with stage_span("preprocess"):
+        image = preprocess_buffer(raw_image)
+    stages = {"tensor": preprocess_single_image(image)}
+    for name, output, func, arg in (("ocr", "ocr_result", run_ocr, image), ("qr", "qr_result", validate_qr, image),
+                                    ("forensics", "forensics", analyze_image_forensics, raw_image)):
+        with stage_span(name):
+            stages[output] = func(arg)
+    return stages
+
+def cnn_infer_direct(model, batch_size=32, threshold=0.3):
+    """`cnn_infer` running cnn_predict_batch in slices of `batch_size`."""
+    def infer(tensors):
+        results = []
+        for i in range(0, len(tensors), batch_size):
+            chunk = tensors[i:i + batch_size]
+            try:
+                results.extend(cnn_predict_batch(model, chunk, threshold))
+            except Exception as e:
+                logger.warning("CNN prediction error: %s", e)
+                results.extend(fallback_result() for _ in chunk)
+        return results
+    return infer
+
+def cnn_infer_batcher(batcher):
+    """`cnn_infer` that queues every tensor on a CNNBatcher at once."""
+    def infer(tensors):
+        futures = [batcher.submit(t) for t in tensors]
+        results = []
+        for fut in futures:
+            try:
+                results.append(fut.result())
+            except Exception as e:
+                logger.warning("CNN prediction error: %s", e)
+                results.append(fallback_result())
+        return results
+    return infer
+
+def score_batch(items, cnn_infer, fraud_model, executor):
+    """
+    Verifies a list of (name, image bytes) and returns one result dict per
+    item, in order. OCR/QR/forensics run in parallel on `executor`, the CNN
+    sees all tensors in one call and the RandomForest scores every record
+    with a single predict_proba.
+
+    Must not itself run on `executor` (it waits on work submitted there).
+    """
+    # Each image's stage spans nest under the caller's span
+    futures = [executor.submit(contextvars.copy_context().run, analyze_image, data) for _, data in items]
+
+    results = [None] * len(items)
+    analyzed = []
+    for i, ((name, _), fut) in enumerate(zip(items, futures)):
+        try:
+            analyzed.append((i, fut.result()))
+        except ImageDecodeError:
+            results[i] = {"file": name, "error": "Could not read the image."}
+        except Exception as e:
+            results[i] = {"file": name, "error": str(e)}
+
+    if not analyzed:
+        return results
+
+    with stage_span("cnn_batch"):
+        cnn_outs = cnn_infer([stages.pop("tensor") for _, stages in analyzed])
+
+    records, fraud_rules, values_list = [], [], []
+    for (i, stages), cnn_out in zip(analyzed, cnn_outs):
+        aadhaar_fields, field_confidence = extract_fields_detailed(stages["ocr_result"])
+        qr_result = stages["qr_result"]
+        validation = rule_validation(aadhaar_fields, qr_result["status"])
+        consistency = build_consistency(aadhaar_fields, qr_result)
+        fraud_rules.append(assess_fraud(validation, qr_result, consistency, stages["forensics"]))
+        records.append(build_ml_record(validation, consistency, stages["forensics"], aadhaar_fields, qr_result))
+        values_list.append({"cnn_out": cnn_out, "aadhaar_fields": aadhaar_fields, "field_confidence": field_confidence,
+                            "qr_result": qr_result})
+
+    with stage_span("predict_fraud_batch"):
+        fraud_mls = predict_fraud_batch(fraud_model, records)
+
+    for (i, _), values, fraud_ml, fraud_rule in zip(analyzed, values_list, fraud_mls, fraud_rules):
+        values["fraud_ml"] = fraud_ml
+        values["final_decision"] = make_final_decision(values["cnn_out"], fraud_ml, fraud_rule)
+        results[i] = {"file": items[i][0], **verification_response(values)}
+
+    return results
+
+# -------------------------------------------------
+# Background jobs (/api/verify-batch)
+# -------------------------------------------------
+class BatchJob:
+    """Results of one batch upload, appended as chunks finish."""
+
+    def __init__(self, job_id, total):
+        self.job_id = job_id
+        self.total = total
+        self.results = []
+        self.done = False
+        self.error = None
+        self.started = time.monotonic()
+        self.finished = None
+        self._changed = asyncio.Event()
+
+    def add(self, results):
+        self.results.extend(results)
+        self._notify()
+
+    def finish(self, error=None):
+        self.error = error
+        self.done = True
+        self.finished = time.monotonic()
+        self._notify()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def summary(self):
+        elapsed = (self.finished or time.monotonic()) - self.started
+        summary = {
+            "job_id": self.job_id,
+            "done": self.done,
+            "total": self.total,
+            "completed": len(self.results),
+            "elapsed_s": round(elapsed, 3),
+            "images_per_sec": round(len(self.results) / elapsed, 3) if elapsed > 0 else 0.0,
+        }
+        if self.error:
+            summary["error"] = self.error
+        return summary
+
+    async def stream(self):
+        """Yields every result (then the summary) as NDJSON lines."""
+        sent = 0
+        while True:
+            changed = self._changed
+            while sent < len(self.results):
+                yield json.dumps(self.results[sent]) + "\n"
+                sent += 1
+            if self.done:
+                yield json.dumps({"summary": self.summary()}) + "\n"
+                return
+            await changed.wait()
+
+
+class BatchJobStore:
+    """
+    In-memory jobs of this process; the oldest finished jobs are dropped.
+    At most `max_active` jobs may be running or queued (uploads still being
+    read count too, through reserve()).
+    """
+
+    def __init__(self, max_jobs=32, max_active=4):
+        self.max_jobs = max_jobs
+        self.max_active = max_active
+        self._jobs = OrderedDict()
+        self._reserved = 0
+        self.rejected = 0
+
+    def active(self):
+        return self._reserved + sum(1 for job in self._jobs.values() if not job.done)
+
+    def reserve(self):
+        """Takes a slot for an upload; False (and counted) when all are taken."""
+        if self.active() >= self.max_active:
+            self.rejected += 1
+            return False
+        self._reserved += 1
+        return True
+
+    def release(self):
+        self._reserved -= 1
+
+    def retry_after(self):
+        """Rough estimate (seconds) of when the oldest unfinished job ends."""
+        job = next((j for j in self._jobs.values() if not j.done), None)
+        if job is None:
+            return 1
+        completed = len(job.results)
+        if not completed:
+            return 30
+        elapsed = time.monotonic() - job.started
+        return max(1, int(round((job.total - completed) * elapsed / completed)))
+
+    def create(self, total):
+        job = BatchJob(uuid.uuid4().hex, total)
+        self._jobs[job.job_id] = job
+        for job_id in [j for j, old in self._jobs.items() if old.done]:
+            if len(self._jobs) <= self.max_jobs:
+                break
+            del self._jobs[job_id]
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def stats(self):
+        return {
+            "jobs": len(self._jobs),
+            "running": sum(1 for job in self._jobs.values() if not job.done),
+            "max_active": self.max_active,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,185 @@
+# FILE: Pipelines/cascade.py
+import threading
+import time
+
+from Pipelines.final_decision import make_final_decision
+from Pipelines.verification import REPORT_OUTPUTS, run_verification
+
+# Rough per-stage cost (ms) used until real timings have been observed
+DEFAULT_STAGE_COSTS = {
+    "decode": 5.0, "preprocess": 30.0, "cnn_quick": 40.0, "cnn": 80.0,
+    "ocr": 800.0, "qr": 40.0, "forensics": 60.0,
+}
+DEFAULT_COST = 1.0
+
+# Each step is a group of outputs computed together (concurrently)
+DEFAULT_STEPS = (
+    ("cnn_out",),
+    ("aadhaar_fields", "qr_result", "forensics"),
+)
+
+# -------------------------------------------------
+# Decision rules
+# -------------------------------------------------
+class DecisionRule:
+    """
+    `decide(values)` is called once every output in `requires` is known and
+    returns the final decision dict when the verdict can no longer change,
+    else None. `exact` rules always agree with the full pipeline.
+    """
+
+    def __init__(self, name, requires, decide, exact=True):
+        self.name = name
+        self.requires = tuple(requires)
+        self.decide = decide
+        self.exact = exact
+
+    def __repr__(self):
+        return f"DecisionRule({self.name!r}, requires={self.requires})"
+
+
+def non_aadhaar_rule():
+    """make_final_decision rejects NON_AADHAAR whatever the other stages say."""
+    def decide(values):
+        if values["cnn_out"].get("project_label") == "NON_AADHAAR":
+            return make_final_decision(values["cnn_out"], None)
+        return None
+    return DecisionRule("non_aadhaar", ["cnn_out"], decide)
+
+def quick_non_aadhaar_rule(min_confidence=0.9):
+    """
+    Rejects on the CNN run over the raw (not preprocessed) upload when it is
+    confident the document is not an Aadhaar card. Approximate: check it in
+    shadow mode before relying on it.
+    """
+    def decide(values):
+        quick = values["cnn_quick_out"]
+        if quick.get("project_label") == "NON_AADHAAR" and quick.get("confidence", 0.0) >= min_confidence:
+            return make_final_decision(quick, None)
+        return None
+    return DecisionRule("quick_non_aadhaar", ["cnn_quick_out"], decide, exact=False)
+
+# -------------------------------------------------
+# Planner
+# -------------------------------------------------
+class CascadePlanner:
+    """
+    Runs the verification graph step by step, cheapest remaining step
+    first, and evaluates the decision rules after each step. Stops as soon
+    as a rule decides; the stages that were not needed are reported.
+
+    Step costs are the summed cost of the stages still to run, from
+    observed stage durations (moving average) or DEFAULT_STAGE_COSTS.
+
+    In shadow mode the remaining stages run anyway, the full pipeline's
+    result is returned, and the cascade's verdict is compared with it.
+    """
+
+    def __init__(self, graph, steps=DEFAULT_STEPS, rules=None, targets=REPORT_OUTPUTS,
+                 shadow=False, stage_costs=None):
+        self.graph = graph
+        self.targets = tuple(targets)
+        self.steps = [tuple(step) for step in steps]
+        self.rules = list(rules) if rules is not None else [non_aadhaar_rule()]
+        self.shadow = shadow
+        self.costs = dict(DEFAULT_STAGE_COSTS)
+        self.costs.update(stage_costs or {})
+        self._lock = threading.Lock()
+        self._runs = 0
+        self._early_stops = {}
+        self._skipped = {}
+        self._shadow_runs = 0
+        self._disagreements = 0
+        self._last_disagreement = None
+
+    def step_cost(self, step, values):
+        return sum(self.costs.get(s.name, DEFAULT_COST) for s in self.graph.required_stages(step, values))
+
+    def _observe(self, timings):
+        with self._lock:
+            for name, timing in timings.items():
+                previous = self.costs.get(name)
+                duration = timing["duration_ms"]
+                self.costs[name] = duration if previous is None else 0.8 * previous + 0.2 * duration
+
+    def _decide(self, values, tried):
+        for rule in self.rules:
+            if rule.name in tried or not all(r in values for r in rule.requires):
+                continue
+            tried.add(rule.name)
+            decision = rule.decide(values)
+            if decision is not None:
+                return rule, decision
+        return None, None
+
+    async def _run_step(self, step, values, executor, cache, timings, hits, t0):
+        offset = (time.perf_counter() - t0) * 1000
+        values, step_timings, step_hits = await run_verification(self.graph, values, executor, cache, targets=step)
+        self._observe(step_timings)
+        for name, timing in step_timings.items():
+            timings[name] = {
+                "start_ms": round(timing["start_ms"] + offset, 2),
+                "end_ms": round(timing["end_ms"] + offset, 2),
+                "duration_ms": timing["duration_ms"],
+            }
+        hits.extend(h for h in step_hits if h not in hits)
+        return values
+
+    async def run(self, values, executor=None, cache=None):
+        """
+        Returns (values, timings, cache_hits, report). When a rule stopped
+        the cascade, values["final_decision"] is the rule's decision and the
+        outputs of skipped stages are absent.
+        """
+        values = dict(values)
+        timings, hits, tried = {}, [], set()
+        t0 = time.perf_counter()
+        remaining = [step for step in self.steps] + [self.targets]
+        rule, decision = self._decide(values, tried)
+
+        while remaining and decision is None:
+            step = min(remaining, key=lambda s: self.step_cost(s, values))
+            remaining.remove(step)
+            values = await self._run_step(step, values, executor, cache, timings, hits, t0)
+            rule, decision = self._decide(values, tried)
+
+        report = {"executed_stages": sorted(timings), "skipped_stages": [], "stopped_by": None}
+        if decision is not None and "final_decision" not in values:
+            skipped = [s.name for s in self.graph.required_stages(self.targets, values)]
+            report.update(skipped_stages=skipped, stopped_by=rule.name)
+            with self._lock:
+                self._early_stops[rule.name] = self._early_stops.get(rule.name, 0) + 1
+                for name in skipped:
+                    self._skipped[name] = self._skipped.get(name, 0) + 1
+
+            if self.shadow:
+                values = await self._run_step(self.targets, values, executor, cache, timings, hits, t0)
+                agrees = values["final_decision"].get("final_decision") == decision.get("final_decision")
+                report["shadow"] = {"cascade_decision": decision, "agrees": agrees}
+                with self._lock:
+                    self._shadow_runs += 1
+                    if not agrees:
+                        self._disagreements += 1
+                        self._last_disagreement = {"rule": rule.name, "cascade": decision,
+                                                   "full": values["final_decision"]}
+            else:
+                values["final_decision"] = decision
+
+        with self._lock:
+            self._runs += 1
+        return values, timings, hits, report
+
+    def stats(self):
+        with self._lock:
+            return {
+                "shadow": self.shadow,
+                "steps": [list(step) for step in self.steps],
+                "rules": [rule.name for rule in self.rules],
+                "runs": self._runs,
+                "early_stops": dict(self._early_stops),
+                "skipped_stages": dict(self._skipped),
+                "shadow_runs": self._shadow_runs,
+                "disagreements": self._disagreements,
+                "last_disagreement": self._last_disagreement,
+                "stage_costs_ms": {name: round(cost, 2) for name, cost in sorted(self.costs.items())},
+            }
@@ -0,0 +1,168 @@
+# FILE: Pipelines/compiled_forest.py
+import numpy as np
+
+# -------------------------------------------------
+# RandomForest flattened into NumPy arrays
+# -------------------------------------------------
+class CompiledForest:
+    """
+    A fitted scikit-learn RandomForestClassifier (single output) as flat
+    arrays: every tree's nodes back to back, children[node] = (left,
+    right) as global node indices. Leaves point to themselves with an
+    infinite threshold, so a traversal step needs no leaf test.
+
+    predict_proba gives the same bits as the forest's predict_proba:
+    float32 features compared to float64 thresholds, per-tree leaf
+    probabilities normalized as DecisionTreeClassifier does, summed tree
+    by tree in the original order and divided by the number of trees.
+    Trees trained with missing-value support are not handled (the
+    pipeline never produces NaN features).
+    """
+
+    def __init__(self, feature, threshold, children, leaf_proba, roots, max_depth, classes, n_features,
+                 feature_names=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.leaf_proba = leaf_proba
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.classes_ = classes
+        self.n_classes_ = len(classes)
+        self.n_features_in_ = int(n_features)
+        if feature_names is not None:
+            self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        if getattr(model, "n_outputs_", 1) != 1:
+            raise ValueError("Only single-output forests can be compiled")
+        n_classes = int(model.n_classes_)
+        feature, threshold, children, leaf_proba, roots = [], [], [], [], []
+        offset, max_depth = 0, 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            is_leaf = tree.children_left == -1
+            nodes = np.arange(offset, offset + n)
+
+            feature.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+            threshold.append(np.where(is_leaf, np.inf, tree.threshold).astype(np.float64))
+            children.append(np.stack([np.where(is_leaf, nodes, tree.children_left + offset),
+                                      np.where(is_leaf, nodes, tree.children_right + offset)], axis=1).astype(np.int32))
+
+            # DecisionTreeClassifier.predict_proba's normalization, per node
+            proba = tree.value[:, 0, :n_classes].astype(np.float64)
+            normalizer = proba.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            leaf_proba.append(proba / normalizer)
+
+            roots.append(offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n
+        return cls(
+            np.concatenate(feature), np.concatenate(threshold), np.concatenate(children),
+            np.concatenate(leaf_proba), np.array(roots, dtype=np.int32), max_depth, np.asarray(model.classes_),
+            model.n_features_in_, getattr(model, "feature_names_in_", None),
+        )
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    def apply(self, X):
+        """
+        Leaf (global node index) of every row in every tree, as
+        (n_rows, n_trees). All (row, tree) pairs step down together, one
+        tree level per step; pairs that reached a leaf drop out.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        flat_x = X.ravel()
+        children = self.children.ravel()
+        node = np.tile(self.roots, n_rows)
+        row_offset = np.repeat(np.arange(n_rows, dtype=np.int64) * n_features, self.n_trees)
+        active = np.arange(node.size)
+        for _ in range(self.max_depth):
+            current = node[active]
+            # x <= threshold goes left, as in sklearn; the float32 value is
+            # compared in float64
+            go_right = flat_x[row_offset[active] + self.feature[current]] > self.threshold[current]
+            nxt = children[2 * current + go_right]
+            node[active] = nxt
+            active = active[nxt != current]
+            if not active.size:
+                break
+        return node.reshape(n_rows, self.n_trees)
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        # cumsum adds tree after tree, like the forest's accumulation (a
+        # plain sum may add pairwise and round differently)
+        proba = np.cumsum(self.leaf_proba[leaves], axis=1)[:, -1]
+        proba /= self.n_trees
+        return proba
+
+    # -------------------------------------------------
+    # .npz storage
+    # -------------------------------------------------
+    def save(self, path):
+        arrays = {
+            "feature": self.feature, "threshold": self.threshold, "children": self.children,
+            "leaf_proba": self.leaf_proba, "roots": self.roots, "max_depth": np.array(self.max_depth),
+            "classes": self.classes_, "n_features": np.array(self.n_features_in_),
+        }
+        if hasattr(self, "feature_names_in_"):
+            arrays["feature_names"] = np.asarray(self.feature_names_in_, dtype=str)
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["feature"], data["threshold"], data["children"], data["leaf_proba"], data["roots"],
+                data["max_depth"], data["classes"], data["n_features"],
+                data["feature_names"].tolist() if "feature_names" in data.files else None,
+            )
+
+
+def parity_sample(forest, n_rows=1000, seed=0, scale=None):
+    """
+    Rows for checking a compiled forest against the original: random
+    values, and the same rows with one feature set exactly to a split
+    threshold (as float32) so ties at thresholds are exercised.
+    `scale` is the per-feature range of the random values (default: the
+    largest threshold of each feature).
+    """
+    rng = np.random.default_rng(seed)
+    n_features = forest.n_features_in_
+    split = np.isfinite(forest.threshold)
+    features, thresholds = forest.feature[split], forest.threshold[split]
+    if scale is None:
+        scale = np.ones(n_features)
+        np.maximum.at(scale, features, np.abs(thresholds))
+    X = (rng.random((n_rows, n_features)) * 1.2 * scale).astype(np.float32)
+    ties = X.copy()
+    pick = rng.integers(0, len(thresholds), n_rows)
+    ties[np.arange(n_rows), features[pick]] = thresholds[pick].astype(np.float32)
+    return np.vstack([X, ties])
+
+def reference_proba(model, X):
+    """
+    The fitted forest's own predict_proba on X (columns in the model's
+    order), named like the frame it was trained on; what a compiled forest
+    must reproduce. Runs single-job: with n_jobs > 1 scikit-learn adds the
+    trees in completion order, which can change the last bits.
+    """
+    import copy
+    import pandas as pd
+    if getattr(model, "n_jobs", None) not in (None, 1):
+        model = copy.copy(model)
+        model.n_jobs = 1
+    names = getattr(model, "feature_names_in_", None)
+    return model.predict_proba(pd.DataFrame(X, columns=list(names)) if names is not None else X)
@@ -1,5 +1,8 @@
+import logging
 import re
 
+logger = logging.getLogger(__name__)
+
 def normalize(text):
     """Removes spaces, special chars, and makes lowercase for fair comparison."""
     if not text:
@@ -7,9 +10,7 @@ def normalize(text):
     return re.sub(r'[^a-zA-Z0-9]', '', str(text)).lower()
 
 def build_consistency(ocr_extracted, qr):
-    print("\n" + "="*40)
-    print("      STARTING CONSISTENCY CHECK      ")
-    print("="*40)
+    logger.debug("Starting consistency check")
     
     qr_status = qr.get("status", "UNKNOWN")
     qr_data = qr.get("decoded_data", {})
@@ -45,7 +46,7 @@ def build_consistency(ocr_extracted, qr):
     
     if ocr_gen and qr_gen:
         if str(ocr_gen).lower()[0] != str(qr_gen).lower()[0]:
-             print(f"WARNING: Gender mismatch detected ({ocr_gen} vs {qr_gen}) but IGNORED.")
+             logger.info("Gender mismatch detected (%s vs %s) but ignored.", ocr_gen, qr_gen)
              # We deliberately do NOT add this to 'mismatches' list.
 
     # FINAL VERDICT
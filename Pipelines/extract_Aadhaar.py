@@ -1,130 +1,223 @@
 import re
+from bisect import bisect_right
 from datetime import datetime
 
+# Compiled once at import; every helper below reuses them
+NON_ASCII = re.compile(r"[^\x00-\x7F]+")
+STUCK_WORDS = re.compile(r"([a-z])([A-Z])")
+ANY_DIGIT = re.compile(r"\d")
+# Universally matches DD/MM/YYYY with / - . or whitespace separators
+FULL_DATE = re.compile(r"(\d{2})[\s\/\.-]+(\d{2})[\s\/\.-]+(\d{4})")
+# Year only: 19xx or 20xx
+YEAR_ONLY = re.compile(r"\b(19\d{2}|20\d{2})\b")
+AADHAAR_NUMBER = re.compile(r"\b\d{4}\s?\d{4}\s?\d{4}\b")
+FEMALE = re.compile(r"\b(female|fem)\b")
+MALE = re.compile(r"\b(male)\b")
+NAME_STOPWORDS = ("INDIA", "GOV", "DOB", "MALE", "FEMALE", "AADHAAR", "VID")
+NAME_STOPWORD = re.compile("|".join(NAME_STOPWORDS))
+
+FIELDS = ("name", "dob", "gender", "aadhaar_number")
+
 # 1. CLEAN TEXT HELPER
 def clean_text(t):
     """Removes non-ASCII characters and trims spaces."""
-    return re.sub(r"[^\x00-\x7F]+", "", str(t)).strip()
+    return NON_ASCII.sub("", str(t)).strip()
 
 def split_stuck_name(name):
     """Splits stuck words like 'RamjeetSingh' -> 'Ramjeet Singh'"""
-    return re.sub(r"([a-z])([A-Z])", r"\1 \2", name)
+    return STUCK_WORDS.sub(r"\1 \2", name)
 
 # 2. DOB EXTRACTION (Universal Logic)
+def _full_dates(text):
+    """(datetime, 'DD/MM/YYYY') for every plausible full date in one line."""
+    found = []
+    for d_str, m_str, y_str in FULL_DATE.findall(text):
+        try:
+            d, m, y = int(d_str), int(m_str), int(y_str)
+            # Validation: Year between 1900-2025, Month 1-12, Day 1-31
+            if 1900 < y < 2025 and 1 <= m <= 12 and 1 <= d <= 31:
+                found.append((datetime(y, m, d), f"{d:02d}/{m:02d}/{y}"))
+        except ValueError:
+            continue
+    return found
+
+def _birth_years(text):
+    return [y for y in YEAR_ONLY.findall(text) if 1900 < int(y) < 2025]
+
 def find_dob_oldest(entries):
+    """
+    The oldest full date in any entry; if there is none, the oldest
+    birth year.
+    """
     full_dates = []
     year_dates = []
-
-    # NEW REGEX: Universally matches DD/MM/YYYY
-    # Allows separators: / (slash), - (dash), . (dot), or whitespace
-    # Captures: Group 1 (Day), Group 2 (Month), Group 3 (Year)
-    universal_date_pattern = r"(\d{2})[\s\/\.-]+(\d{2})[\s\/\.-]+(\d{4})"
-    
-    # Regex for Year Only: Matches 19xx or 20xx
-    year_pattern = r"\b(19\d{2}|20\d{2})\b"
-
     for e in entries:
-        text = e["text"]
-        
-        # --- A. Search for FULL DATES (Priority) ---
-        matches = re.findall(universal_date_pattern, text)
-        for d_str, m_str, y_str in matches:
-            try:
-                d, m, y = int(d_str), int(m_str), int(y_str)
-                
-                # Validation: Year between 1900-2025, Month 1-12, Day 1-31
-                if 1900 < y < 2025 and 1 <= m <= 12 and 1 <= d <= 31:
-                    dt_obj = datetime(y, m, d)
-                    # Standardize format to DD/MM/YYYY for display
-                    formatted_date = f"{d:02d}/{m:02d}/{y}"
-                    full_dates.append((dt_obj, formatted_date))
-            except: 
-                continue
-
-        # --- B. Search for YEAR ONLY (Fallback) ---
-        # Only add to list if it looks like a birth year
-        y_matches = re.findall(year_pattern, text)
-        for y_str in y_matches:
-            y_int = int(y_str)
-            if 1900 < y_int < 2025:
-                year_dates.append(y_str)
+        full_dates.extend(_full_dates(e["text"]))
+        year_dates.extend(_birth_years(e["text"]))
 
-    # --- FINAL DECISION LOGIC ---
-
-    # 1. If any FULL DATE was found, ignore years. Pick the OLDEST full date.
     if full_dates:
-        # Sort by datetime object (oldest first)
-        full_dates.sort(key=lambda x: x[0]) 
-        return full_dates[0][1] # Return the string "01/09/1981"
-
-    # 2. If NO full date found, pick the OLDEST Year.
+        return min(full_dates, key=lambda x: x[0])[1]
     if year_dates:
-        # Sort numerically
-        year_dates.sort(key=int)
-        return year_dates[0] # Return the string "1981"
-
+        return min(year_dates, key=int)
     return None
 
 # 3. NAME EXTRACTION
+def _name_candidate(t):
+    """The cleaned line if it can be a name, else None."""
+    t = t.strip() if type(t) is str and t.isascii() else clean_text(t)
+    if len(t) < 3 or ANY_DIGIT.search(t): return None
+    if NAME_STOPWORD.search(t.upper()): return None
+    if len(t.split()) < 2: return None
+    return split_stuck_name(t)
+
 def extract_name(text_list):
-    candidates = []
-    for t in text_list:
-        t = clean_text(t)
-        if len(t) < 3 or re.search(r"\d", t): continue
-        if any(bad in t.upper() for bad in ["INDIA", "GOV", "DOB", "MALE", "FEMALE", "AADHAAR", "VID"]): continue
-        
-        words = t.split()
-        if len(words) < 2: continue
-        t = split_stuck_name(t)
-        candidates.append(t)
+    candidates = [c for c in map(_name_candidate, text_list) if c]
     return max(candidates, key=len) if candidates else None
 
 # 4. GENDER EXTRACTION
 def extract_gender(full_text_str):
     text_lower = full_text_str.lower()
-    
     # Check Female FIRST
-    if re.search(r'\b(female|fem)\b', text_lower):
+    if FEMALE.search(text_lower):
         return "Female"
-    
     # THEN Check Male
-    elif re.search(r'\b(male)\b', text_lower):
+    elif MALE.search(text_lower):
         return "Male"
-        
     return None
 
-# 5. MAIN FUNCTION
-def extract_fields(ocr_json):
+# 5. SINGLE-PASS EXTRACTOR
+def _ocr_lines(ocr_json):
+    """
+    Flattens rec_texts (per-page lists, bare strings or (text, score)
+    tuples) into (text, score, box); score and box are None when unknown.
+    """
     raw_texts = ocr_json.get("rec_texts", [])
-    entries = []
-    flat_texts = []
-    
-    for item in raw_texts:
-        txt = ""
-        if isinstance(item, list):
-            for sub in item:
-                if isinstance(sub, tuple): txt = sub[0]
-                elif isinstance(sub, str): txt = sub
-                flat_texts.append(txt)
-                entries.append({"text": txt})
-        elif isinstance(item, str):
-            txt = item
-            flat_texts.append(txt)
-            entries.append({"text": txt})
-
-    full_text_str = " ".join(flat_texts)
+    raw_scores = ocr_json.get("rec_scores", [])
+    raw_boxes = ocr_json.get("rec_boxes", [])
 
-    # Call the updated DOB logic
-    dob = find_dob_oldest(entries)
-    
-    aadhaar = None
-    m = re.search(r"\b\d{4}\s?\d{4}\s?\d{4}\b", full_text_str)
-    if m: aadhaar = m.group().replace(" ", "")
+    def at(seq, i):
+        try:
+            return seq[i]
+        except (IndexError, KeyError, TypeError):
+            return None
 
-    gender = extract_gender(full_text_str)
-
-    name = extract_name(flat_texts)
+    lines = []
+    for i, item in enumerate(raw_texts):
+        if isinstance(item, list):
+            page_scores, page_boxes = at(raw_scores, i), at(raw_boxes, i)
+            if (all(type(sub) is str for sub in item) and page_scores is not None and page_boxes is not None
+                    and len(page_scores) == len(item) == len(page_boxes)):
+                # The shape run_ocr returns
+                lines.extend(zip(item, page_scores, page_boxes))
+                continue
+            txt, score = "", None
+            for j, sub in enumerate(item):
+                # A sub-item of another type repeats the previous line's text
+                if isinstance(sub, tuple):
+                    txt = sub[0]
+                    score = sub[1] if len(sub) > 1 else at(page_scores, j)
+                elif isinstance(sub, str):
+                    txt = sub
+                    score = at(page_scores, j)
+                lines.append((txt, score, at(page_boxes, j)))
+        elif isinstance(item, str):
+            lines.append((item, at(raw_scores, i), at(raw_boxes, i)))
+    return lines
+
+def _source(score, box):
+    try:
+        confidence = round(float(score), 4)
+    except (TypeError, ValueError):
+        confidence = None
+    try:
+        box = [float(v) for v in box]
+    except (TypeError, ValueError):
+        box = None
+    return {"confidence": confidence, "box": box}
+
+def _scan(lines, with_sources):
+    texts = [line[0] for line in lines]
+    has_digit = ANY_DIGIT.search
+
+    best_date = best_year = best_name = None
+    best_name_len = 0
+    for idx, text in enumerate(texts):
+        if has_digit(text):
+            for dt, formatted in _full_dates(text):
+                if best_date is None or dt < best_date[0]:
+                    best_date = (dt, formatted, idx)
+            if best_date is None:
+                for y in _birth_years(text):
+                    if best_year is None or int(y) < int(best_year[0]):
+                        best_year = (y, idx)
+            # ASCII digits survive clean_text, so such a line is never a name
+            if text.isascii():
+                continue
+        candidate = _name_candidate(text)
+        if candidate and len(candidate) > best_name_len:
+            best_name, best_name_len = (candidate, idx), len(candidate)
 
-    return {
-        "name": name, "dob": dob, "gender": gender, "aadhaar_number": aadhaar
-    }
\ No newline at end of file
+    full_text_str = " ".join(texts)
+    text_lower = full_text_str.lower()
+    gender = None
+    m_gender = FEMALE.search(text_lower)
+    if m_gender:
+        gender = "Female"
+    else:
+        m_gender = MALE.search(text_lower)
+        if m_gender:
+            gender = "Male"
+    m_number = AADHAAR_NUMBER.search(full_text_str)
+
+    fields = {
+        "name": best_name[0] if best_name else None,
+        "dob": best_date[1] if best_date else best_year[0] if best_year else None,
+        "gender": gender,
+        "aadhaar_number": m_number.group().replace(" ", "") if m_number else None,
+    }
+    if not with_sources:
+        return fields, None
+
+    def source(idx):
+        return _source(lines[idx][1], lines[idx][2])
+
+    sources = dict.fromkeys(FIELDS)
+    if best_name:
+        sources["name"] = source(best_name[1])
+    if best_date or best_year:
+        sources["dob"] = source((best_date or best_year)[-1])
+
+    offsets, pos = [], 0
+    for text in texts:
+        offsets.append(pos)
+        pos += len(text) + 1
+    if m_gender:
+        # lower() lengthens a few characters; positions only map back when it did not
+        if len(text_lower) == len(full_text_str):
+            sources["gender"] = source(bisect_right(offsets, m_gender.start()) - 1)
+        else:
+            sources["gender"] = _source(None, None)
+    if m_number:
+        # The number may span lines: lowest score of those lines, no box
+        first = bisect_right(offsets, m_number.start()) - 1
+        last = bisect_right(offsets, m_number.end() - 1) - 1
+        if first == last:
+            sources["aadhaar_number"] = source(first)
+        else:
+            scores = [lines[k][1] for k in range(first, last + 1)]
+            sources["aadhaar_number"] = _source(None if None in scores else min(scores), None)
+    return fields, sources
+
+def extract_fields_detailed(ocr_json):
+    """
+    One pass over the OCR lines, then one search of the joined text for
+    the gender and the number. Returns (fields, sources): the four fields
+    exactly as extract_fields gives them, and per field the recognition
+    score ("confidence") and box of the line it was read from (None when
+    the field was not found).
+    """
+    return _scan(_ocr_lines(ocr_json), with_sources=True)
+
+# 6. MAIN FUNCTION
+def extract_fields(ocr_json):
+    return _scan(_ocr_lines(ocr_json), with_sources=False)[0]
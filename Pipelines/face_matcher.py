@@ -1,76 +1,230 @@
 import cv2
+import logging
 import numpy as np
 import os
+import threading
+from collections import OrderedDict
+from Pipelines.image_buffer import as_image_buffer
+
+logger = logging.getLogger(__name__)
+
+FACE_SIZE = (200, 200)
+DETECT_WIDTH = 480       # faces are first searched on a copy this wide
+MATCH_THRESHOLD = 70     # LBPH (chi-square) distance below which faces match
+
+CASCADE_PATH = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
 
 # -------------------------------------------------
-# Load Haar Cascade
+# Per-thread detector and recognizer
 # -------------------------------------------------
-face_cascade = cv2.CascadeClassifier(
-    cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
-)
+# Neither object may be used by two threads at once; each thread loads
+# its own copy once and reuses it.
+_local = threading.local()
+
+def get_face_cascade():
+    cascade = getattr(_local, "cascade", None)
+    if cascade is None:
+        cascade = _local.cascade = cv2.CascadeClassifier(CASCADE_PATH)
+    return cascade
+
+def _get_recognizer():
+    recognizer = getattr(_local, "recognizer", None)
+    if recognizer is None:
+        recognizer = _local.recognizer = cv2.face.LBPHFaceRecognizer_create()
+    return recognizer
 
 # -------------------------------------------------
 # Face Detection
 # -------------------------------------------------
-def detect_face(img):
-    """Detects first face and returns resized grayscale face"""
+def _detect(gray, min_size=(0, 0)):
+    faces = get_face_cascade().detectMultiScale(gray, scaleFactor=1.3, minNeighbors=5, minSize=min_size)
+    return faces[0] if len(faces) else None
+
+def detect_face_box(gray, detect_width=DETECT_WIDTH):
+    """
+    (x, y, w, h) of the first face in a grayscale image, or None. The face
+    is searched on a downscaled copy, then its box is refined by a second
+    detection in the matching (padded) region at full resolution. Faces
+    too small to survive the downscale (the cascade's window is 24 px) are
+    searched at full resolution.
+    """
+    h, w = gray.shape[:2]
+    scale = min(1.0, detect_width / float(max(h, w)))
+    if scale == 1.0:
+        return _detect(gray)
+    small = cv2.resize(gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    coarse = _detect(small)
+    if coarse is None:
+        return _detect(gray)
+    x, y, fw, fh = (v / scale for v in coarse)
+    pad = 0.25 * max(fw, fh)
+    x0, y0 = int(max(0, x - pad)), int(max(0, y - pad))
+    x1, y1 = int(min(w, x + fw + pad)), int(min(h, y + fh + pad))
+    fine = _detect(gray[y0:y1, x0:x1], min_size=(int(fw * 0.6), int(fh * 0.6)))
+    if fine is not None:
+        return (fine[0] + x0, fine[1] + y0, fine[2], fine[3])
+    return (int(x), int(y), int(fw), int(fh))
+
+def detect_face(img, detect_width=DETECT_WIDTH):
+    """Detects the first face and returns it as a 200x200 grayscale crop."""
     if img is None: return None
-    
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    faces = face_cascade.detectMultiScale(
-        gray,
-        scaleFactor=1.3,
-        minNeighbors=5
-    )
-
-    if len(faces) == 0:
+
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    box = detect_face_box(gray, detect_width)
+    if box is None:
         return None
+    x, y, fw, fh = box
+    face = gray[y:y+fh, x:x+fw]
+    return cv2.resize(face, FACE_SIZE)
+
+def face_histogram(face):
+    """The LBPH histogram of a 200x200 face (what LBPHFaceRecognizer stores)."""
+    recognizer = _get_recognizer()
+    recognizer.train([face], np.array([0]))
+    return recognizer.getHistograms()[0]
 
-    x, y, w, h = faces[0]
-    face = gray[y:y+h, x:x+w]
-    return cv2.resize(face, (200, 200))
+def face_distance(hist1, hist2):
+    """LBPHFaceRecognizer.predict's distance between two histograms."""
+    return cv2.compareHist(hist1, hist2, cv2.HISTCMP_CHISQR_ALT)
 
 # -------------------------------------------------
-# Face Comparison (Aadhaar vs Person)
+# Card-face cache
 # -------------------------------------------------
-def verify_face(aadhaar_image_path, person_image_path):
-    if not os.path.exists(aadhaar_image_path) or not os.path.exists(person_image_path):
-        return {"status": "IMAGE_READ_FAILED", "match": False, "confidence": 0}
+class CardFaceCache:
+    """
+    LBPH histograms of card faces by card id (LRU). A card without a
+    detectable face is cached too, so retries fail fast.
+    """
 
-    img1 = cv2.imread(aadhaar_image_path)
-    img2 = cv2.imread(person_image_path)
+    NO_FACE = "FACE_NOT_FOUND"
 
-    if img1 is None or img2 is None:
-        return {"status": "IMAGE_READ_FAILED", "match": False, "confidence": 0}
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
 
-    face1 = detect_face(img1)
-    face2 = detect_face(img2)
+    def get(self, card_id):
+        with self._lock:
+            if card_id in self._entries:
+                self._entries.move_to_end(card_id)
+                self._hits += 1
+                return self._entries[card_id]
+            self._misses += 1
+            return None
 
-    if face1 is None:
-        return {"status": "FACE_NOT_FOUND_IN_AADHAAR", "match": False, "confidence": 0}
+    def put(self, card_id, hist):
+        with self._lock:
+            self._entries[card_id] = hist
+            self._entries.move_to_end(card_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self._hits, "misses": self._misses}
 
-    if face2 is None:
-        return {"status": "FACE_NOT_FOUND_IN_PERSON_IMAGE", "match": False, "confidence": 0}
 
-    # LBPH recognizer
+card_faces = CardFaceCache()
+
+def card_face(card, card_id=None, cache=None):
+    """
+    Histogram of the face on a card image, or CardFaceCache.NO_FACE.
+    With a card id, the result is looked up in / stored to `cache`.
+    Returns None when the image cannot be read.
+    """
+    cache = card_faces if cache is None else cache
+    if card_id is not None:
+        hist = cache.get(card_id)
+        if hist is not None:
+            return hist
+
+    img = _read(card)
+    if img is None:
+        return None
+    face = detect_face(img)
+    hist = face_histogram(face) if face is not None else CardFaceCache.NO_FACE
+    if card_id is not None:
+        cache.put(card_id, hist)
+    return hist
+
+def file_card_id(path):
+    """Card id of a saved upload: changes when the file is replaced."""
     try:
-        recognizer = cv2.face.LBPHFaceRecognizer_create()
-        
-        recognizer.train([face1], np.array([0]))
+        st = os.stat(path)
+    except OSError:
+        return None
+    return f"file:{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}"
 
-        label, confidence = recognizer.predict(face2)
+# -------------------------------------------------
+# Face Comparison (Aadhaar vs Person)
+# -------------------------------------------------
+def _read(src):
+    if isinstance(src, str) and not os.path.exists(src):
+        return None
+    try:
+        return as_image_buffer(src).bgr
+    except ValueError:
+        return None
 
-        # LBPH Confidence
-        ui_score = max(0, min(100, 100 - confidence))
-        is_match = confidence < 70 
+def _result(distance):
+    # LBPH Confidence
+    ui_score = max(0, min(100, 100 - distance))
+    return {
+        "status": "SUCCESS",
+        "confidence": round(ui_score, 2), # Converted to % for UI
+        "match": bool(distance < MATCH_THRESHOLD),
+    }
 
-        return {
-            "status": "SUCCESS",
-            "confidence": round(ui_score, 2), # Converted to % for UI
-            "match": is_match
-        }
+def match_faces(person_image, candidates):
+    """
+    Scores one selfie against several card faces at once: the selfie is
+    detected and encoded once. `candidates` holds histograms (from
+    card_face) or CardFaceCache.NO_FACE / None. Returns one verify_face
+    style result per candidate.
+    """
+    img = _read(person_image)
+    if img is None:
+        return [{"status": "IMAGE_READ_FAILED", "match": False, "confidence": 0} for _ in candidates]
+
+    try:
+        face = detect_face(img)
+        if face is None:
+            return [{"status": "FACE_NOT_FOUND_IN_PERSON_IMAGE", "match": False, "confidence": 0} for _ in candidates]
+        hist = face_histogram(face)
+    except AttributeError:
+        return [{"status": "ERROR_OPENCV_CONTRIB_MISSING", "match": False, "confidence": 0} for _ in candidates]
+    except Exception as e:
+        logger.warning("Face error: %s", e)
+        return [{"status": "ALGORITHM_ERROR", "match": False, "confidence": 0} for _ in candidates]
+
+    results = []
+    for candidate in candidates:
+        if candidate is None:
+            results.append({"status": "IMAGE_READ_FAILED", "match": False, "confidence": 0})
+        elif isinstance(candidate, str):
+            results.append({"status": "FACE_NOT_FOUND_IN_AADHAAR", "match": False, "confidence": 0})
+        else:
+            results.append(_result(face_distance(candidate, hist)))
+    return results
+
+def verify_face(aadhaar_image_path, person_image_path, card_id=None):
+    """
+    Both images may be paths, ndarrays or ImageBuffers. With a `card_id`
+    the card's face histogram is computed once and reused on retries.
+    """
+    try:
+        card_hist = card_face(aadhaar_image_path, card_id)
     except AttributeError:
         return {"status": "ERROR_OPENCV_CONTRIB_MISSING", "match": False, "confidence": 0}
     except Exception as e:
-        print(f"Face Error: {e}")
-        return {"status": "ALGORITHM_ERROR", "match": False, "confidence": 0}
\ No newline at end of file
+        logger.warning("Face error: %s", e)
+        return {"status": "ALGORITHM_ERROR", "match": False, "confidence": 0}
+
+    person = _read(person_image_path)
+    if card_hist is None or person is None:
+        return {"status": "IMAGE_READ_FAILED", "match": False, "confidence": 0}
+    if isinstance(card_hist, str):
+        return {"status": "FACE_NOT_FOUND_IN_AADHAAR", "match": False, "confidence": 0}
+    return match_faces(person, [card_hist])[0]
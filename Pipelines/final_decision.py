@@ -5,17 +5,11 @@ def make_final_decision(cnn_out, fraud_ml_out, fraud_rule_out=None):
     """
 
     cnn_label = cnn_out["project_label"]        # REAL_AADHAAR / FAKE_AADHAAR / NON_AADHAAR
-    ml_label = fraud_ml_out["prediction"]       # REAL / FAKE
-    ml_prob  = fraud_ml_out["fraud_probability"]
-
-    # Optional rule-based decision (from fraud_assessment)
-    rule_decision = None
-    if fraud_rule_out:
-        rule_decision = fraud_rule_out.get("decision")
 
     # ---------------------------
     # HARD REJECTION
     # ---------------------------
+    # Needs only the CNN, so callers may stop early and pass fraud_ml_out=None
     if cnn_label == "NON_AADHAAR":
         return {
             "final_decision": "REJECTED",
@@ -23,6 +17,14 @@ def make_final_decision(cnn_out, fraud_ml_out, fraud_rule_out=None):
             "confidence": cnn_out["confidence"]
         }
 
+    ml_label = fraud_ml_out["prediction"]       # REAL / FAKE
+    ml_prob  = fraud_ml_out["fraud_probability"]
+
+    # Optional rule-based decision (from fraud_assessment)
+    rule_decision = None
+    if fraud_rule_out:
+        rule_decision = fraud_rule_out.get("decision")
+
     # ---------------------------
     # CONFIRMED FRAUD
     # ---------------------------
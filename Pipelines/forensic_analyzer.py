@@ -1,68 +1,204 @@
 #forensic_analyzer
 import cv2
 import numpy as np
-from PIL import Image
-import io
+from collections import OrderedDict
+from Pipelines.image_buffer import as_image_buffer
 
 # -------------------------------------------------
-# Sharpness (Laplacian Variance)
+# Configuration
 # -------------------------------------------------
-def compute_sharpness(img):
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
-
+# Defaults; app.py overrides them from the environment via configure_forensics()
+FORENSICS_CONFIG = {
+    "ela_quality": 90,
+    "ela_max_side": 0,           # ELA on a copy at most this large; 0 = full resolution
+    "block_size": 32,            # cell size of the block-wise ELA / JPEG ghost maps
+    "ghost_qualities": (60, 70, 80, 90),
+    "extra_features": (),        # registered features reported besides the defaults
+}
+
+def configure_forensics(**options):
+    unknown = set(options) - set(FORENSICS_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown forensics options: {sorted(unknown)}")
+    FORENSICS_CONFIG.update({k: v for k, v in options.items() if v is not None})
+    missing = set(FORENSICS_CONFIG["extra_features"]) - set(FEATURES)
+    if missing:
+        raise ValueError(f"Unknown forensic features: {sorted(missing)}")
+
+def forensics_version():
+    """Tag for cached results: changes when the settings change the output."""
+    extras = "+".join(FORENSICS_CONFIG["extra_features"]) or "-"
+    return f"forensics=ela{FORENSICS_CONFIG['ela_max_side']}/{extras}"
 
 # -------------------------------------------------
-# Edge Density
+# Shared intermediates
 # -------------------------------------------------
-def compute_edge_density(img):
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    edges = cv2.Canny(gray, 50, 150)
-    return float(np.mean(edges > 0))
+class ForensicContext:
+    """
+    One image under analysis. Intermediates (grayscale, the ELA
+    difference, block maps, ...) are computed on first use and shared by
+    every feature that needs them.
+    """
 
+    def __init__(self, image, config=None):
+        self.image = as_image_buffer(image)
+        self.config = config or FORENSICS_CONFIG
+        self._cache = {}
+
+    def get(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    @property
+    def bgr(self):
+        return self.image.bgr
+
+    @property
+    def gray(self):
+        # The ImageBuffer's view: shared with the other stages of the request
+        return self.image.gray
+
+    @property
+    def ela_source(self):
+        """The image ELA runs on: the original, or a copy bounded to ela_max_side."""
+        def compute():
+            bgr = self.bgr
+            max_side = self.config["ela_max_side"]
+            h, w = bgr.shape[:2]
+            if not max_side or max(h, w) <= max_side:
+                return bgr
+            scale = max_side / float(max(h, w))
+            return cv2.resize(bgr, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        return self.get("ela_source", compute)
+
+    @property
+    def ela_diff(self):
+        """|image - JPEG(image)| per pixel and channel (uint8)."""
+        def compute():
+            src = self.ela_source
+            return cv2.absdiff(src, jpeg_roundtrip(src, self.config["ela_quality"]))
+        return self.get("ela_diff", compute)
+
+    @property
+    def ela_map(self):
+        """Mean ELA difference per block_size x block_size cell (float32 grid)."""
+        return self.get("ela_map", lambda: block_means(self.ela_diff, self.config["block_size"]))
+
+
+def jpeg_roundtrip(img, quality):
+    """The image after an in-memory JPEG encode / decode at `quality`."""
+    ok, encoded = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+    return cv2.imdecode(encoded, cv2.IMREAD_UNCHANGED)
+
+def block_means(img, block):
+    """Per-cell mean over all channels; partial cells at the edges are dropped."""
+    h, w = img.shape[:2]
+    rows, cols = max(1, h // block), max(1, w // block)
+    cropped = img[:rows * block, :cols * block]
+    if cropped.ndim == 3:
+        cropped = cv2.transform(cropped.astype(np.float32), np.full((1, cropped.shape[2]), 1.0 / cropped.shape[2]))
+    # INTER_AREA with an integer factor is exactly the block mean
+    return cv2.resize(np.asarray(cropped, np.float32), (cols, rows), interpolation=cv2.INTER_AREA)
 
 # -------------------------------------------------
-# Noise Level (simple std deviation)
+# Feature registry
 # -------------------------------------------------
-def compute_noise_level(img):
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    return float(np.std(gray))
+# name -> function(ForensicContext) -> float. A feature only pays for the
+# intermediates it uses; the rest are never computed.
+FEATURES = OrderedDict()
+DEFAULT_FEATURES = ("ela_score", "edge_density", "sharpness")
+
+def forensic_feature(name):
+    def register(fn):
+        if name in FEATURES:
+            raise ValueError(f"Forensic feature already registered: {name}")
+        FEATURES[name] = fn
+        return fn
+    return register
 
+# Sharpness (Laplacian Variance)
+@forensic_feature("sharpness")
+def _sharpness(ctx):
+    return float(cv2.Laplacian(ctx.gray, cv2.CV_64F).var())
 
-# -------------------------------------------------
-# Error Level Analysis (ELA)
-# -------------------------------------------------
-def compute_ela_score(img, quality=90):
-    """
-    Computes mean absolute difference after JPEG recompression
-    """
-    # Convert OpenCV image → PIL
-    pil_img = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
-
-    # Save recompressed image to memory
-    buffer = io.BytesIO()
-    pil_img.save(buffer, format="JPEG", quality=quality)
-    buffer.seek(0)
+# Edge Density
+@forensic_feature("edge_density")
+def _edge_density(ctx):
+    return cv2.countNonZero(cv2.Canny(ctx.gray, 50, 150)) / float(ctx.gray.size)
 
-    recompressed = Image.open(buffer)
+# Noise Level (simple std deviation)
+@forensic_feature("noise_level")
+def _noise_level(ctx):
+    return float(np.std(ctx.gray))
+
+# Error Level Analysis (ELA): mean absolute difference after JPEG recompression
+@forensic_feature("ela_score")
+def _ela_score(ctx):
+    return float(np.mean(ctx.ela_diff))
+
+# Block-wise ELA: edited areas recompress differently from the rest
+@forensic_feature("ela_block_max")
+def _ela_block_max(ctx):
+    return float(ctx.ela_map.max())
+
+@forensic_feature("ela_block_std")
+def _ela_block_std(ctx):
+    return float(ctx.ela_map.std())
+
+# Noise residual: what a 3x3 median filter removes. Pasted regions often
+# carry noise of a different strength than the rest of the card.
+@forensic_feature("noise_residual_var")
+def _noise_residual_var(ctx):
+    gray = ctx.gray
+    residual = cv2.subtract(gray.astype(np.int16), cv2.medianBlur(gray, 3).astype(np.int16))
+    return float(residual.var())
+
+# JPEG ghost: each block is recompressed at several qualities; a block that
+# fits a different quality best than most of the image was probably saved
+# separately. Reported as the fraction of such blocks.
+@forensic_feature("jpeg_ghost")
+def _jpeg_ghost(ctx):
+    gray = ctx.get("ela_gray", lambda: cv2.cvtColor(ctx.ela_source, cv2.COLOR_BGR2GRAY))
+    block = ctx.config["block_size"]
+    errors = np.stack([
+        block_means(cv2.absdiff(gray, jpeg_roundtrip(gray, q)), block) for q in ctx.config["ghost_qualities"]
+    ])
+    best = errors.argmin(axis=0)
+    dominant = np.bincount(best.ravel()).argmax()
+    return float(np.mean(best != dominant))
 
-    # Convert back to OpenCV
-    recompressed = cv2.cvtColor(
-        np.array(recompressed), cv2.COLOR_RGB2BGR
-    )
+# -------------------------------------------------
+# Kept for callers of the per-feature helpers
+# -------------------------------------------------
+def compute_sharpness(img):
+    return _sharpness(ForensicContext(img))
 
-    # Compute absolute difference
-    diff = cv2.absdiff(img, recompressed)
+def compute_edge_density(img):
+    return _edge_density(ForensicContext(img))
 
-    return float(np.mean(diff))
+def compute_noise_level(img):
+    return _noise_level(ForensicContext(img))
 
+def compute_ela_score(img, quality=90):
+    return _ela_score(ForensicContext(img, dict(FORENSICS_CONFIG, ela_quality=quality)))
 
 # -------------------------------------------------
 # MASTER FUNCTION
 # -------------------------------------------------
-def analyze_image_forensics(image_path):
-    img = cv2.imread(image_path)
-    if img is None:
+def compute_features(image, features=None):
+    """Raw values of the named features (default: DEFAULT_FEATURES + extra_features)."""
+    ctx = ForensicContext(image)
+    names = features or DEFAULT_FEATURES + tuple(FORENSICS_CONFIG["extra_features"])
+    return {name: FEATURES[name](ctx) for name in names}
+
+def analyze_image_forensics(image_path, features=None):
+    """Accepts a path, ndarray or ImageBuffer."""
+    try:
+        values = compute_features(image_path, features)
+    except ValueError:
         return {
             "sharpness": 0.0,
             "edge_density": 0.0,
@@ -71,21 +207,15 @@ def analyze_image_forensics(image_path):
             "tampering_suspected": False
         }
 
-    sharpness = compute_sharpness(img)
-    edge_density = compute_edge_density(img)
-    noise_level = compute_noise_level(img)
-    ela_score = compute_ela_score(img)
+    sharpness = values.get("sharpness", 0.0)
+    ela_score = values.get("ela_score", 0.0)
 
     # -----------------------------
     # Light heuristic (NOT label)
     # -----------------------------
-    tampering_suspected = (
-        sharpness < 60 or
-        ela_score > 25
-    )
     tampering_reasons = []
 
-    if sharpness < 60:
+    if "sharpness" in values and sharpness < 60:
         tampering_reasons.append("Low sharpness")
 
     if ela_score > 0.25:
@@ -93,10 +223,22 @@ def analyze_image_forensics(image_path):
 
     tampering_suspected = len(tampering_reasons) > 0
 
-    return {
+    result = {
         "ela_score": round(ela_score, 4),
-        "edge_density": round(edge_density, 4),
+        "edge_density": round(values.get("edge_density", 0.0), 4),
         "sharpness": round(sharpness, 2),
-        "tampering_suspected": tampering_suspected,
-        "tampering_reasons": tampering_reasons
     }
+    for name, value in values.items():
+        result.setdefault(name, round(value, 4))
+    result["tampering_suspected"] = tampering_suspected
+    result["tampering_reasons"] = tampering_reasons
+    return result
+
+def analyze_forensics_batch(images, executor=None, features=None):
+    """
+    analyze_image_forensics over many images, in order. With an executor
+    the images are analyzed in parallel (OpenCV releases the GIL).
+    """
+    if executor is None:
+        return [analyze_image_forensics(img, features) for img in images]
+    return list(executor.map(lambda img: analyze_image_forensics(img, features), images))
@@ -0,0 +1,104 @@
+# FILE: Pipelines/image_buffer.py
+import os
+import threading
+
+import cv2
+import numpy as np
+
+from Pipelines.telemetry import IMAGE_BYTES, IMAGE_PIXELS
+
+class ImageDecodeError(ValueError):
+    """Raised when bytes or a file cannot be decoded as an image."""
+
+
+# -------------------------------------------------
+# Decoded image shared by all stages of one request
+# -------------------------------------------------
+class ImageBuffer:
+    """
+    Holds one decoded BGR image plus lazily computed views
+    (grayscale, RGB, resized copies). Each view is computed once and
+    reused by every stage that asks for it.
+
+    Views are shared: treat them as read-only.
+    """
+
+    def __init__(self, bgr, source=None):
+        if bgr is None or not isinstance(bgr, np.ndarray):
+            raise ImageDecodeError(f"Unable to read image: {source}")
+        if bgr.ndim == 2:
+            bgr = cv2.cvtColor(bgr, cv2.COLOR_GRAY2BGR)
+        self.bgr = bgr
+        self.source = source
+        self._views = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_bytes(cls, data, source="<upload>"):
+        arr = np.frombuffer(data, dtype=np.uint8)
+        img = cv2.imdecode(arr, cv2.IMREAD_COLOR) if arr.size else None
+        buffer = cls(img, source)
+        IMAGE_BYTES.observe(arr.size)
+        IMAGE_PIXELS.observe(img.shape[0] * img.shape[1])
+        return buffer
+
+    @classmethod
+    def from_path(cls, path):
+        buffer = cls(cv2.imread(path), path)
+        IMAGE_PIXELS.observe(buffer.bgr.shape[0] * buffer.bgr.shape[1])
+        return buffer
+
+    def __repr__(self):
+        h, w = self.bgr.shape[:2]
+        return f"ImageBuffer({self.source}, {w}x{h})"
+
+    @property
+    def shape(self):
+        return self.bgr.shape
+
+    @property
+    def nbytes(self):
+        """Memory held by the image and every view computed so far."""
+        return self.bgr.nbytes + sum(v.nbytes for v in list(self._views.values()))
+
+    def _view(self, key, compute):
+        view = self._views.get(key)
+        if view is None:
+            with self._lock:
+                view = self._views.get(key)
+                if view is None:
+                    view = compute()
+                    self._views[key] = view
+        return view
+
+    @property
+    def gray(self):
+        return self._view("gray", lambda: cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY))
+
+    @property
+    def rgb(self):
+        return self._view("rgb", lambda: cv2.cvtColor(self.bgr, cv2.COLOR_BGR2RGB))
+
+    def resized(self, size, rgb=False):
+        """Resized copy (width, height), optionally in RGB order."""
+        size = (int(size[0]), int(size[1]))
+        bgr_small = self._view(("bgr", size), lambda: cv2.resize(self.bgr, size))
+        if not rgb:
+            return bgr_small
+        return self._view(("rgb", size), lambda: cv2.cvtColor(bgr_small, cv2.COLOR_BGR2RGB))
+
+
+def as_image_buffer(src):
+    """
+    Accepts an ImageBuffer, a BGR ndarray, encoded bytes or a file path.
+    Raises ValueError when the image cannot be read.
+    """
+    if isinstance(src, ImageBuffer):
+        return src
+    if isinstance(src, np.ndarray):
+        return ImageBuffer(src, "<array>")
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        return ImageBuffer.from_bytes(bytes(src))
+    if isinstance(src, (str, os.PathLike)):
+        return ImageBuffer.from_path(os.fspath(src))
+    raise ValueError(f"Unsupported image source: {type(src).__name__}")
@@ -0,0 +1,230 @@
+# FILE: Pipelines/layout_ocr.py
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from Pipelines.image_buffer import as_image_buffer
+from Pipelines.ocr_extractor import get_ocr_service
+from Pipelines.extract_Aadhaar import FIELDS, extract_fields, extract_fields_detailed
+
+# Where each field's text line is looked for on the front of the card,
+# as (x0, y0, x1, y1) fractions of the card crop: photo on the left,
+# name / DOB / gender block to its right, the number near the bottom.
+DEFAULT_WINDOWS = {
+    "name": (0.25, 0.20, 0.98, 0.42),
+    "dob": (0.25, 0.30, 0.98, 0.54),
+    "gender": (0.25, 0.40, 0.98, 0.64),
+    "aadhaar_number": (0.12, 0.62, 0.90, 0.96),
+}
+
+ANCHOR_WIDTH = 512  # text lines are located on a copy this wide
+
+# -------------------------------------------------
+# Anchors: text lines found without OCR
+# -------------------------------------------------
+def find_text_lines(image, width=ANCHOR_WIDTH):
+    """
+    Boxes (x0, y0, x1, y1) of text-like lines in full-resolution pixels,
+    found by morphology on a downscaled grayscale copy.
+    """
+    img = as_image_buffer(image)
+    h, w = img.shape[:2]
+    scale = min(1.0, width / float(w))
+    size = (max(1, int(w * scale)), max(1, int(h * scale)))
+    gray = img.gray if scale == 1.0 else cv2.resize(img.gray, size, interpolation=cv2.INTER_AREA)
+
+    grad = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3)))
+    _, bw = cv2.threshold(grad, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    bw = cv2.morphologyEx(bw, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (15, 3)))
+    contours, _ = cv2.findContours(bw, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    lines = []
+    for c in contours:
+        x, y, bw_, bh = cv2.boundingRect(c)
+        # Text lines are wide and short; photos, logos and noise are not
+        if bw_ < 2 * bh or bh < 5 or bh > size[1] * 0.12:
+            continue
+        lines.append((x / scale, y / scale, (x + bw_) / scale, (y + bh) / scale))
+    return sorted(lines, key=lambda b: (b[1], b[0]))
+
+def _merge_boxes(boxes):
+    """Unions overlapping boxes so every pixel is recognized once."""
+    merged = []
+    for box in sorted(boxes, key=lambda b: b[1]):
+        for i, m in enumerate(merged):
+            if box[0] < m[2] and m[0] < box[2] and box[1] < m[3] and m[1] < box[3]:
+                merged[i] = (min(m[0], box[0]), min(m[1], box[1]), max(m[2], box[2]), max(m[3], box[3]))
+                break
+        else:
+            merged.append(box)
+    return merged
+
+# -------------------------------------------------
+# Layout template
+# -------------------------------------------------
+class LayoutTemplate:
+    """
+    Per-field search windows, in card-relative coordinates. Starts from
+    DEFAULT_WINDOWS and follows the cards actually seen: every full-page
+    OCR that finds all fields moves each window (moving average) towards
+    the line the field was read from.
+    """
+
+    def __init__(self, windows=None, margin=0.04, alpha=0.1):
+        self.windows = dict(windows or DEFAULT_WINDOWS)
+        self.margin = margin
+        self.alpha = alpha
+        self.observations = 0
+        self._lock = threading.Lock()
+
+    def field_boxes(self, lines, shape, pad=6):
+        """
+        Pixel box per field: the union of the detected lines whose centre
+        lies in the field's window. Fields without a line are left out.
+        """
+        h, w = shape[:2]
+        with self._lock:
+            windows = dict(self.windows)
+        boxes = {}
+        for field, (x0, y0, x1, y1) in windows.items():
+            hits = [b for b in lines
+                    if x0 * w <= (b[0] + b[2]) / 2 <= x1 * w and y0 * h <= (b[1] + b[3]) / 2 <= y1 * h]
+            if hits:
+                boxes[field] = (
+                    max(0, int(min(b[0] for b in hits)) - pad), max(0, int(min(b[1] for b in hits)) - pad),
+                    min(w, int(max(b[2] for b in hits)) + pad), min(h, int(max(b[3] for b in hits)) + pad),
+                )
+        return boxes
+
+    def learn(self, sources, shape):
+        """
+        Updates the windows from the field sources (extract_fields_detailed)
+        of a full-page result, if every field was read from a single line.
+        """
+        if not all(sources.get(f) and sources[f]["box"] for f in FIELDS):
+            return False
+        h, w = shape[:2]
+        with self._lock:
+            for field in FIELDS:
+                x0, y0, x1, y1 = sources[field]["box"]
+                target = (x0 / w - self.margin, y0 / h - self.margin, x1 / w + self.margin, y1 / h + self.margin)
+                old = self.windows[field]
+                self.windows[field] = tuple(
+                    min(1.0, max(0.0, (1 - self.alpha) * o + self.alpha * t)) for o, t in zip(old, target))
+            self.observations += 1
+        return True
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "observations": self.observations,
+                "windows": {f: [round(v, 3) for v in box] for f, box in self.windows.items()},
+            }
+
+
+# -------------------------------------------------
+# Layout-aware OCR
+# -------------------------------------------------
+def recognize_with_service(crops):
+    """Submits every crop at once so the OCR service batches them."""
+    service = get_ocr_service()
+    futures = [service.submit(crop) for crop in crops]
+    return [f.result() for f in futures]
+
+class LayoutOCR:
+    """
+    OCR stage that reads only the field regions of a card the CNN has
+    confirmed as an Aadhaar card, and falls back to full-page OCR when the
+    CNN is unsure, a field region cannot be located, recognition scores
+    are low or a field cannot be extracted from the regions.
+
+    Returns the same dict as run_ocr (boxes in page coordinates) plus a
+    "layout" entry describing how it was produced.
+    """
+
+    def __init__(self, template=None, recognize=recognize_with_service, min_cnn_confidence=0.6,
+                 min_score=0.8):
+        self.template = template or LayoutTemplate()
+        self.recognize = recognize
+        self.min_cnn_confidence = min_cnn_confidence
+        self.min_score = min_score
+        self._lock = threading.Lock()
+        self._counts = {"roi": 0, "full": 0}
+        self._fallbacks = {}
+        self._time_ms = {"roi": 0.0, "full": 0.0}
+
+    def _skip_reason(self, cnn_out):
+        if cnn_out is None:
+            return None
+        if cnn_out.get("project_label") not in ("REAL_AADHAAR", "FAKE_AADHAAR"):
+            return "not_aadhaar"
+        if cnn_out.get("confidence", 0.0) < self.min_cnn_confidence:
+            return "low_cnn_confidence"
+        return None
+
+    def read_regions(self, image):
+        """Returns (ocr_result, reason); reason is None when the regions suffice."""
+        img = as_image_buffer(image)
+        boxes = self.template.field_boxes(find_text_lines(img), img.shape)
+        if len(boxes) != len(FIELDS):
+            return None, "region_not_found"
+
+        regions = _merge_boxes(boxes.values())
+        pages = self.recognize([np.ascontiguousarray(img.bgr[y0:y1, x0:x1]) for x0, y0, x1, y1 in regions])
+
+        texts, scores, page_boxes = [], [], []
+        for (x0, y0, _, _), page in zip(regions, pages):
+            for t, s, b in zip(page["rec_texts"], page["rec_scores"], page["rec_boxes"]):
+                texts.append(list(t))
+                scores.append([float(v) for v in s])
+                page_boxes.append([[v[0] + x0, v[1] + y0, v[2] + x0, v[3] + y0] for v in np.asarray(b).tolist()])
+        result = {"rec_texts": texts, "rec_boxes": page_boxes, "rec_scores": scores}
+
+        flat_scores = [s for page in scores for s in page]
+        if not flat_scores or float(np.mean(flat_scores)) < self.min_score:
+            return result, "low_score"
+        if not all(extract_fields(result).values()):
+            return result, "field_missing"
+        return result, None
+
+    def read_page(self, image):
+        return self.recognize([as_image_buffer(image).bgr])[0]
+
+    def __call__(self, image, cnn_out=None):
+        img = as_image_buffer(image)
+        t0 = time.perf_counter()
+        reason = self._skip_reason(cnn_out)
+        result = None
+        if reason is None:
+            result, reason = self.read_regions(img)
+
+        if reason is None:
+            mode = "roi"
+        else:
+            mode = "full"
+            result = self.read_page(img)
+            self.template.learn(extract_fields_detailed(result)[1], img.shape)
+
+        elapsed = (time.perf_counter() - t0) * 1000
+        with self._lock:
+            self._counts[mode] += 1
+            self._time_ms[mode] += elapsed
+            if reason is not None:
+                self._fallbacks[reason] = self._fallbacks.get(reason, 0) + 1
+        result = dict(result)
+        result["layout"] = {"mode": mode, "fallback_reason": reason, "duration_ms": round(elapsed, 2)}
+        return result
+
+    def stats(self):
+        with self._lock:
+            counts, total_ms = dict(self._counts), dict(self._time_ms)
+            fallbacks = dict(self._fallbacks)
+        return {
+            "roi": counts["roi"],
+            "full": counts["full"],
+            "fallbacks": fallbacks,
+            "avg_ms": {m: round(total_ms[m] / counts[m], 2) if counts[m] else 0.0 for m in counts},
+            "template": self.template.snapshot(),
+        }
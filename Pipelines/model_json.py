@@ -1,67 +1,178 @@
 # FILE: Pipelines/model_json.py
+import weakref
+
 import pandas as pd
 import numpy as np
 
-def json_to_model_input(record):
-    row = {}
+from Pipelines.compiled_forest import CompiledForest
+
+FRAUD_MODEL_PATH = "Models/RandomForest_model.pkl"
+# Written by compile_fraud_model.py
+FRAUD_COMPILED_PATH = "Models/RandomForest_model.npz"
+
+# Defaults; app.py overrides them from the environment via configure_fraud()
+FRAUD_CONFIG = {
+    "backend": "sklearn",        # "sklearn" (.pkl) or "compiled" (.npz)
+    "compiled_path": FRAUD_COMPILED_PATH,
+}
+
+def configure_fraud(**options):
+    unknown = set(options) - set(FRAUD_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown fraud model options: {sorted(unknown)}")
+    FRAUD_CONFIG.update({k: v for k, v in options.items() if v is not None})
+    if FRAUD_CONFIG["backend"] not in ("sklearn", "compiled"):
+        raise ValueError(f"Unknown fraud model backend: {FRAUD_CONFIG['backend']}")
+
+def fraud_model_path():
+    """The model file the configured backend loads."""
+    return FRAUD_CONFIG["compiled_path"] if FRAUD_CONFIG["backend"] == "compiled" else FRAUD_MODEL_PATH
+
+def load_fraud_model(path=None, backend=None):
+    backend = backend or FRAUD_CONFIG["backend"]
+    if backend == "compiled":
+        model = CompiledForest.load(path or FRAUD_CONFIG["compiled_path"])
+    elif backend == "sklearn":
+        import joblib
+        model = joblib.load(path or FRAUD_MODEL_PATH)
+    else:
+        raise ValueError(f"Unknown fraud model backend: {backend}")
+    # Resolve the column order now rather than on the first request
+    feature_schema(model)
+    return model
+
+def warmup_fraud(model):
+    """Scores an empty record once so the first request does not pay setup costs."""
+    result = predict_fraud(model, {})
+    if result["ml_model_status"] != "SUCCESS":
+        raise RuntimeError(result.get("error"))
+
+# Feature order written by feature_values()
+FEATURE_COLUMNS = (
+    'aadhaar_valid', 'dob_valid', 'name_valid', 'gender_valid', 'qr_expected_but_failed',
+    'qr_match', 'consistency_score', 'consistency_failed',
+    'ela_score', 'edge_density', 'sharpness', 'high_ela_flag', 'low_sharpness_flag',
+    'ocr_field_count', 'missing_fields_ratio', 'ocr_failure_count',
+    'qr_decoded',
+)
+
+def feature_values(record):
+    """Model features of one verification record, in FEATURE_COLUMNS order."""
     val = record.get("validation", {})
     cons = record.get("consistency", {})
     frn = record.get("image_forensics", {})
     ocr = record.get("ocr_extracted", {})
 
-    # Validation
-    row['aadhaar_valid'] = 1 if val.get("aadhaar_valid") else 0
-    row['dob_valid'] = 1 if val.get("dob_valid") else 0
-    row['name_valid'] = 1 if val.get("name_valid") else 0
-    row['gender_valid'] = 1 if val.get("gender_valid") else 0
-    row['qr_expected_but_failed'] = 1 if val.get("qr_expected_but_failed") else 0
-
-    # Consistency
-    row['qr_match'] = 1 if cons.get("matching_performed") else 0
-    row['consistency_score'] = float(cons.get("score", 0.0))
-    row['consistency_failed'] = 1 if row['consistency_score'] < 0.5 else 0
-
-    # Forensics
-    row['ela_score'] = float(frn.get("ela_score", 0.0))
-    row['edge_density'] = float(frn.get("edge_density", 0.0))
-    row['sharpness'] = float(frn.get("sharpness", 0.0))
-    row['high_ela_flag'] = 1 if row['ela_score'] > 0.8 else 0 
-    row['low_sharpness_flag'] = 1 if row['sharpness'] < 50 else 0
-
-    # OCR
+    consistency_score = float(cons.get("score", 0.0))
+    ela_score = float(frn.get("ela_score", 0.0))
+    sharpness = float(frn.get("sharpness", 0.0))
     present_fields = sum(1 for k in ["name", "dob", "gender", "aadhaar_number"] if ocr.get(k))
-    row['ocr_field_count'] = present_fields
-    row['missing_fields_ratio'] = (4 - present_fields) / 4.0
-    row['ocr_failure_count'] = 4 - present_fields
-
-    # QR
     qr_status = record.get("qr", {}).get("status", "NOT_DETECTED")
-    row['qr_decoded'] = 1 if qr_status == "DECODED" else 0
-    
-    return row
 
-def predict_fraud(model, record, threshold=0.5):
-    features = json_to_model_input(record)
-    df = pd.DataFrame([features])
-    
-    # SAFETY: Align columns to model
-    if hasattr(model, "feature_names_in_"):
-        for col in model.feature_names_in_:
-            if col not in df.columns:
-                df[col] = 0
-        df = df[model.feature_names_in_]
+    return [
+        # Validation
+        1 if val.get("aadhaar_valid") else 0,
+        1 if val.get("dob_valid") else 0,
+        1 if val.get("name_valid") else 0,
+        1 if val.get("gender_valid") else 0,
+        1 if val.get("qr_expected_but_failed") else 0,
+        # Consistency
+        1 if cons.get("matching_performed") else 0,
+        consistency_score,
+        1 if consistency_score < 0.5 else 0,
+        # Forensics
+        ela_score,
+        float(frn.get("edge_density", 0.0)),
+        sharpness,
+        1 if ela_score > 0.8 else 0,
+        1 if sharpness < 50 else 0,
+        # OCR
+        present_fields,
+        (4 - present_fields) / 4.0,
+        4 - present_fields,
+        # QR
+        1 if qr_status == "DECODED" else 0,
+    ]
+
+def json_to_model_input(record):
+    return dict(zip(FEATURE_COLUMNS, feature_values(record)))
+
+# -------------------------------------------------
+# Precompiled feature schema
+# -------------------------------------------------
+class FeatureSchema:
+    """
+    The model's column order resolved once. Columns the model expects but
+    the pipeline does not produce stay 0; extra pipeline features are dropped.
+    """
+
+    def __init__(self, model):
+        names = getattr(model, "feature_names_in_", None)
+        self.columns = [str(c) for c in names] if names is not None else list(FEATURE_COLUMNS)
+        position = {name: i for i, name in enumerate(FEATURE_COLUMNS)}
+        pairs = [(position[c], j) for j, c in enumerate(self.columns) if c in position]
+        self.src = np.array([i for i, _ in pairs], dtype=np.intp)
+        self.dst = np.array([j for _, j in pairs], dtype=np.intp)
+        self.compiled = isinstance(model, CompiledForest)
+        self.trees = None if self.compiled else _forest_trees(model)
+
+    def matrix(self, records):
+        """float32 feature matrix (the dtype the trees compare in)."""
+        X = np.zeros((len(records), len(self.columns)), dtype=np.float32)
+        values = np.array([feature_values(r) for r in records], dtype=np.float64)
+        X[:, self.dst] = values[:, self.src]
+        return X
+
+    def predict_proba(self, model, X):
+        if self.compiled:
+            return model.predict_proba(X)
+        if self.trees is None:
+            return model.predict_proba(pd.DataFrame(X, columns=self.columns))
+        # Same per-tree sum, in the same order, as a single-job
+        # ForestClassifier.predict_proba, without its joblib dispatch
+        proba = np.zeros((X.shape[0], model.n_classes_), dtype=np.float64)
+        for tree in self.trees:
+            proba += tree.predict_proba(X, check_input=False)
+        proba /= len(self.trees)
+        return proba
+
+def _forest_trees(model):
+    try:
+        from sklearn.ensemble._forest import ForestClassifier
+    except ImportError:
+        return None
+    if isinstance(model, ForestClassifier) and getattr(model, "n_outputs_", 1) == 1:
+        return list(model.estimators_)
+    return None
+
+_schemas = weakref.WeakKeyDictionary()
+
+def feature_schema(model):
+    schema = _schemas.get(model)
+    if schema is None:
+        schema = _schemas[model] = FeatureSchema(model)
+    return schema
+
+def predict_fraud_batch(model, records, threshold=0.5):
+    """Scores many records with a single predict_proba call."""
+    if not records:
+        return []
 
     try:
-        prob = model.predict_proba(df)[0][1]
-        return {
+        schema = feature_schema(model)
+        probs = schema.predict_proba(model, schema.matrix(records))[:, 1]
+        return [{
             "prediction": "FAKE" if prob >= threshold else "REAL",
             "fraud_probability": round(float(prob), 4),
             "ml_model_status": "SUCCESS"
-        }
+        } for prob in probs]
     except Exception as e:
-        return {
+        return [{
             "prediction": "REAL",
             "fraud_probability": 0.0,
             "ml_model_status": "FAILED",
             "error": str(e)
-        }
\ No newline at end of file
+        } for _ in records]
+
+def predict_fraud(model, record, threshold=0.5):
+    return predict_fraud_batch(model, [record], threshold)[0]
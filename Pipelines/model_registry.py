@@ -0,0 +1,97 @@
+# FILE: Pipelines/model_registry.py
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------------------------
+# Lazy model registry
+# -------------------------------------------------
+class ModelRegistry:
+    """
+    Loads each registered model on first use.
+
+    `loader()` returns the model; `warmup(model)` (optional) runs a dummy
+    inference so graph compilation / allocator setup happens before the
+    first real request. A model whose loader fails is reported as None.
+    Models registered with fork_safe=False are not loaded by
+    load_all(fork_safe_only=True), so each forked worker loads its own.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.warm = False
+
+    def register(self, name, loader, warmup=None, fork_safe=True):
+        self._entries[name] = {
+            "loader": loader, "warmup": warmup, "fork_safe": fork_safe, "model": None,
+            "loaded": False, "warmed": False, "error": None,
+            "load_seconds": None, "lock": threading.Lock(),
+        }
+
+    def get(self, name):
+        entry = self._entries[name]
+        if entry["loaded"]:
+            return entry["model"]
+        with entry["lock"]:
+            if not entry["loaded"]:
+                started = time.perf_counter()
+                try:
+                    entry["model"] = entry["loader"]()
+                    entry["error"] = None
+                    logger.info("Model '%s' loaded in %.2fs.", name, time.perf_counter() - started)
+                except Exception as e:
+                    entry["model"] = None
+                    entry["error"] = str(e)
+                    logger.warning("Model '%s' not loaded (%s).", name, e)
+                entry["load_seconds"] = round(time.perf_counter() - started, 3)
+                entry["loaded"] = True
+        return entry["model"]
+
+    def is_loaded(self, name):
+        return self._entries[name]["loaded"]
+
+    def load_all(self, fork_safe_only=False):
+        """Loads every model without running inference."""
+        for name, entry in self._entries.items():
+            if entry["fork_safe"] or not fork_safe_only:
+                self.get(name)
+
+    def warmup(self):
+        """Loads every model and runs its warm-up inference."""
+        for name, entry in self._entries.items():
+            model = self.get(name)
+            if model is None or entry["warmed"] or entry["warmup"] is None:
+                entry["warmed"] = model is not None
+                continue
+            with entry["lock"]:
+                if entry["warmed"]:
+                    continue
+                try:
+                    entry["warmup"](model)
+                    entry["warmed"] = True
+                except Exception as e:
+                    entry["error"] = f"warm-up failed: {e}"
+                    logger.warning("Model '%s' warm-up failed (%s).", name, e)
+        with self._lock:
+            self.warm = True
+        return self.status()
+
+    def ready(self):
+        """True once warm-up ran and every model loaded and warmed."""
+        return self.warm and all(
+            e["model"] is not None and e["warmed"] for e in self._entries.values()
+        )
+
+    def status(self):
+        return {
+            name: {
+                "loaded": e["loaded"] and e["model"] is not None,
+                "warmed": e["warmed"],
+                "load_seconds": e["load_seconds"],
+                "error": e["error"],
+            }
+            for name, e in self._entries.items()
+        }
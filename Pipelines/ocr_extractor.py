@@ -1,15 +1,139 @@
 #ocr_extractor
-from paddleocr import PaddleOCR
-import cv2
+import os
+import queue
+import threading
+from contextlib import contextmanager
 
+import numpy as np
+from Pipelines.image_buffer import as_image_buffer
+from Pipelines.batching import MicroBatcher
 
-ocr = PaddleOCR( use_doc_orientation_classify=False,
-    use_doc_unwarping=False,
-    use_textline_orientation=False, lang='en' )
+# Defaults; app.py overrides them from the environment via configure_ocr()
+OCR_CONFIG = {
+    "pool_size": 1,            # independent PaddleOCR instances
+    "cpu_threads": None,       # intra-op threads per instance (None = Paddle default)
+    "enable_mkldnn": None,     # MKL-DNN / oneDNN kernels (None = Paddle default)
+    "rec_batch_size": None,    # text crops per recognition call (None = Paddle default)
+    "max_batch": 4,            # pages from concurrent requests grouped into one predict()
+    "max_wait_ms": 5.0,
+}
 
-def run_ocr(image_path):
-    img = cv2.imread(image_path)
-    result = ocr.ocr(img)
+def configure_ocr(**options):
+    """Sets pool options; call before the first OCR request."""
+    unknown = set(options) - set(OCR_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown OCR options: {sorted(unknown)}")
+    OCR_CONFIG.update({k: v for k, v in options.items() if v is not None})
+
+OCR_LANG = "en"
+
+def ocr_model_dir():
+    """Where PaddleOCR keeps the detection and recognition models it downloads."""
+    cache_home = os.getenv("PADDLE_PDX_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".paddlex")
+    return os.path.join(cache_home, "official_models")
+
+def ocr_version():
+    """Tag for cached results: changes when PaddleOCR, Paddle or the language change."""
+    from importlib import metadata
+    versions = []
+    for package in ("paddleocr", "paddlepaddle", "paddlepaddle-gpu"):
+        try:
+            versions.append(f"{package}-{metadata.version(package)}")
+        except metadata.PackageNotFoundError:
+            pass
+    return f"ocr-engine={'/'.join(versions) or 'missing'}/{OCR_LANG}"
+
+def create_ocr_engine(cpu_threads=None, enable_mkldnn=None, rec_batch_size=None):
+    """One PaddleOCR instance (slow: loads the models)."""
+    from paddleocr import PaddleOCR
+    kwargs = {}
+    if cpu_threads:
+        kwargs["cpu_threads"] = int(cpu_threads)
+    if enable_mkldnn is not None:
+        kwargs["enable_mkldnn"] = bool(enable_mkldnn)
+    if rec_batch_size:
+        kwargs["text_recognition_batch_size"] = int(rec_batch_size)
+    return PaddleOCR( use_doc_orientation_classify=False,
+        use_doc_unwarping=False,
+        use_textline_orientation=False, lang=OCR_LANG, **kwargs )
+
+# -------------------------------------------------
+# Engine pool
+# -------------------------------------------------
+class OCREnginePool:
+    """
+    N independent PaddleOCR instances. A PaddleOCR instance must not be
+    used by two threads at once: check one out, use it, check it back in.
+
+        with pool.engine() as ocr:
+            ocr.predict(img)
+    """
+
+    def __init__(self, size=1, factory=create_ocr_engine):
+        self.size = max(1, int(size))
+        self.factory = factory
+        self._idle = queue.LifoQueue()
+        self._engines = []
+        self._lock = threading.Lock()
+        self._checkouts = 0
+        self._waits = 0
+
+    def fill(self):
+        """Creates every instance up front (e.g. before forking workers)."""
+        with self._lock:
+            while len(self._engines) < self.size:
+                engine = self.factory()
+                self._engines.append(engine)
+                self._idle.put(engine)
+        return self
+
+    def checkout(self, timeout=None):
+        if len(self._engines) < self.size and self._idle.empty():
+            # Grow lazily up to `size`
+            with self._lock:
+                if len(self._engines) < self.size:
+                    engine = self.factory()
+                    self._engines.append(engine)
+                    self._checkouts += 1
+                    return engine
+        try:
+            engine = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                self._waits += 1
+            engine = self._idle.get(timeout=timeout)
+        with self._lock:
+            self._checkouts += 1
+        return engine
+
+    def checkin(self, engine):
+        self._idle.put(engine)
+
+    @contextmanager
+    def engine(self, timeout=None):
+        engine = self.checkout(timeout)
+        try:
+            yield engine
+        finally:
+            self.checkin(engine)
+
+    def engines(self):
+        return list(self._engines)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "created": len(self._engines),
+                "idle": self._idle.qsize(),
+                "checkouts": self._checkouts,
+                "waited": self._waits,
+            }
+
+# -------------------------------------------------
+# Batched OCR service
+# -------------------------------------------------
+def format_ocr_result(result):
     texts = []
     boxes = []
     scores = []
@@ -24,6 +148,73 @@ def run_ocr(image_path):
         "rec_boxes": boxes,
         "rec_scores": scores
     }
+
+class OCRService:
+    """
+    Pages submitted by concurrent requests are grouped (up to `max_batch`
+    pages, waiting at most `max_wait_ms`) into one predict() call on a
+    checked-out engine; one batching thread per engine.
+    """
+
+    def __init__(self, pool, max_batch=4, max_wait_ms=5.0):
+        self.pool = pool
+        self.batcher = MicroBatcher(self._predict, max_batch_size=max_batch, max_wait_ms=max_wait_ms,
+                                    name="ocr-batcher", workers=pool.size)
+
+    def _predict(self, images):
+        with self.pool.engine() as ocr:
+            pages = list(ocr.predict(images if len(images) > 1 else images[0]))
+        if len(pages) != len(images):
+            raise RuntimeError(f"OCR returned {len(pages)} pages for {len(images)} images")
+        return [format_ocr_result([page]) for page in pages]
+
+    def submit(self, img):
+        return self.batcher.submit(img)
+
+    def recognize(self, img):
+        return self.submit(img).result()
+
+    def stats(self):
+        return {"pool": self.pool.stats(), "batcher": self.batcher.stats()}
+
+
+_service = None
+_init_lock = threading.Lock()
+
+def get_ocr_service():
+    """Creates the pool and its engines on first use (slow: loads the models)."""
+    global _service
+    if _service is None:
+        with _init_lock:
+            if _service is None:
+                cfg = OCR_CONFIG
+                pool = OCREnginePool(cfg["pool_size"], lambda: create_ocr_engine(
+                    cfg["cpu_threads"], cfg["enable_mkldnn"], cfg["rec_batch_size"]))
+                _service = OCRService(pool.fill(), cfg["max_batch"], cfg["max_wait_ms"])
+    return _service
+
+def get_ocr_engine():
+    """The OCR service (model-registry loader)."""
+    return get_ocr_service()
+
+def ocr_stats():
+    """Pool and batching counters, or None before the first OCR call."""
+    return _service.stats() if _service is not None else None
+
+def warmup_ocr(service):
+    blank = np.full((64, 256, 3), 255, dtype=np.uint8)
+    # Hold every engine so none is in use by a request meanwhile
+    engines = [service.pool.checkout() for _ in range(service.pool.size)]
+    try:
+        for engine in engines:
+            engine.predict(blank)
+    finally:
+        for engine in engines:
+            service.pool.checkin(engine)
+
+def run_ocr(image_path):
+    """Accepts a path, ndarray or ImageBuffer."""
+    img = as_image_buffer(image_path).bgr
+    return get_ocr_service().recognize(img)
 # img = "F:\\New folder (2)\\newdatasets\\train\\real\\real_1.jpg"
 # print(run_ocr_full(img))
-
@@ -1,52 +1,144 @@
 # FILE: Pipelines/preprocess.py
+import threading
+import time
+
 import cv2
 import numpy as np
-import imutils
+from Pipelines.image_buffer import as_image_buffer
+
+# Defaults; app.py overrides them from the environment via configure_preprocess()
+PREPROCESS_CONFIG = {
+    "size": (1024, 640),     # (width, height) of the cleaned card OCR and the CNN read
+    "clahe_clip": 3.0,
+    "clahe_grid": (8, 8),
+    "deskew": False,
+    "skew_width": 512,       # the skew angle is estimated on a copy this wide
+    "min_skew_deg": 0.5,     # smaller angles are left alone
+}
+
+def configure_preprocess(**options):
+    unknown = set(options) - set(PREPROCESS_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown preprocess options: {sorted(unknown)}")
+    PREPROCESS_CONFIG.update({k: v for k, v in options.items() if v is not None})
+
+def preprocess_version():
+    """Tag for cached results: changes when the settings change the output."""
+    w, h = PREPROCESS_CONFIG["size"]
+    return f"preprocess={w}x{h}/deskew={int(bool(PREPROCESS_CONFIG['deskew']))}"
+
+_local = threading.local()
+
+def get_clahe(clip=None, grid=None):
+    """This thread's CLAHE object for the given settings (created once, then reused)."""
+    clip = PREPROCESS_CONFIG["clahe_clip"] if clip is None else clip
+    grid = tuple(PREPROCESS_CONFIG["clahe_grid"] if grid is None else grid)
+    cache = getattr(_local, "clahe", None)
+    if cache is None:
+        cache = _local.clahe = {}
+    clahe = cache.get((clip, grid))
+    if clahe is None:
+        clahe = cache[(clip, grid)] = cv2.createCLAHE(clipLimit=clip, tileGridSize=grid)
+    return clahe
 
 def read_image(img_path):
-    img = cv2.imread(img_path)
-    if img is None: raise ValueError(f"Unable to read image: {img_path}")
-    return img
+    """Accepts a path, ndarray or ImageBuffer; raises ValueError if unreadable."""
+    return as_image_buffer(img_path).bgr
 
 def resize_image(img, size=(1024, 640)): # Adjusted for consistency
-    return cv2.resize(img, size)
+    return cv2.resize(img, tuple(size))
 
 def noise_reduction(img):
     return cv2.GaussianBlur(img, (3, 3), 0)
 
 def normalize_brightness(img):
+    """CLAHE on the L channel; only L is extracted and written back."""
     lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
-    l, a, b = cv2.split(lab)
-    clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
-    l = clahe.apply(l)
-    return cv2.cvtColor(cv2.merge((l, a, b)), cv2.COLOR_LAB2BGR)
-
-def deskew(img):
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    gray = cv2.bitwise_not(gray)
-    thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1]
-    coords = np.column_stack(np.where(thresh > 0))
-    if len(coords) == 0: return img
+    l = get_clahe().apply(cv2.extractChannel(lab, 0))
+    cv2.insertChannel(l, lab, 0)
+    return cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+
+def estimate_skew(img, width=None):
+    """
+    Skew angle in degrees (positive = counter-clockwise), from the
+    minimum-area rectangle around the dark pixels of a downscaled copy.
+    """
+    width = width or PREPROCESS_CONFIG["skew_width"]
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    h, w = gray.shape[:2]
+    if w > width:
+        gray = cv2.resize(gray, (width, max(1, int(h * width / float(w)))), interpolation=cv2.INTER_AREA)
+    thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1]
+    coords = cv2.findNonZero(thresh)
+    if coords is None:
+        return 0.0
     angle = cv2.minAreaRect(coords)[-1]
-    if angle < -45: angle = -(90 + angle)
-    else: angle = -angle
-    return imutils.rotate_bound(img, angle)
+    # minAreaRect reports the rectangle's angle in (0, 90]: map it to (-45, 45]
+    if angle > 45:
+        angle -= 90
+    return -float(angle)
 
-def crop_background(img):
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+def deskew(img, angle=None):
+    """
+    Rotates by -angle onto a canvas large enough for the whole image; the
+    new corners repeat the border so they are not taken for card content.
+    """
+    angle = estimate_skew(img) if angle is None else angle
+    if abs(angle) < PREPROCESS_CONFIG["min_skew_deg"]:
+        return img
+    h, w = img.shape[:2]
+    M = cv2.getRotationMatrix2D((w / 2.0, h / 2.0), -angle, 1.0)
+    cos, sin = abs(M[0, 0]), abs(M[0, 1])
+    new_w, new_h = int(h * sin + w * cos), int(h * cos + w * sin)
+    M[0, 2] += new_w / 2.0 - w / 2.0
+    M[1, 2] += new_h / 2.0 - h / 2.0
+    return cv2.warpAffine(img, M, (new_w, new_h), borderMode=cv2.BORDER_REPLICATE)
+
+def crop_bounds(img):
+    """(x, y, w, h) of the dark (Otsu) pixels: what crop_background keeps."""
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     _, th = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-    coords = cv2.findNonZero(th)
-    if coords is None: return img
-    x, y, w, h = cv2.boundingRect(coords)
+    # boundingRect of the mask itself: no point list is built
+    x, y, w, h = cv2.boundingRect(th)
+    return (x, y, w, h) if w and h else None
+
+def crop_background(img):
+    bounds = crop_bounds(img)
+    if bounds is None: return img
+    x, y, w, h = bounds
     return img[y:y + h, x:x + w]
 
-def preprocess_document(img_path):
+def preprocess_document(img_path, size=None, timings=None):
+    """
+    Resize (to `size`, default PREPROCESS_CONFIG["size"]), CLAHE, optional
+    deskew, background crop. Pass a dict as `timings` to get the time of
+    each step in ms.
+    """
+    clock = time.perf_counter
+    steps = []
+
+    t0 = clock()
     img = read_image(img_path)
-    img = resize_image(img)
+    steps.append(("read", clock() - t0))
+
+    t0 = clock()
+    img = resize_image(img, size or PREPROCESS_CONFIG["size"])
+    steps.append(("resize", clock() - t0))
     #img = noise_reduction(img)
+
+    t0 = clock()
     img = normalize_brightness(img)
-    # img = deskew(img)
+    steps.append(("clahe", clock() - t0))
+
+    if PREPROCESS_CONFIG["deskew"]:
+        t0 = clock()
+        img = deskew(img)
+        steps.append(("deskew", clock() - t0))
+
+    t0 = clock()
     img = crop_background(img)
-    
-    # Fixed the return statement
-    return {"processed_image": img}
\ No newline at end of file
+    steps.append(("crop", clock() - t0))
+
+    if timings is not None:
+        timings.update((name, round(dt * 1000, 3)) for name, dt in steps)
+    return {"processed_image": img}
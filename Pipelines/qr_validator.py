@@ -1,8 +1,14 @@
 #qr_validator.py
 import cv2
+import logging
 import numpy as np
 import re
-from pyzbar.pyzbar import decode as pyzbar_decode
+import threading
+import time
+from pyzbar.pyzbar import ZBarSymbol, decode as pyzbar_decode
+from Pipelines.image_buffer import as_image_buffer
+
+logger = logging.getLogger(__name__)
 
 # =====================================================
 # 1. PARSER: PIPE FORMAT (GUI Style)
@@ -78,30 +84,228 @@ def try_decode_secure_qr(decoded_text):
         return None
 
 # =====================================================
-# 4. MAIN VALIDATOR
+# 4. LOCALIZATION AND DECODING
 # =====================================================
-def validate_qr(image_path):
-    img = cv2.imread(image_path)
-    if img is None:
-        return {"status": "NOT_DETECTED", "decoded_data": None}
+# Defaults; app.py overrides them from the environment via configure_qr()
+QR_CONFIG = {
+    "budget_ms": 300.0,          # stop trying new crops / scales after this
+    "locate_width": 800,         # finder patterns are searched on a copy this wide
+    "crop_side": 480,            # crops are first resized to about this size
+    "scales": (1.0, 1.5, 0.75),  # then tried at these scales, in order
+    "max_regions": 3,
+    "full_frame_fallback": True, # whole image (pyzbar, then OpenCV) when no crop decodes
+}
+
+def configure_qr(**options):
+    unknown = set(options) - set(QR_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown QR options: {sorted(unknown)}")
+    QR_CONFIG.update({k: v for k, v in options.items() if v is not None})
+
+_local = threading.local()
+
+def get_detector():
+    """This thread's QRCodeDetector (created once per thread, then reused)."""
+    detector = getattr(_local, "detector", None)
+    if detector is None:
+        detector = _local.detector = cv2.QRCodeDetector()
+    return detector
+
+_stats_lock = threading.Lock()
+_stats = {"calls": 0, "decoded": 0, "decoded_by": {}, "budget_exhausted": 0, "total_ms": 0.0}
+
+def _record(method, elapsed_ms, exhausted):
+    with _stats_lock:
+        _stats["calls"] += 1
+        _stats["total_ms"] += elapsed_ms
+        if method:
+            _stats["decoded"] += 1
+            _stats["decoded_by"][method] = _stats["decoded_by"].get(method, 0) + 1
+        if exhausted:
+            _stats["budget_exhausted"] += 1
+
+def qr_stats():
+    with _stats_lock:
+        calls = _stats["calls"]
+        return {
+            "calls": calls,
+            "decoded": _stats["decoded"],
+            "decode_rate": round(_stats["decoded"] / calls, 4) if calls else 0.0,
+            "decoded_by": dict(_stats["decoded_by"]),
+            "budget_exhausted": _stats["budget_exhausted"],
+            "avg_ms": round(_stats["total_ms"] / calls, 2) if calls else 0.0,
+        }
+
+def find_finder_patterns(gray):
+    """
+    Centres and sizes of QR finder patterns: square contours holding a
+    square that holds another (the 1:1:3:1:1 rings), as (cx, cy, side).
+    """
+    _, bw = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    contours, hierarchy = cv2.findContours(bw, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    if hierarchy is None:
+        return []
+    hierarchy = hierarchy[0]
+
+    def squarish(i):
+        x, y, w, h = cv2.boundingRect(contours[i])
+        return w >= 5 and h >= 5 and 0.6 < w / h < 1.6 and cv2.contourArea(contours[i]) > 0.4 * w * h
+
+    patterns = []
+    for i in range(len(contours)):
+        child = hierarchy[i][2]
+        grandchild = hierarchy[child][2] if child >= 0 else -1
+        if grandchild < 0 or not (squarish(i) and squarish(grandchild)):
+            continue
+        x, y, w, h = cv2.boundingRect(contours[i])
+        gx, gy, gw, gh = cv2.boundingRect(contours[grandchild])
+        # Centre square is ~3/7 of the outer ring
+        if not 0.2 < gw / w < 0.65:
+            continue
+        patterns.append((x + w / 2.0, y + h / 2.0, (w + h) / 2.0))
+    return patterns
+
+def locate_qr_regions(buf, width=None, max_regions=None):
+    """
+    Candidate QR boxes (x0, y0, x1, y1) in full-resolution pixels, best
+    first: groups of finder patterns found on a downscaled copy, plus the
+    box OpenCV's detector reports on the same copy.
+    """
+    width = width or QR_CONFIG["locate_width"]
+    max_regions = max_regions or QR_CONFIG["max_regions"]
+    h, w = buf.shape[:2]
+    scale = min(1.0, width / float(w))
+    small = buf.gray if scale == 1.0 else cv2.resize(
+        buf.gray, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+
+    patterns = find_finder_patterns(small)
+    groups = []
+    for cx, cy, side in sorted(patterns, key=lambda p: -p[2]):
+        for group in groups:
+            gx, gy, gside = group[0]
+            # Finder patterns of one code are similar in size and < ~25 modules apart
+            if 0.5 < side / gside < 2.0 and abs(cx - gx) < 8 * gside and abs(cy - gy) < 8 * gside:
+                group.append((cx, cy, side))
+                break
+        else:
+            groups.append([(cx, cy, side)])
 
-    decoded_text = None
-    
-    # --- STRATEGY: pyzbar ---
+    regions = []
+    for group in sorted(groups, key=len, reverse=True):
+        if len(group) < 2:
+            continue
+        side = max(p[2] for p in group)
+        x0 = min(p[0] for p in group) - side
+        y0 = min(p[1] for p in group) - side
+        x1 = max(p[0] for p in group) + side
+        y1 = max(p[1] for p in group) + side
+        if len(group) == 2:
+            # The third corner is missing: widen to cover both possible squares
+            extent = max(x1 - x0, y1 - y0)
+            x0, y0, x1, y1 = min(x0, x1 - extent), min(y0, y1 - extent), max(x1, x0 + extent), max(y1, y0 + extent)
+        regions.append((x0, y0, x1, y1))
+
+    found, points = False, None
+    if not regions:
+        # No finder-pattern pair (blur, glare): ask OpenCV's detector instead
+        try:
+            found, points = get_detector().detect(small)
+        except cv2.error:
+            pass
+    if found and points is not None:
+        pts = points.reshape(-1, 2)
+        regions.append((pts[:, 0].min(), pts[:, 1].min(), pts[:, 0].max(), pts[:, 1].max()))
+
+    boxes = []
+    for x0, y0, x1, y1 in regions[:max_regions]:
+        pad = 0.15 * max(x1 - x0, y1 - y0)  # quiet zone
+        box = (max(0, int((x0 - pad) / scale)), max(0, int((y0 - pad) / scale)),
+               min(w, int((x1 + pad) / scale)), min(h, int((y1 + pad) / scale)))
+        if box[2] - box[0] >= 16 and box[3] - box[1] >= 16 and box not in boxes:
+            boxes.append(box)
+    return boxes
+
+def _binarizations(gray):
+    yield "gray", gray
+    yield "otsu", cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1]
+    block = max(11, (min(gray.shape[:2]) // 8) | 1)
+    yield "adaptive", cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, block, 5)
+
+def _decode_gray(gray):
+    """pyzbar, then OpenCV, on one grayscale image; text or None."""
     try:
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        decoded_objects = pyzbar_decode(gray)
+        decoded_objects = pyzbar_decode(gray, symbols=[ZBarSymbol.QRCODE])
         if decoded_objects:
-            decoded_text = decoded_objects[0].data.decode('utf-8')
+            return decoded_objects[0].data.decode('utf-8')
     except Exception as e:
-        print(f"DEBUG: pyzbar error: {e}")
-
-    # --- FALLBACK: OpenCV ---
-    if not decoded_text:
-        detector = cv2.QRCodeDetector()
-        data, bbox, _ = detector.detectAndDecode(img)
-        if data:
-            decoded_text = data
+        logger.debug("pyzbar error: %s", e)
+    try:
+        data, _, _ = get_detector().detectAndDecode(gray)
+    except cv2.error:
+        data = None
+    return data or None
+
+def decode_regions(buf, regions, deadline):
+    """Tries each crop at each scale and binarization until the deadline."""
+    for x0, y0, x1, y1 in regions:
+        crop = buf.gray[y0:y1, x0:x1]
+        base = min(1.0, QR_CONFIG["crop_side"] / float(max(crop.shape[:2])))
+        for step in QR_CONFIG["scales"]:
+            scale = base * step
+            scaled = crop if scale == 1.0 else cv2.resize(
+                crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC if scale > 1 else cv2.INTER_AREA)
+            if min(scaled.shape[:2]) < 21:
+                continue
+            for name, variant in _binarizations(scaled):
+                if time.perf_counter() > deadline:
+                    return None, None
+                text = _decode_gray(variant)
+                if text:
+                    return text, f"region@{step:g}/{name}"
+    return None, None
+
+def decode_full_frame(buf):
+    """The whole image: pyzbar on grayscale, then OpenCV on colour."""
+    try:
+        decoded_objects = pyzbar_decode(buf.gray)
+        if decoded_objects:
+            return decoded_objects[0].data.decode('utf-8')
+    except Exception as e:
+        logger.debug("pyzbar error: %s", e)
+    try:
+        data, _, _ = get_detector().detectAndDecode(buf.bgr)
+    except cv2.error:
+        data = None
+    return data or None
+
+def decode_qr_text(image, budget_ms=None):
+    """Returns (text or None, method); `budget_ms` caps the search."""
+    buf = as_image_buffer(image)
+    budget_ms = QR_CONFIG["budget_ms"] if budget_ms is None else budget_ms
+    t0 = time.perf_counter()
+    deadline = t0 + budget_ms / 1000.0
+
+    text, method = decode_regions(buf, locate_qr_regions(buf), deadline)
+    exhausted = text is None and time.perf_counter() > deadline
+    if text is None and not exhausted and QR_CONFIG["full_frame_fallback"]:
+        text = decode_full_frame(buf)
+        method = "full_frame" if text else None
+
+    _record(method, (time.perf_counter() - t0) * 1000, exhausted)
+    return text, method
+
+# =====================================================
+# 5. MAIN VALIDATOR
+# =====================================================
+def validate_qr(image_path):
+    """Accepts a path, ndarray or ImageBuffer."""
+    try:
+        buf = as_image_buffer(image_path)
+    except ValueError:
+        return {"status": "NOT_DETECTED", "decoded_data": None}
+
+    # Candidate regions first, the whole image only if they fail (time-capped)
+    decoded_text, _ = decode_qr_text(buf)
 
     # --- PARSING ---
     if decoded_text:
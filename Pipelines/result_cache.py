@@ -0,0 +1,242 @@
+# FILE: Pipelines/result_cache.py
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Bump when a stage's output format or logic changes
+PIPELINE_VERSION = "1"
+
+def content_digest(data):
+    """SHA-256 of the uploaded bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+def version_stamp(model_paths, extra=()):
+    """
+    Short hash of the pipeline version plus the size and mtime of every
+    model file. Changes whenever a model file is replaced.
+    """
+    h = hashlib.sha256(PIPELINE_VERSION.encode())
+    for path in model_paths:
+        try:
+            st = os.stat(path)
+            h.update(f"{path}:{st.st_size}:{st.st_mtime_ns}".encode())
+        except OSError:
+            h.update(f"{path}:missing".encode())
+    for item in extra:
+        h.update(str(item).encode())
+    return h.hexdigest()[:16]
+
+def ensure_private_dir(path):
+    """Creates `path` with mode 0700; refuses a directory owned by another user."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.stat(path)
+    if hasattr(os, "getuid") and st.st_uid != os.getuid():
+        raise PermissionError(f"{path} is owned by uid {st.st_uid}, not by this service")
+    return path
+
+def _json_default(value):
+    # numpy arrays and scalars (OCR boxes, forensic scores)
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+# -------------------------------------------------
+# Backends
+# -------------------------------------------------
+class MemoryCacheBackend:
+    """Per-process LRU with TTL."""
+
+    def __init__(self, max_entries=1024, ttl=3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, created = item
+            if time.time() - created > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.time())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SqliteCacheBackend:
+    """
+    On-disk LRU with TTL, shared by every worker process on the host.
+    Values are stored as JSON (tuples come back as lists). The file holds
+    personal data from the card: it is created with mode 0600 and a file
+    owned by another user is refused.
+
+    A hit only records its access time when the stored one is older than
+    `touch_interval` seconds, so repeated hits on a hot entry are plain
+    reads and do not take the database's write lock.
+    """
+
+    def __init__(self, path, max_entries=10000, ttl=3600.0, touch_interval=60.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.touch_interval = touch_interval
+        self._local = threading.local()
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+        st = os.stat(path)
+        if hasattr(os, "getuid") and st.st_uid != os.getuid():
+            raise PermissionError(f"{path} is owned by uid {st.st_uid}, not by this service")
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS stage_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT,
+                created REAL,
+                accessed REAL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_stage_cache_accessed ON stage_cache (accessed)")
+        conn.commit()
+
+    def _conn(self):
+        # One connection per thread (and per process after fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        conn = self._conn()
+        row = conn.execute("SELECT value, created, accessed FROM stage_cache WHERE key=?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, created, accessed = row
+        now = time.time()
+        if now - created > self.ttl:
+            conn.execute("DELETE FROM stage_cache WHERE key=?", (key,))
+            conn.commit()
+            return None
+        if now - accessed > self.touch_interval:
+            conn.execute("UPDATE stage_cache SET accessed=? WHERE key=?", (now, key))
+            conn.commit()
+        return json.loads(value)
+
+    def set(self, key, value):
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO stage_cache (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value, default=_json_default), now, now)
+        )
+        conn.execute("""
+            DELETE FROM stage_cache WHERE key IN (
+                SELECT key FROM stage_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_entries,))
+        conn.commit()
+
+    def clear(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM stage_cache")
+        conn.commit()
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM stage_cache").fetchone()[0]
+
+# -------------------------------------------------
+# Stage result cache
+# -------------------------------------------------
+class ResultCache:
+    """
+    Caches per-stage outputs keyed by (version stamp, content digest, stage).
+    The version stamp is re-checked every `check_interval` seconds; when a
+    model file changes, the stamp changes and the backend is cleared.
+
+    Cached values are shared between requests: treat them as read-only.
+    """
+
+    def __init__(self, backend, model_paths=(), extra_version=(), check_interval=5.0):
+        self.backend = backend
+        self.model_paths = tuple(model_paths)
+        self.extra_version = tuple(extra_version)
+        self.check_interval = check_interval
+        self._stamp = version_stamp(self.model_paths, self.extra_version)
+        self._checked = time.monotonic()
+        self._lock = threading.Lock()
+        self.hits = {}
+        self.misses = {}
+        self.invalidations = 0
+
+    def stamp(self):
+        now = time.monotonic()
+        if now - self._checked >= self.check_interval:
+            with self._lock:
+                if now - self._checked >= self.check_interval:
+                    self._checked = now
+                    current = version_stamp(self.model_paths, self.extra_version)
+                    if current != self._stamp:
+                        logger.info("Result cache: model files changed (%s -> %s), clearing.", self._stamp, current)
+                        self._stamp = current
+                        self.invalidations += 1
+                        self.backend.clear()
+        return self._stamp
+
+    def _key(self, digest, stage):
+        return f"{self.stamp()}:{digest}:{stage}"
+
+    def get(self, digest, stage):
+        try:
+            value = self.backend.get(self._key(digest, stage))
+        except Exception as e:
+            logger.warning("Result cache read error: %s", e)
+            value = None
+        counter = self.misses if value is None else self.hits
+        with self._lock:
+            counter[stage] = counter.get(stage, 0) + 1
+        return value
+
+    def put(self, digest, stage, value):
+        try:
+            self.backend.set(self._key(digest, stage), value)
+        except Exception as e:
+            logger.warning("Result cache write error: %s", e)
+
+    def stats(self):
+        with self._lock:
+            total_hits = sum(self.hits.values())
+            total = total_hits + sum(self.misses.values())
+            return {
+                "backend": type(self.backend).__name__,
+                "version": self._stamp,
+                "entries": len(self.backend),
+                "hits": dict(self.hits),
+                "misses": dict(self.misses),
+                "hit_rate": round(total_hits / total, 4) if total else 0.0,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,153 @@
+# FILE: Pipelines/stage_graph.py
+import asyncio
+import inspect
+import time
+from contextlib import aclosing
+
+from Pipelines.telemetry import QUEUE_WAIT_SECONDS, stage_span
+
+# -------------------------------------------------
+# Stage definition
+# -------------------------------------------------
+class Stage:
+    """
+    One step of a pipeline.
+    `func` is called with the values named in `inputs` (in order) and its
+    return value is stored under `outputs`. A stage with several outputs
+    must return a tuple of the same length.
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=None):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs) if outputs else (name,)
+        self.is_async = inspect.iscoroutinefunction(func)
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, inputs={self.inputs}, outputs={self.outputs})"
+
+
+# -------------------------------------------------
+# Dependency-graph executor
+# -------------------------------------------------
+class StageGraph:
+    """
+    Runs stages as soon as their inputs are available.
+    Independent blocking stages run in parallel on `executor`;
+    coroutine stages are awaited on the event loop.
+    """
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+        self.producers = {}
+        for stage in self.stages:
+            for out in stage.outputs:
+                if out in self.producers:
+                    raise ValueError(f"Output '{out}' is produced by both "
+                                     f"'{self.producers[out].name}' and '{stage.name}'")
+                self.producers[out] = stage
+
+    def required_stages(self, targets, values):
+        """Stages needed to compute `targets` given already-known `values`."""
+        seen = set()
+        stack = [t for t in targets if t not in values]
+        while stack:
+            name = stack.pop()
+            stage = self.producers.get(name)
+            if stage is None:
+                raise KeyError(f"No stage produces '{name}'")
+            if stage.name in seen:
+                continue
+            seen.add(stage.name)
+            stack.extend(i for i in stage.inputs if i not in values)
+        return [s for s in self.stages if s.name in seen]
+
+    async def _call(self, stage, args, executor):
+        with stage_span(stage.name):
+            if stage.is_async:
+                return await stage.func(*args)
+            loop = asyncio.get_running_loop()
+            submitted = time.perf_counter()
+
+            def run():
+                QUEUE_WAIT_SECONDS.observe(time.perf_counter() - submitted, queue="stage_executor")
+                return stage.func(*args)
+            return await loop.run_in_executor(executor, run)
+
+    async def stream(self, values, executor=None, targets=None):
+        """
+        Async generator yielding (stage_name, outputs, timing) as each stage
+        finishes. Stages whose outputs are already in `values` are skipped.
+        Closing the generator early (e.g. `aclosing` + break) cancels the
+        stages still running or queued.
+        """
+        values = dict(values)
+        if targets is None:
+            pending = [s for s in self.stages if not all(o in values for o in s.outputs)]
+        else:
+            pending = self.required_stages(targets, values)
+
+        running = {}
+        t0 = time.perf_counter()
+
+        try:
+            while pending or running:
+                for stage in list(pending):
+                    if all(i in values for i in stage.inputs):
+                        pending.remove(stage)
+                        args = [values[i] for i in stage.inputs]
+                        task = asyncio.ensure_future(self._call(stage, args, executor))
+                        running[task] = (stage, time.perf_counter())
+
+                if not running:
+                    missing = sorted({i for s in pending for i in s.inputs if i not in values})
+                    raise RuntimeError(f"Stages {[s.name for s in pending]} are missing inputs {missing}")
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    stage, started = running.pop(task)
+                    result = task.result()
+                    ended = time.perf_counter()
+                    timing = {
+                        "start_ms": round((started - t0) * 1000, 2),
+                        "end_ms": round((ended - t0) * 1000, 2),
+                        "duration_ms": round((ended - started) * 1000, 2),
+                    }
+                    if len(stage.outputs) == 1:
+                        outputs = {stage.outputs[0]: result}
+                    else:
+                        outputs = dict(zip(stage.outputs, result))
+                    values.update(outputs)
+                    yield stage.name, outputs, timing
+        finally:
+            for task in running:
+                task.cancel()
+
+    async def run(self, values, executor=None, targets=None):
+        """
+        Computes every stage (or only those needed for `targets`) and returns
+        (values, timings). Stages whose outputs are already in `values`
+        are skipped.
+        """
+        values = dict(values)
+        timings = {}
+        async with aclosing(self.stream(values, executor, targets)) as events:
+            async for name, outputs, timing in events:
+                values.update(outputs)
+                timings[name] = timing
+        return values, timings
+
+    def critical_path(self, timings):
+        """Walks back from the last stage to finish through its slowest input."""
+        if not timings:
+            return []
+        path = []
+        current = max(timings, key=lambda n: timings[n]["end_ms"])
+        by_name = {s.name: s for s in self.stages}
+        while current is not None:
+            path.append(current)
+            parents = [self.producers[i].name for i in by_name[current].inputs
+                       if i in self.producers and self.producers[i].name in timings]
+            current = max(parents, key=lambda n: timings[n]["end_ms"]) if parents else None
+        return list(reversed(path))
@@ -0,0 +1,207 @@
+# FILE: Pipelines/tamper_map.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from Pipelines.image_buffer import as_image_buffer
+from Pipelines.forensic_analyzer import analyze_image_forensics, block_means, jpeg_roundtrip
+
+# Defaults; app.py overrides them from the environment via configure_tamper_map()
+TAMPER_CONFIG = {
+    "budget_ms": 500.0,     # refinement stops starting new tiles after this
+    "coarse_side": 1024,    # the whole image is first scored on a copy this large
+    "cell": 64,             # grid cell size on that copy (at most 16x16 cells)
+    "quality": 90,          # ELA recompression quality
+    "workers": 4,           # threads refining tiles at full resolution
+    "threshold": 6.0,       # robust z-score from which a cell is suspicious
+    "top_k": 5,
+    "heatmap_width": 256,
+}
+
+def configure_tamper_map(**options):
+    unknown = set(options) - set(TAMPER_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown tamper-map options: {sorted(unknown)}")
+    TAMPER_CONFIG.update({k: v for k, v in options.items() if v is not None})
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_tile_executor():
+    """Threads for full-resolution tiles (created on first use, then reused)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(TAMPER_CONFIG["workers"], thread_name_prefix="tamper-tile")
+        return _executor
+
+# -------------------------------------------------
+# Per-cell ELA and noise statistics
+# -------------------------------------------------
+def _residual(gray):
+    """What a 3x3 median filter removes, squared: local noise energy."""
+    r = cv2.subtract(gray.astype(np.int16), cv2.medianBlur(gray, 3).astype(np.int16))
+    return np.square(r, dtype=np.float32)
+
+def _texture(gray):
+    return np.abs(cv2.Laplacian(gray, cv2.CV_32F))
+
+def coarse_stats(bgr, cell, quality):
+    """ELA mean, noise energy and texture of every cell, from one pass over the whole image."""
+    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    return (block_means(cv2.absdiff(bgr, jpeg_roundtrip(bgr, quality)), cell),
+            block_means(_residual(gray), cell),
+            block_means(_texture(gray), cell))
+
+def tile_stats(tile, quality):
+    """ELA mean, noise energy and texture of one full-resolution tile."""
+    gray = cv2.cvtColor(tile, cv2.COLOR_BGR2GRAY)
+    return (float(np.mean(cv2.absdiff(tile, jpeg_roundtrip(tile, quality)))),
+            float(np.mean(_residual(gray))),
+            float(np.mean(_texture(gray))))
+
+def anomaly_z(values, texture, floor=0.1):
+    """
+    Robust z-score of each cell after removing what texture explains:
+    busy cells (text, photo, QR) have a high ELA and noise energy on any
+    card, so log(value) is fitted against log(texture) and the residuals
+    are scored by their distance from the median, in scaled MADs.
+    """
+    x, y = np.log1p(texture.ravel()), np.log1p(values.ravel())
+    design = np.stack([np.ones_like(x), x], axis=1)
+    coef = np.linalg.lstsq(design, y, rcond=None)[0]
+    residual = (y - design @ coef).reshape(values.shape)
+    median = np.median(residual)
+    mad = 1.4826 * np.median(np.abs(residual - median))
+    return (residual - median) / max(mad, floor)
+
+def cell_scores(ela, noise, texture):
+    """Higher ELA than the texture explains, or noise that differs either way."""
+    return np.maximum(anomaly_z(ela, texture), np.abs(anomaly_z(noise, texture)))
+
+# -------------------------------------------------
+# Tamper map
+# -------------------------------------------------
+def _cell_box(r, c, cell, scale, shape):
+    """Full-resolution box of a grid cell; the origin stays on the 8x8 JPEG grid."""
+    h, w = shape[:2]
+    x0 = int(c * cell / scale) // 8 * 8
+    y0 = int(r * cell / scale) // 8 * 8
+    return x0, y0, min(w, int((c + 1) * cell / scale)), min(h, int((r + 1) * cell / scale))
+
+def _regions(score, threshold, boxes, top_k):
+    """Connected groups of suspicious cells as {"box", "score", "cells"}, best first."""
+    mask = (score >= threshold).astype(np.uint8)
+    count, labels = cv2.connectedComponents(mask, connectivity=4)
+    regions = []
+    for label in range(1, count):
+        cells = np.argwhere(labels == label)
+        cell_boxes = [boxes[r][c] for r, c in cells]
+        regions.append({
+            "box": [min(b[0] for b in cell_boxes), min(b[1] for b in cell_boxes),
+                    max(b[2] for b in cell_boxes), max(b[3] for b in cell_boxes)],
+            "score": round(float(score[labels == label].max()), 2),
+            "cells": int(len(cells)),
+        })
+    return sorted(regions, key=lambda reg: -reg["score"])[:top_k]
+
+def heatmap_png(score, image, threshold, width):
+    """Score grid as a colour overlay on a small copy of the image (PNG bytes)."""
+    h, w = image.shape[:2]
+    size = (width, max(1, int(h * width / float(w))))
+    levels = np.clip(score / (2.0 * threshold), 0.0, 1.0) * 255
+    colors = cv2.applyColorMap(cv2.resize(levels.astype(np.uint8), size, interpolation=cv2.INTER_NEAREST),
+                               cv2.COLORMAP_JET)
+    overlay = cv2.addWeighted(cv2.resize(image, size, interpolation=cv2.INTER_AREA), 0.5, colors, 0.5, 0)
+    ok, encoded = cv2.imencode(".png", overlay)
+    return encoded.tobytes() if ok else None
+
+def analyze_tamper_map(image, heatmap=False, budget_ms=None, executor=None):
+    """
+    Localized ELA / noise-inconsistency map of a card image.
+
+    The whole image is scored cell by cell on a copy bounded to
+    coarse_side. The cells are then re-scored on full-resolution tiles,
+    most suspicious first, in parallel, until budget_ms is spent; cells
+    not reached keep their coarse values, rescaled to the full-resolution
+    level. Cells are scored by cell_scores.
+
+    Returns the score grid, the top suspicious regions (full-resolution
+    boxes), the share of cells refined and, with heatmap=True, a PNG.
+    """
+    cfg = TAMPER_CONFIG
+    t0 = time.perf_counter()
+    budget_ms = cfg["budget_ms"] if budget_ms is None else budget_ms
+    deadline = t0 + budget_ms / 1000.0
+    img = as_image_buffer(image)
+    bgr = img.bgr
+    h, w = bgr.shape[:2]
+
+    scale = min(1.0, cfg["coarse_side"] / float(max(h, w)))
+    small = bgr if scale == 1.0 else cv2.resize(bgr, (max(1, int(w * scale)), max(1, int(h * scale))),
+                                                interpolation=cv2.INTER_AREA)
+    stats = coarse_stats(small, cfg["cell"], cfg["quality"])
+    rows, cols = stats[0].shape
+    boxes = [[_cell_box(r, c, cfg["cell"], scale, bgr.shape) for c in range(cols)] for r in range(rows)]
+
+    refined = np.zeros((rows, cols), bool)
+    exhausted = False
+    if scale < 1.0:
+        order = [divmod(int(i), cols) for i in np.argsort(-cell_scores(*stats), axis=None)]
+
+        def refine(rc):
+            # Tiles not yet started when the budget runs out are skipped
+            if time.perf_counter() > deadline:
+                return rc, None
+            x0, y0, x1, y1 = boxes[rc[0]][rc[1]]
+            return rc, tile_stats(bgr[y0:y1, x0:x1], cfg["quality"])
+
+        fine = [a.copy() for a in stats]
+        for (r, c), values in (executor or get_tile_executor()).map(refine, order):
+            if values is None:
+                exhausted = True
+                continue
+            for a, v in zip(fine, values):
+                a[r, c] = v
+            refined[r, c] = True
+        if refined.any():
+            # Coarse values of the cells not reached, moved to the fine level
+            for coarse, a in zip(stats, fine):
+                a[~refined] = coarse[~refined] * np.median(a[refined] / np.maximum(coarse[refined], 1e-6))
+            stats = fine
+    else:
+        refined[:] = True
+
+    score = cell_scores(*stats)
+    result = {
+        "grid": np.round(score, 2).tolist(),
+        "cell_size": [int(round(cfg["cell"] / scale)), int(round(cfg["cell"] / scale))],
+        "shape": [int(h), int(w)],
+        "max_score": round(float(score.max()), 2),
+        "regions": _regions(score, cfg["threshold"], boxes, cfg["top_k"]),
+        "coverage": round(float(refined.mean()), 3),
+        "budget_exhausted": exhausted,
+        "duration_ms": round((time.perf_counter() - t0) * 1000, 1),
+    }
+    if heatmap:
+        result["heatmap_png"] = heatmap_png(score, small, cfg["threshold"], cfg["heatmap_width"])
+    return result
+
+def forensics_with_tamper_map(image):
+    """
+    analyze_image_forensics plus the tamper map (without the grid);
+    suspicious regions count as a tampering reason.
+    """
+    forensics = analyze_image_forensics(image)
+    try:
+        tamper = analyze_tamper_map(image)
+    except ValueError:
+        return forensics
+    forensics["tamper_map"] = {k: tamper[k] for k in ("max_score", "regions", "coverage", "budget_exhausted")}
+    if tamper["regions"]:
+        forensics["tampering_reasons"] = forensics["tampering_reasons"] + ["Localized ELA/noise anomaly"]
+        forensics["tampering_suspected"] = True
+    return forensics
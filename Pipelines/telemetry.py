@@ -0,0 +1,413 @@
+# FILE: Pipelines/telemetry.py
+import atexit
+import bisect
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Defaults; app.py overrides them from the environment via configure_telemetry()
+TELEMETRY_CONFIG = {
+    "spans_path": None,          # JSONL file for spans; None = spans off
+    "service_name": "raksha",
+}
+
+def configure_telemetry(**options):
+    unknown = set(options) - set(TELEMETRY_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown telemetry options: {sorted(unknown)}")
+    TELEMETRY_CONFIG.update({k: v for k, v in options.items() if v is not None})
+    span_exporter.open(TELEMETRY_CONFIG["spans_path"])
+
+
+# -------------------------------------------------
+# Metrics (Prometheus text exposition format)
+# -------------------------------------------------
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTE_BUCKETS = (16e3, 64e3, 256e3, 1e6, 2e6, 4e6, 8e6, 16e6)
+PIXEL_BUCKETS = (0.25e6, 0.5e6, 1e6, 2e6, 4e6, 8e6, 16e6, 32e6)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _label_text(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class MetricsRegistry:
+    """Every metric of the process, rendered together by render()."""
+
+    def __init__(self):
+        self.metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """Adds `metric`, replacing one of the same name (e.g. app.py imported again)."""
+        with self._lock:
+            self.metrics = [m for m in self.metrics if m.name != metric.name] + [metric]
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in list(self.metrics):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=(), registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_label_text(self.labels, key)} {_number(v)}" for key, v in values]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS, registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # per-bucket counts (+Inf last), sum
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def samples(self):
+        with self._lock:
+            series = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        lines = []
+        for key, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {round(total, 6)}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, key)} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """
+    Gauge (or counter) read from `read()` at scrape time, for values other
+    components already keep (queue depths, admission counters).
+    """
+
+    def __init__(self, name, help, read, kind="gauge", registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.kind = kind
+        registry.register(self)
+
+    def samples(self):
+        try:
+            return [f"{self.name} {_number(self.read())}"]
+        except Exception:
+            return []
+
+
+STAGE_SECONDS = Histogram("raksha_stage_duration_seconds", "Pipeline stage latency.", ["stage"])
+STAGE_ERRORS = Counter("raksha_stage_errors_total", "Pipeline stages that raised.", ["stage"])
+REQUEST_SECONDS = Histogram("raksha_http_request_duration_seconds", "HTTP request latency, until the last byte.",
+                            ["route", "method", "status"])
+REQUEST_ERRORS = Counter("raksha_http_request_errors_total", "HTTP requests answered with 5xx or that raised.",
+                         ["route", "method"])
+QUEUE_WAIT_SECONDS = Histogram("raksha_queue_wait_seconds", "Time spent queued before work started.", ["queue"])
+IMAGE_BYTES = Histogram("raksha_image_bytes", "Encoded size of decoded uploads.", buckets=BYTE_BUCKETS)
+IMAGE_PIXELS = Histogram("raksha_image_pixels", "Pixel count of decoded images.", buckets=PIXEL_BUCKETS)
+DECISIONS = Counter("raksha_decisions_total", "Final decisions served.", ["decision"])
+
+def record_decision(final_decision):
+    """Counts one served final_decision dict (ACCEPTED/SUSPICIOUS/FRAUD/REJECTED)."""
+    if final_decision:
+        DECISIONS.inc(decision=final_decision.get("final_decision", "UNKNOWN"))
+
+
+# -------------------------------------------------
+# Spans (OpenTelemetry-style JSON lines)
+# -------------------------------------------------
+class SpanExporter:
+    """
+    Appends finished spans to a JSONL file from a background thread, so
+    the request path only pays for a queue put.
+    """
+
+    def __init__(self):
+        self.path = None
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def open(self, path):
+        with self._lock:
+            self.path = path or None
+            if self.path is not None and (self._thread is None or not self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                self._thread.start()
+
+    def export(self, record):
+        if self.path is not None:
+            self._queue.put(record)
+
+    def _drain(self, first=None):
+        batch = [] if first is None else [first]
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if not batch or self.path is None:
+            return
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(r, default=str) + "\n" for r in batch)
+        except (OSError, TypeError):
+            logger.warning("Could not write %d spans to %s", len(batch), self.path, exc_info=True)
+
+    def _run(self):
+        while True:
+            self._drain(self._queue.get())
+
+    def flush(self):
+        """Writes the queued spans now (at exit)."""
+        with self._lock:
+            self._drain()
+
+    def _after_fork(self):
+        # A forked child inherits the queue but not the thread draining it
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+        if self.path is not None:
+            self.open(self.path)
+
+span_exporter = SpanExporter()
+_current_span = contextvars.ContextVar("raksha_span", default=None)
+
+
+class Span:
+    """One timed operation; started by __init__, finished by end()."""
+
+    __slots__ = ("name", "attributes", "trace_id", "span_id", "parent_id", "start", "start_ns", "duration",
+                 "_token")
+
+    def __init__(self, name, attributes=None):
+        self.name = name
+        self.attributes = attributes or {}
+        self.duration = None
+        self._token = None
+        if span_exporter.enabled:
+            parent = _current_span.get()
+            self.trace_id = parent.trace_id if parent is not None else os.urandom(16).hex()
+            self.parent_id = parent.span_id if parent is not None else None
+            self.span_id = os.urandom(8).hex()
+            self.start_ns = time.time_ns()
+            self._token = _current_span.set(self)
+        self.start = time.perf_counter()
+
+    def end(self, error=None):
+        self.duration = time.perf_counter() - self.start
+        if self._token is None:
+            return self.duration
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # Ended in another context (e.g. a generator finalized elsewhere)
+            pass
+        span_exporter.export({
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.start_ns + int(self.duration * 1e9),
+            "status": {"code": "ERROR", "message": repr(error)} if error is not None else {"code": "OK"},
+            "attributes": self.attributes,
+            "resource": {"service.name": TELEMETRY_CONFIG["service_name"], "process.pid": os.getpid()},
+        })
+        return self.duration
+
+
+@contextmanager
+def span(name, metric=None, errors=None, labels=None, **attributes):
+    """
+    Times the block: observes the duration (seconds) in the `metric`
+    histogram with `labels`, counts exceptions in `errors`, and exports a
+    span when spans are on. Spans opened inside become its children.
+    """
+    labels = labels or {}
+    current = Span(name, {**labels, **attributes})
+    try:
+        yield current
+    except BaseException as e:
+        duration = current.end(error=e)
+        if metric is not None:
+            metric.observe(duration, **labels)
+        # Cancellation (an early exit) is not an error
+        if errors is not None and isinstance(e, Exception):
+            errors.inc(**labels)
+        raise
+    duration = current.end()
+    if metric is not None:
+        metric.observe(duration, **labels)
+
+def stage_span(stage):
+    """span() for one pipeline stage."""
+    return span(f"stage {stage}", STAGE_SECONDS, STAGE_ERRORS, {"stage": stage})
+
+
+# -------------------------------------------------
+# ASGI middleware: per-route latency and errors
+# -------------------------------------------------
+class RequestMetricsMiddleware:
+    """
+    Times every HTTP request until its last byte is sent, labelled by the
+    route template (not the raw path, so ids do not explode the label
+    set), method and status; the request span is the parent of the
+    stage spans it runs.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = [500]
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        current = Span(f"{scope['method']} {scope['path']}", {"http.method": scope["method"]})
+        error = None
+        try:
+            await self.app(scope, receive, send_with_status)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "<unmatched>"
+            current.name = f"{scope['method']} {route}"
+            current.attributes.update({"http.route": route, "http.status_code": status[0]})
+            duration = current.end(error)
+            REQUEST_SECONDS.observe(duration, route=route, method=scope["method"], status=str(status[0]))
+            if error is not None or status[0] >= 500:
+                REQUEST_ERRORS.inc(route=route, method=scope["method"])
+
+
+# -------------------------------------------------
+# Logging
+# -------------------------------------------------
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra=` fields become keys."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update({k: v for k, v in vars(record).items() if k not in _RECORD_FIELDS})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+_log_listener = None
+_log_handler = None
+
+def _start_log_listener():
+    global _log_listener
+    records = queue.SimpleQueue()
+    _log_listener = logging.handlers.QueueListener(records, _log_handler)
+    logging.getLogger().handlers = [logging.handlers.QueueHandler(records)]
+    _log_listener.start()
+
+def configure_logging(level="INFO", json_format=False):
+    """
+    Root logging at `level`. Records are handed to a background thread
+    (QueueHandler/QueueListener), so a slow stdout never blocks a request.
+    """
+    global _log_handler
+    if _log_listener is not None:
+        _log_listener.stop()
+    _log_handler = logging.StreamHandler()
+    _log_handler.setFormatter(JsonFormatter() if json_format else
+                              logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logging.getLogger().setLevel(level.upper() if isinstance(level, str) else level)
+    _start_log_listener()
+
+def flush_telemetry():
+    """Writes queued spans and log records; call before os._exit()."""
+    span_exporter.flush()
+    if _log_listener is not None:
+        _log_listener.stop()
+
+atexit.register(flush_telemetry)
+
+def _after_fork_in_child():
+    # prefork.py imports the app (and starts these threads) before forking
+    # its workers; without this every worker's logs and spans would queue
+    # up unread.
+    span_exporter._after_fork()
+    if _log_listener is not None:
+        _start_log_listener()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
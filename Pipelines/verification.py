@@ -0,0 +1,234 @@
+# FILE: Pipelines/verification.py
+import asyncio
+from contextlib import aclosing
+
+from Pipelines.image_buffer import ImageBuffer
+from Pipelines.CNN_predict import CNN_FALLBACK_RESULT
+from Pipelines.result_cache import content_digest
+from Pipelines.preprocess import preprocess_document
+from Pipelines.ocr_extractor import run_ocr
+from Pipelines.extract_Aadhaar import extract_fields_detailed
+from Pipelines.rule_validator import rule_validation
+from Pipelines.qr_validator import validate_qr
+from Pipelines.consistency_checker import build_consistency
+from Pipelines.forensic_analyzer import analyze_image_forensics
+from Pipelines.fraud_assement import assess_fraud
+from Pipelines.model_json import predict_fraud
+from Pipelines.final_decision import make_final_decision
+from Pipelines.stage_graph import Stage, StageGraph
+
+# Outputs a verify-full response is built from
+REPORT_OUTPUTS = ("cnn_out", "aadhaar_fields", "qr_result", "fraud_ml", "final_decision")
+
+# Outputs of the expensive, image-only stages; these go in the result cache
+CACHEABLE_OUTPUTS = ("cnn_out", "ocr_result", "qr_result", "forensics")
+
+# -------------------------------------------------
+# Stage helpers
+# -------------------------------------------------
+def preprocess_buffer(raw_image, size=None):
+    """
+    Cleans the card in memory (at `size`, default the configured
+    preprocessing size); falls back to the raw image.
+    """
+    try:
+        processed_data = preprocess_document(raw_image, size)
+        return ImageBuffer(processed_data["processed_image"], "<preprocessed>")
+    except Exception:
+        return raw_image
+
+def validate_qr_with_backup(image, qr_backup_bytes):
+    """Reads the QR from the card, then from the separate QR upload if given."""
+    qr_result = validate_qr(image)
+
+    if qr_result["status"] != "DECODED" and qr_backup_bytes:
+        backup_qr = validate_qr(qr_backup_bytes)
+        if backup_qr["status"] == "DECODED": qr_result = backup_qr
+
+    return qr_result
+
+def build_ml_record(validation, consistency, forensics, aadhaar_fields, qr_result):
+    return {
+        "validation": validation, "consistency": consistency,
+        "image_forensics": forensics, "ocr_extracted": aadhaar_fields, "qr": qr_result
+    }
+
+# -------------------------------------------------
+# Full verification graph
+# -------------------------------------------------
+def build_verification_graph(cnn_predictor, get_fraud_model, card_ocr=None, forensics=None):
+    """
+    Stage graph behind /api/verify-full.
+
+    Inputs:  upload_bytes, qr_backup_bytes
+    Outputs: cnn_out, cnn_quick_out, aadhaar_fields, field_confidence, qr_result, forensics,
+             validation, consistency, fraud_rule, fraud_ml, final_decision
+    `cnn_predictor` is an awaitable callable taking an ImageBuffer;
+    `get_fraud_model()` returns the (lazily loaded) RandomForest.
+    `card_ocr(image, cnn_out)` (e.g. a LayoutOCR) replaces full-page OCR;
+    OCR then waits for the CNN.
+    `forensics(raw_image)` (e.g. forensics_with_tamper_map) replaces
+    analyze_image_forensics.
+    """
+    if card_ocr is None:
+        ocr_stage = Stage("ocr", run_ocr, ["image"], ["ocr_result"])
+    else:
+        ocr_stage = Stage("ocr", card_ocr, ["image", "cnn_out"], ["ocr_result"])
+
+    return StageGraph([
+        Stage("decode", lambda data: ImageBuffer.from_bytes(data), ["upload_bytes"], ["raw_image"]),
+        Stage("preprocess", preprocess_buffer, ["raw_image"], ["image"]),
+        Stage("cnn", cnn_predictor, ["image"], ["cnn_out"]),
+        # Cheap pre-check on the raw upload, only run when asked for (cascade)
+        Stage("cnn_quick", cnn_predictor, ["raw_image"], ["cnn_quick_out"]),
+        ocr_stage,
+        Stage("qr", validate_qr_with_backup, ["image", "qr_backup_bytes"], ["qr_result"]),
+        Stage("forensics", forensics or analyze_image_forensics, ["raw_image"], ["forensics"]),
+        Stage("extract_fields", extract_fields_detailed, ["ocr_result"], ["aadhaar_fields", "field_confidence"]),
+        Stage("rule_validation", lambda fields, qr: rule_validation(fields, qr["status"]),
+              ["aadhaar_fields", "qr_result"], ["validation"]),
+        Stage("consistency", build_consistency, ["aadhaar_fields", "qr_result"], ["consistency"]),
+        Stage("assess_fraud", assess_fraud,
+              ["validation", "qr_result", "consistency", "forensics"], ["fraud_rule"]),
+        Stage("ml_record", build_ml_record,
+              ["validation", "consistency", "forensics", "aadhaar_fields", "qr_result"], ["record_for_ml"]),
+        Stage("predict_fraud", lambda record: predict_fraud(get_fraud_model(), record),
+              ["record_for_ml"], ["fraud_ml"]),
+        Stage("final_decision", make_final_decision,
+              ["cnn_out", "fraud_ml", "fraud_rule"], ["final_decision"]),
+    ])
+
+# -------------------------------------------------
+# Cached execution
+# -------------------------------------------------
+def _cache_slot(output, values):
+    # The QR result also depends on the optional separate QR upload
+    if output == "qr_result" and values.get("qr_backup_bytes"):
+        return f"qr_result+{content_digest(values['qr_backup_bytes'])}"
+    return output
+
+def load_cached(cache, digest, values, wanted=CACHEABLE_OUTPUTS):
+    """Returns the cached heavy-stage outputs for this upload."""
+    found = {}
+    for output in wanted:
+        if output in values:
+            continue
+        value = cache.get(digest, _cache_slot(output, values))
+        if value is not None:
+            found[output] = value
+    return found
+
+def store_cached(cache, digest, values, computed):
+    for output in CACHEABLE_OUTPUTS:
+        if output not in computed or output not in values:
+            continue
+        # Never cache the CNN's error fallback
+        if output == "cnn_out" and values[output] == CNN_FALLBACK_RESULT:
+            continue
+        cache.put(digest, _cache_slot(output, values), values[output])
+
+async def _load_from_cache(graph, values, executor, cache, targets):
+    """Fills `values` with cached outputs; returns (digest, hits)."""
+    if cache is None or values.get("upload_bytes") is None:
+        return None, []
+    loop = asyncio.get_running_loop()
+    digest = values.get("content_digest")
+    if digest is None:
+        digest = await loop.run_in_executor(executor, content_digest, values["upload_bytes"])
+        values["content_digest"] = digest
+    # Only look up what this run would otherwise compute
+    needed = {out for stage in graph.required_stages(targets, values) for out in stage.outputs}
+    wanted = [out for out in CACHEABLE_OUTPUTS if out in needed]
+    found = await loop.run_in_executor(executor, load_cached, cache, digest, values, wanted)
+    values.update(found)
+    return digest, sorted(found)
+
+async def _store_in_cache(graph, values, timings, executor, cache, digest):
+    if digest is None:
+        return
+    computed = {out for stage in graph.stages if stage.name in timings for out in stage.outputs}
+    await asyncio.get_running_loop().run_in_executor(executor, store_cached, cache, digest, values, computed)
+
+async def run_verification(graph, values, executor=None, cache=None, targets=REPORT_OUTPUTS):
+    """
+    Runs the stages needed for `targets`, reusing cached heavy-stage
+    outputs when `values` carries the upload bytes and a cache is given.
+    Returns (values, timings, cache_hits).
+    """
+    values = dict(values)
+    digest, hits = await _load_from_cache(graph, values, executor, cache, targets)
+    values, timings = await graph.run(values, executor=executor, targets=targets)
+    await _store_in_cache(graph, values, timings, executor, cache, digest)
+    return values, timings, hits
+
+def is_non_aadhaar(cnn_out):
+    return cnn_out.get("project_label") == "NON_AADHAAR"
+
+async def stream_verification(graph, values, executor=None, cache=None, targets=REPORT_OUTPUTS):
+    """
+    Like run_verification, but an async generator yielding one event per
+    stage as it completes: {"stage", "outputs", "duration_ms", "cached"}.
+    Cached outputs are reported first. When the CNN says NON_AADHAAR the
+    remaining stages are cancelled and a final_decision event with
+    "short_circuit": True ends the stream.
+    """
+    values = dict(values)
+    digest, hits = await _load_from_cache(graph, values, executor, cache, targets)
+    for output in hits:
+        yield {"stage": graph.producers[output].name, "outputs": {output: values[output]},
+               "duration_ms": 0.0, "cached": True}
+
+    timings = {}
+    short_circuit = "cnn_out" in values and is_non_aadhaar(values["cnn_out"])
+    if not short_circuit:
+        async with aclosing(graph.stream(values, executor, targets)) as events:
+            async for name, outputs, timing in events:
+                values.update(outputs)
+                timings[name] = timing
+                yield {"stage": name, "outputs": outputs, "duration_ms": timing["duration_ms"], "cached": False}
+                if "cnn_out" in outputs and is_non_aadhaar(outputs["cnn_out"]):
+                    short_circuit = True
+                    break
+
+    await _store_in_cache(graph, values, timings, executor, cache, digest)
+
+    if short_circuit:
+        yield {"stage": "final_decision", "outputs": {"final_decision": make_final_decision(values["cnn_out"], None)},
+               "duration_ms": 0.0, "cached": False, "short_circuit": True}
+
+def verification_response(values):
+    """
+    The public verify-full result built from the stage outputs.
+    Outputs of stages skipped by an early exit are None.
+    """
+    return {
+        "cnn_result": values.get("cnn_out"),
+        "ocr_extracted": values.get("aadhaar_fields"),
+        "ocr_confidence": values.get("field_confidence"),
+        "qr": values.get("qr_result"),
+        "final_decision": values["final_decision"],
+        "fraud_ml": values.get("fraud_ml")
+    }
+
+def verified_user_record(values):
+    """Database row for an ACCEPTED card, or None."""
+    aadhaar_fields = values.get("aadhaar_fields") or {}
+    if values["final_decision"].get("final_decision") != "ACCEPTED" or not aadhaar_fields.get("aadhaar_number"):
+        return None
+    prob = values["fraud_ml"].get("fraud_probability", 0)
+    return {
+        "aadhaar_number": aadhaar_fields.get("aadhaar_number", "").replace(" ", ""),
+        "name": aadhaar_fields.get("name"),
+        "dob": aadhaar_fields.get("dob"),
+        "gender": aadhaar_fields.get("gender"),
+        "status": "ACCEPTED",
+        "confidence": (1 - prob) * 100
+    }
+
+def timing_report(graph, timings):
+    """Per-stage breakdown plus the critical path, for opt-in responses."""
+    return {
+        "stages": timings,
+        "critical_path": graph.critical_path(timings),
+        "total_ms": max((t["end_ms"] for t in timings.values()), default=0.0),
+    }
@@ -0,0 +1,129 @@
+# FILE: Pipelines/verification_session.py
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from Pipelines.image_buffer import ImageBuffer
+
+def estimate_size(values):
+    """Rough memory held by a dict of stage values, in bytes."""
+    total = 0
+    for value in values.values():
+        if isinstance(value, ImageBuffer):
+            total += value.nbytes
+        elif isinstance(value, np.ndarray):
+            total += value.nbytes
+        elif isinstance(value, (bytes, bytearray)):
+            total += len(value)
+        else:
+            total += 1024
+    return total
+
+# -------------------------------------------------
+# Server-side verification sessions
+# -------------------------------------------------
+class VerificationSessions:
+    """
+    Keeps the stage values of one customer's card (decoded and
+    preprocessed images, CNN/OCR outputs) between the analyze-card,
+    verify-face and verify-full steps, under a random token.
+
+    Sessions expire `ttl` seconds after creation; the least recently used
+    are evicted once `max_sessions` or `max_bytes` would be exceeded.
+    Stored values are shared: treat them as read-only. ImageBuffers keep
+    the views computed from them (gray, resized copies), so sizes are
+    measured again on every create() and get().
+    """
+
+    def __init__(self, max_sessions=256, max_bytes=512 * 1024 * 1024, ttl=900.0):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.created = 0
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.expired = 0
+
+    def create(self, values, owner=None):
+        """Stores `values` and returns the new token."""
+        token = secrets.token_urlsafe(24)
+        size = estimate_size(values)
+        with self._lock:
+            self._expire(time.monotonic())
+            self._sessions[token] = {
+                "values": dict(values), "owner": owner,
+                "created": time.monotonic(), "size": size,
+            }
+            self._bytes += size
+            self.created += 1
+            for session in self._sessions.values():
+                self._measure(session)
+            self._evict(keep=0)
+        return token
+
+    def get(self, token, owner=None):
+        """The stored values, or None if unknown, expired or not the owner's."""
+        if not token:
+            return None
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is not None and time.monotonic() - session["created"] > self.ttl:
+                self._drop(token)
+                self.expired += 1
+                session = None
+            if session is None or session["owner"] != owner:
+                self.misses += 1
+                return None
+            self._sessions.move_to_end(token)
+            self._measure(session)
+            self._evict(keep=1)
+            self.hits += 1
+            return session["values"]
+
+    def discard(self, token):
+        with self._lock:
+            if token in self._sessions:
+                self._drop(token)
+
+    def _drop(self, token):
+        self._bytes -= self._sessions.pop(token)["size"]
+
+    def _measure(self, session):
+        size = estimate_size(session["values"])
+        self._bytes += size - session["size"]
+        session["size"] = size
+
+    def _evict(self, keep):
+        """Drops the least recently used sessions, sparing the `keep` most recent, until within the limits."""
+        while len(self._sessions) > keep and (len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes):
+            _, old = self._sessions.popitem(last=False)
+            self._bytes -= old["size"]
+            self.evicted += 1
+
+    def _expire(self, now):
+        for token in [t for t, s in self._sessions.items() if now - s["created"] > self.ttl]:
+            self._drop(token)
+            self.expired += 1
+
+    def stats(self):
+        with self._lock:
+            for session in self._sessions.values():
+                self._measure(session)
+            return {
+                "sessions": len(self._sessions),
+                "bytes": self._bytes,
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+                "created": self.created,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evicted": self.evicted,
+                "expired": self.expired,
+            }
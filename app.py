@@ -1,35 +1,66 @@
 import os
-import cv2
-import joblib
-import tempfile
+import io
+import base64
+import asyncio
 import json  
+import logging
+import zipfile
 import hashlib
-import tensorflow as tf
 import webbrowser
 import threading
-from typing import Optional
+from typing import List, Optional
+from contextlib import aclosing, asynccontextmanager
 from fastapi import FastAPI, UploadFile, File, Request, Body
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.middleware.sessions import SessionMiddleware
 import database
+from execution import ExecutionLayer
 
 # --- PIPELINE IMPORTS ---
-from Pipelines.preprocess import preprocess_document
-from Pipelines.CNN_predict import cnn_predict
-from Pipelines.ocr_extractor import run_ocr
-from Pipelines.extract_Aadhaar import extract_fields
-from Pipelines.rule_validator import rule_validation
-from Pipelines.qr_validator import validate_qr
-from Pipelines.consistency_checker import build_consistency
-from Pipelines.forensic_analyzer import analyze_image_forensics
-from Pipelines.fraud_assement import assess_fraud
-from Pipelines.model_json import predict_fraud
-from Pipelines.final_decision import make_final_decision
-from Pipelines.face_matcher import verify_face # <--- NEW IMPORT
-
-app = FastAPI(title="RakshaUID Identity Defense")
+from Pipelines.face_matcher import card_face, card_faces, file_card_id, match_faces, verify_face
+from Pipelines.batch_inference import CNNBatcher
+from Pipelines.model_registry import ModelRegistry
+from Pipelines.CNN_predict import CNN_CONFIG, cnn_model_path, configure_cnn, load_cnn_model, warmup_cnn
+from Pipelines.model_json import configure_fraud, fraud_model_path, load_fraud_model, warmup_fraud
+from Pipelines.ocr_extractor import configure_ocr, get_ocr_engine, ocr_model_dir, ocr_stats, ocr_version, warmup_ocr
+from Pipelines.layout_ocr import LayoutOCR
+from Pipelines.qr_validator import configure_qr, qr_stats
+from Pipelines.preprocess import configure_preprocess, preprocess_version
+from Pipelines.forensic_analyzer import configure_forensics, forensics_version
+from Pipelines.tamper_map import analyze_tamper_map, configure_tamper_map, forensics_with_tamper_map
+from Pipelines.image_buffer import ImageDecodeError
+from Pipelines.result_cache import (ResultCache, MemoryCacheBackend, SqliteCacheBackend, content_digest,
+                                    ensure_private_dir)
+from Pipelines.verification_session import VerificationSessions
+from Pipelines.telemetry import (
+    REGISTRY, CallbackMetric, RequestMetricsMiddleware, configure_logging, configure_telemetry, record_decision
+)
+from Pipelines.cascade import CascadePlanner, DEFAULT_STEPS, non_aadhaar_rule, quick_non_aadhaar_rule
+from Pipelines.bulk_scoring import BatchJobStore, cnn_infer_batcher, is_image_name, iter_zip_images, score_batch
+from Pipelines.verification import (
+    build_verification_graph, run_verification, stream_verification, timing_report,
+    verification_response, verified_user_record
+)
+
+@asynccontextmanager
+async def lifespan(app):
+    # Optional background warm-up; /readyz reports 503 until it finishes
+    if os.getenv("RAKSHA_WARMUP_ON_STARTUP", "0") == "1":
+        asyncio.get_running_loop().run_in_executor(execution.cpu_pool, models.warmup)
+    yield
+
+app = FastAPI(title="RakshaUID Identity Defense", lifespan=lifespan)
+
+# --- LOGGING & TELEMETRY ---
+# Log records are written by a background thread. /metrics serves stage,
+# route, queue-wait, image-size and decision metrics in Prometheus format;
+# RAKSHA_SPANS_PATH additionally appends one JSON span per stage/request.
+configure_logging(os.getenv("RAKSHA_LOG_LEVEL", "INFO"), json_format=os.getenv("RAKSHA_LOG_FORMAT", "text") == "json")
+configure_telemetry(spans_path=os.getenv("RAKSHA_SPANS_PATH") or None)
+app.add_middleware(RequestMetricsMiddleware)
+logger = logging.getLogger("raksha")
 
 # --- SECURITY CONFIG ---
 app.add_middleware(
@@ -50,25 +81,214 @@ def load_users():
 def save_users(db_data):
     with open(DB_FILE, "w") as f: json.dump(db_data, f, indent=4)
 
+# Signups run on the I/O pool; serialize the read-modify-write of the JSON file
+_users_lock = threading.Lock()
+
+def register_user(email, password):
+    with _users_lock:
+        users_db = load_users()
+        if email in users_db: return False
+        users_db[email] = {"password": hash_password(password), "created_at": "today"}
+        save_users(users_db)
+        return True
+
 def hash_password(password: str) -> str:
     return hashlib.sha256(password.encode()).hexdigest()
 
 # --- CONFIGURATION ---
 UPLOAD_DIR = "static/uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
+# Private (0700) directory for service state such as the sqlite result cache
+DATA_DIR = os.getenv("RAKSHA_DATA_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+def write_file(path, data):
+    with open(path, "wb") as buffer:
+        buffer.write(data)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
-# --- LOAD MODELS ---
-try:
-    cnn_model = tf.keras.models.load_model("Models/aadhaar_classifier_final.h5")
-    fraud_model = joblib.load("Models/RandomForest_model.pkl")
-    print("Models Loaded Successfully.")
-except Exception as e:
-    print(f"Warning: Models not found ({e}).")
-    cnn_model = None
-    fraud_model = None
+# --- OCR ENGINE POOL ---
+# Pool size x threads per engine should roughly match the cores given to OCR;
+# see benchmarks/ocr_pool.py.
+configure_ocr(
+    pool_size=int(os.getenv("RAKSHA_OCR_POOL_SIZE", "1")),
+    cpu_threads=int(os.getenv("RAKSHA_OCR_CPU_THREADS", "0")) or None,
+    enable_mkldnn={"1": True, "0": False}.get(os.getenv("RAKSHA_OCR_MKLDNN", "")),
+    rec_batch_size=int(os.getenv("RAKSHA_OCR_REC_BATCH", "0")) or None,
+    max_batch=int(os.getenv("RAKSHA_OCR_MAX_BATCH", "4")),
+    max_wait_ms=float(os.getenv("RAKSHA_OCR_MAX_WAIT_MS", "5")),
+)
+
+# --- QR DECODING ---
+# Candidate regions are located on a downscaled copy and only those crops are
+# decoded; the whole frame is tried last, if time is left. See benchmarks/qr_decode.py.
+configure_qr(
+    budget_ms=float(os.getenv("RAKSHA_QR_BUDGET_MS", "300")),
+    full_frame_fallback=os.getenv("RAKSHA_QR_FULL_FRAME", "1") == "1",
+)
+
+# --- PREPROCESSING ---
+# Size of the cleaned card that OCR and QR read (the CNN takes its 224x224
+# copy from it, forensics use the original upload). Deskewing estimates the
+# angle on a small copy. See benchmarks/preprocess.py.
+configure_preprocess(
+    size=tuple(int(v) for v in os.getenv("RAKSHA_PREPROCESS_SIZE", "1024x640").lower().split("x")),
+    deskew=os.getenv("RAKSHA_DESKEW", "0") == "1",
+)
+
+# --- IMAGE FORENSICS ---
+# RAKSHA_FORENSICS_ELA_MAX_SIDE bounds the copy ELA runs on (0 = full
+# resolution, the values the fraud model was trained on). Extra registered
+# tamper features are added to the forensics output. See benchmarks/forensics.py.
+configure_forensics(
+    ela_max_side=int(os.getenv("RAKSHA_FORENSICS_ELA_MAX_SIDE", "0")),
+    extra_features=tuple(f for f in os.getenv("RAKSHA_FORENSICS_EXTRA", "").split(",") if f),
+)
+
+# --- TAMPER MAP ---
+# Localized ELA / noise-inconsistency map: scored on a bounded copy, then
+# refined on full-resolution tiles until the budget is spent. With
+# RAKSHA_TAMPER_MAP=1 it is part of every forensics result (suspicious
+# regions count as a tampering reason). See benchmarks/tamper_map.py.
+TAMPER_MAP = os.getenv("RAKSHA_TAMPER_MAP", "0") == "1"
+configure_tamper_map(
+    budget_ms=float(os.getenv("RAKSHA_TAMPER_BUDGET_MS", "500")),
+    workers=int(os.getenv("RAKSHA_TAMPER_WORKERS", "4")),
+    threshold=float(os.getenv("RAKSHA_TAMPER_THRESHOLD", "6")),
+)
+
+# --- LAYOUT-AWARE OCR ---
+# "roi": once the CNN confirms an Aadhaar card, only the name / DOB / gender /
+# number regions are recognized; anything doubtful falls back to the full
+# page. "full": always the whole page. Compare them with benchmarks/layout_ocr.py.
+OCR_MODE = os.getenv("RAKSHA_OCR_MODE", "full")
+OCR_ROI_MIN_SCORE = float(os.getenv("RAKSHA_OCR_ROI_MIN_SCORE", "0.8"))
+OCR_ROI_MIN_CNN_CONF = float(os.getenv("RAKSHA_OCR_ROI_MIN_CNN_CONF", "0.6"))
+
+card_ocr = LayoutOCR(min_cnn_confidence=OCR_ROI_MIN_CNN_CONF, min_score=OCR_ROI_MIN_SCORE) if OCR_MODE == "roi" else None
+
+# --- CNN BACKEND ---
+# "keras": the .h5 model. "tflite": the export written by export_cnn.py (run
+# it first; its report compares accuracy and latency with the .h5 model).
+configure_cnn(
+    backend=os.getenv("RAKSHA_CNN_BACKEND", "keras"),
+    tflite_path=os.getenv("RAKSHA_CNN_TFLITE_PATH") or None,
+    threads=int(os.getenv("RAKSHA_CNN_THREADS", "0")) or None,
+)
+
+# --- FRAUD MODEL BACKEND ---
+# "sklearn": the pickled RandomForest. "compiled": the flat-array forest
+# written by compile_fraud_model.py (same probabilities, faster per record).
+configure_fraud(
+    backend=os.getenv("RAKSHA_FRAUD_BACKEND", "sklearn"),
+    compiled_path=os.getenv("RAKSHA_FRAUD_COMPILED_PATH") or None,
+)
+
+# --- MODEL REGISTRY ---
+# Models load on first use (or via /admin/warmup), so importing this module
+# stays fast and routes like /login never pay for TensorFlow or PaddleOCR.
+models = ModelRegistry()
+# A Keras model loaded before fork hangs on its first predict() in the child
+# (TensorFlow's runtime does not survive fork); TFLite interpreters do.
+# PaddleOCR's predictor has not been verified after fork, so each worker builds its own.
+models.register("cnn", load_cnn_model, warmup=warmup_cnn, fork_safe=CNN_CONFIG["backend"] == "tflite")
+models.register("fraud", load_fraud_model, warmup=warmup_fraud)
+models.register("ocr", get_ocr_engine, warmup=warmup_ocr, fork_safe=False)
+
+# --- EXECUTION LAYER ---
+# Blocking CV/ML work runs on the CPU pool, sqlite/files on the I/O pool.
+# Heavy routes are admission-controlled and get a per-request deadline.
+execution = ExecutionLayer(
+    cpu_workers=int(os.getenv("RAKSHA_CPU_WORKERS", "0")) or None,
+    io_workers=int(os.getenv("RAKSHA_IO_WORKERS", "8")),
+    max_in_flight=int(os.getenv("RAKSHA_MAX_IN_FLIGHT", "0")) or None,
+    max_queue=int(os.getenv("RAKSHA_MAX_QUEUE", "32")),
+    default_deadline=float(os.getenv("RAKSHA_REQUEST_DEADLINE_S", "60")),
+)
+
+# Database lookups share the I/O pool; writes go through the group-commit queue
+database.configure_storage(executor=execution.io_pool)
+
+# --- CNN MICRO-BATCHING ---
+# Concurrent requests are grouped into one forward pass.
+CNN_MAX_BATCH = int(os.getenv("RAKSHA_CNN_MAX_BATCH", "16"))
+CNN_MAX_WAIT_MS = float(os.getenv("RAKSHA_CNN_MAX_WAIT_MS", "5"))
+
+cnn_batcher = CNNBatcher(model_loader=lambda: models.get("cnn"), max_batch_size=CNN_MAX_BATCH, max_wait_ms=CNN_MAX_WAIT_MS,
+                         preprocess_executor=execution.cpu_pool)
+
+# --- RESULT CACHE ---
+# Keyed by SHA-256 of the upload + a stamp of the model files (CNN, fraud
+# model, PaddleOCR's model directory and package versions), so replacing a
+# model invalidates everything. "sqlite" shares the cache across workers.
+CACHE_BACKEND = os.getenv("RAKSHA_CACHE_BACKEND", "memory")
+CACHE_MAX_ENTRIES = int(os.getenv("RAKSHA_CACHE_MAX_ENTRIES", "1024"))
+CACHE_TTL_S = float(os.getenv("RAKSHA_CACHE_TTL_S", "3600"))
+
+if CACHE_BACKEND == "sqlite":
+    _cache_backend = SqliteCacheBackend(
+        os.getenv("RAKSHA_CACHE_PATH") or os.path.join(ensure_private_dir(DATA_DIR), "raksha_result_cache.db"),
+        max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_S)
+elif CACHE_BACKEND == "memory":
+    _cache_backend = MemoryCacheBackend(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_S)
+else:
+    _cache_backend = None
+
+result_cache = ResultCache(_cache_backend, model_paths=[cnn_model_path(), fraud_model_path(), ocr_model_dir()],
+                           extra_version=[f"ocr={OCR_MODE}", ocr_version(), preprocess_version(), forensics_version(),
+                                          f"tamper={int(TAMPER_MAP)}/{os.getenv('RAKSHA_TAMPER_THRESHOLD', '6')}"]
+                           ) if _cache_backend is not None else None
+
+# --- VERIFICATION SESSIONS ---
+# analyze-card keeps its decoded images and CNN/OCR outputs here so that
+# verify-face and verify-full do not repeat them. Sessions live in the memory
+# of one worker; clients also send the card, which is used when the token is unknown.
+SESSION_MAX = int(os.getenv("RAKSHA_SESSION_MAX", "256"))
+SESSION_MAX_MB = int(os.getenv("RAKSHA_SESSION_MAX_MB", "512"))
+SESSION_TTL_S = float(os.getenv("RAKSHA_SESSION_TTL_S", "900"))
+
+verification_sessions = VerificationSessions(max_sessions=SESSION_MAX, max_bytes=SESSION_MAX_MB * 1024 * 1024,
+                                             ttl=SESSION_TTL_S)
+
+# --- BATCH JOBS ---
+# /api/verify-batch jobs run in the background, one at a time per process,
+# in chunks of BATCH_CHUNK images (one CNN batch + one RandomForest call each).
+BATCH_CHUNK = int(os.getenv("RAKSHA_BATCH_CHUNK", "32"))
+BATCH_MAX_FILES = int(os.getenv("RAKSHA_BATCH_MAX_FILES", "1000"))
+# Image bytes held per upload, and jobs running or queued; beyond that 503
+BATCH_MAX_MB = float(os.getenv("RAKSHA_BATCH_MAX_MB", "256"))
+BATCH_MAX_JOBS = int(os.getenv("RAKSHA_BATCH_MAX_JOBS", "4"))
+
+batch_jobs = BatchJobStore(max_active=BATCH_MAX_JOBS)
+_batch_slots = asyncio.Semaphore(1)
+_batch_tasks = set()
+
+# --- VERIFICATION STAGE GRAPH ---
+verification_graph = build_verification_graph(cnn_batcher.apredict, lambda: models.get("fraud"),
+                                              card_ocr=card_ocr,
+                                              forensics=forensics_with_tamper_map if TAMPER_MAP else None)
+
+# --- EARLY-EXIT CASCADE ---
+# "on": verify-full runs the cheapest steps first and stops once a decision
+# rule settles the verdict. "shadow": runs everything, serves the full result
+# and counts disagreements. RAKSHA_CASCADE_QUICK_CNN adds an approximate
+# CNN pre-check on the raw upload. Off by default: both modes run the CNN
+# before the other stages instead of alongside them, so enable it only where
+# benchmarks/verify_full.py --cascade on shows the early exits pay for that.
+CASCADE_MODE = os.getenv("RAKSHA_CASCADE", "off")
+CASCADE_QUICK_CNN = os.getenv("RAKSHA_CASCADE_QUICK_CNN", "0") == "1"
+CASCADE_QUICK_MIN_CONF = float(os.getenv("RAKSHA_CASCADE_QUICK_MIN_CONF", "0.9"))
+
+if CASCADE_MODE in ("on", "shadow"):
+    _cascade_steps, _cascade_rules = DEFAULT_STEPS, [non_aadhaar_rule()]
+    if CASCADE_QUICK_CNN:
+        _cascade_steps = (("cnn_quick_out",),) + DEFAULT_STEPS
+        _cascade_rules.append(quick_non_aadhaar_rule(CASCADE_QUICK_MIN_CONF))
+    cascade = CascadePlanner(verification_graph, steps=_cascade_steps, rules=_cascade_rules,
+                             shadow=CASCADE_MODE == "shadow")
+else:
+    cascade = None
 
 # ==========================================================
 #  AUTH ROUTES
@@ -91,7 +311,7 @@ async def logout(request: Request):
 async def api_login(request: Request, data: dict = Body(...)):
     email = data.get("email")
     password = data.get("password")
-    users_db = load_users()
+    users_db = await execution.run_io(load_users)
     user = users_db.get(email)
     if not user or user["password"] != hash_password(password):
         return JSONResponse(content={"success": False, "message": "Invalid credentials."}, status_code=401)
@@ -102,11 +322,8 @@ async def api_login(request: Request, data: dict = Body(...)):
 async def api_signup(data: dict = Body(...)):
     email = data.get("email")
     password = data.get("password")
-    users_db = load_users()
-    if email in users_db:
+    if not await execution.run_io(register_user, email, password):
         return JSONResponse(content={"success": False, "message": "Account exists."}, status_code=409)
-    users_db[email] = {"password": hash_password(password), "created_at": "today"}
-    save_users(users_db)
     return JSONResponse(content={"success": True, "message": "Registered!", "redirect_url": "/login"})
 
 # ==========================================================
@@ -125,24 +342,27 @@ async def verify_page(request: Request):
 #  STEP 1: ANALYZE CARD (UPDATED TO RETURN FILENAME)
 # ==========================================================
 @app.post("/api/analyze-card")
-async def analyze_card_step(file: UploadFile = File(...)):
-    if cnn_model is None:
+@execution.heavy
+async def analyze_card_step(request: Request, file: UploadFile = File(...)):
+    if await execution.run_cpu(models.get, "cnn") is None:
         return JSONResponse({"is_aadhaar": False, "message": "Models not loaded."})
 
+    data = await file.read()
+
+    # The raw upload is kept on disk for the face-verification step
     file_path = os.path.join(UPLOAD_DIR, file.filename)
-    with open(file_path, "wb") as buffer:
-        buffer.write(await file.read())
+    await execution.run_io(write_file, file_path, data)
 
+    # Decoded once; every stage works on the in-memory buffer.
+    # Repeat uploads of the same bytes are served from the result cache.
+    values = {"upload_bytes": data, "qr_backup_bytes": None}
     try:
-        clean_path = file_path.replace(".jpg", "_clean.jpg")
-        processed_data = preprocess_document(file_path)
-        clean_img = processed_data["processed_image"]
-        cv2.imwrite(clean_path, clean_img)
-        target_path = clean_path
-    except:
-        target_path = file_path
-
-    cnn_out = cnn_predict(cnn_model, target_path)
+        values, _, _ = await run_verification(verification_graph, values, execution.cpu_pool,
+                                              result_cache, targets=["cnn_out"])
+    except ImageDecodeError:
+        return JSONResponse(content={"is_aadhaar": False, "message": "Could not read the uploaded image."})
+
+    cnn_out = values["cnn_out"]
     label = cnn_out.get("project_label", "UNKNOWN")
 
     if label == "NON_AADHAAR":
@@ -152,14 +372,20 @@ async def analyze_card_step(file: UploadFile = File(...)):
             "details": cnn_out
         })
     else:
-        ocr_result = run_ocr(target_path)
-        extracted_fields = extract_fields(ocr_result)
+        values, _, _ = await run_verification(verification_graph, values, execution.cpu_pool,
+                                              result_cache, targets=["aadhaar_fields"])
+        extracted_fields = values["aadhaar_fields"]
+
+        # Later steps pick up the decoded images and CNN/OCR outputs by token
+        token = verification_sessions.create(values, owner=request.session.get("user"))
 
         return JSONResponse(content={
             "is_aadhaar": True,
             "message": "Aadhaar Detected. Proceeding to Face Verification.",
             "aadhaar_path": file.filename, 
+            "verification_token": token,
             "extracted_data": extracted_fields,
+            "field_confidence": values.get("field_confidence"),
             "details": cnn_out
         })
 
@@ -167,30 +393,107 @@ async def analyze_card_step(file: UploadFile = File(...)):
 #  STEP 2: FACE VERIFICATION (NEW ENDPOINT)
 # ==========================================================
 @app.post("/api/verify-face")
+@execution.heavy
 async def verify_face_step(
+    request: Request,
     person_image: UploadFile = File(...), 
-    aadhaar_filename: str = Body(...)
+    aadhaar_filename: Optional[str] = Body(None),
+    verification_token: Optional[str] = Body(None)
 ):
-    # 1. Save Person Image
-    temp_person = tempfile.NamedTemporaryFile(delete=False, suffix=".jpg")
-    temp_person.write(await person_image.read())
-    person_path = temp_person.name
-    temp_person.close()
-
-    # 2. Get Aadhaar Path
-    aadhaar_path = os.path.join(UPLOAD_DIR, aadhaar_filename)
-
-    # 3. Verify using your provided logic
-    result = verify_face(aadhaar_path, person_path)
+    # 1. Decode Person Image in memory
+    person_bytes = await person_image.read()
+
+    # 2. Card image: the already decoded one from step 1, else the saved upload
+    session = verification_sessions.get(verification_token, owner=request.session.get("user"))
+    if session is not None:
+        # Not decoded when step 1 was served from the result cache
+        card_image = session.get("raw_image") or session["upload_bytes"]
+    elif aadhaar_filename:
+        card_image = os.path.join(UPLOAD_DIR, aadhaar_filename)
+    else:
+        return JSONResponse(content={"success": False, "message": "Verification session expired. Please upload the card again."},
+                            status_code=400)
 
-    # 4. Cleanup Person Image
-    os.remove(person_path)
+    # 3. Verify; the card's face is encoded once per card and reused on retries
+    card_id = await session_card_id(session) if session is not None else file_card_id(card_image)
+    result = await execution.run_cpu(verify_face, card_image, person_bytes, card_id)
 
     if result["match"]:
         return JSONResponse(content={"success": True, "message": "Biometrics Matched!", "score": result["confidence"]})
     else:
         return JSONResponse(content={"success": False, "message": f"Face Mismatch (Score: {result['confidence']}%)"})
 
+async def session_card_id(session):
+    """Card id for the face cache: the digest of the card upload."""
+    digest = session.get("content_digest")
+    if digest is None:
+        digest = await execution.run_cpu(content_digest, session["upload_bytes"])
+    return f"card:{digest}"
+
+@app.post("/api/verify-face/batch")
+@execution.heavy
+async def verify_face_batch(
+    request: Request,
+    person_image: UploadFile = File(...),
+    verification_tokens: str = Body(...)
+):
+    """
+    Scores one selfie against the cards of several verification sessions
+    (comma-separated tokens); the selfie is detected and encoded once.
+    """
+    person_bytes = await person_image.read()
+    tokens = [t.strip() for t in verification_tokens.split(",") if t.strip()]
+    owner = request.session.get("user")
+
+    candidates, found = [], []
+    for token in tokens:
+        session = verification_sessions.get(token, owner=owner)
+        if session is None:
+            continue
+        card_id = await session_card_id(session)
+        card_image = session.get("raw_image") or session["upload_bytes"]
+        candidates.append(await execution.run_cpu(card_face, card_image, card_id))
+        found.append(token)
+
+    scores = dict(zip(found, await execution.run_cpu(match_faces, person_bytes, candidates))) if candidates else {}
+    results = []
+    for token in tokens:
+        result = scores.get(token, {"status": "SESSION_NOT_FOUND", "match": False, "confidence": 0})
+        results.append({"verification_token": token, "success": result["match"], **result})
+    return JSONResponse(content={"results": results})
+
+# ==========================================================
+#  TAMPER HEAT-MAP
+# ==========================================================
+@app.post("/api/tamper-map")
+@execution.heavy
+async def tamper_map(
+    request: Request,
+    file: Optional[UploadFile] = File(None),
+    verification_token: Optional[str] = Body(None),
+    heatmap: bool = False
+):
+    """
+    Per-cell ELA / noise-inconsistency scores and the most suspicious
+    regions of a card (the upload, or the card of a verification session).
+    With ?heatmap=true a small PNG overlay is included, base64-encoded.
+    """
+    session = verification_sessions.get(verification_token, owner=request.session.get("user"))
+    if session is not None:
+        card_image = session.get("raw_image") or session["upload_bytes"]
+    elif file is not None:
+        card_image = await file.read()
+    else:
+        return JSONResponse(content={"message": "Upload the card or pass a valid verification_token."}, status_code=400)
+
+    try:
+        result = await execution.run_cpu(analyze_tamper_map, card_image, heatmap)
+    except ValueError:
+        return JSONResponse(content={"message": "Could not read the uploaded image."}, status_code=400)
+    if result.get("heatmap_png") is not None:
+        result["heatmap_png"] = base64.b64encode(result["heatmap_png"]).decode("ascii")
+    return JSONResponse(content=result)
+
 # ==========================================================
 #  DATABASE LOOKUP
 # ==========================================================
@@ -200,7 +503,7 @@ async def lookup_aadhaar(data: dict = Body(...)):
     if not uid or len(uid) != 12:
         return JSONResponse(content={"success": False, "message": "Invalid format."})
 
-    user = database.get_user_by_aadhaar(uid)
+    user = await database.aget_user_by_aadhaar(uid)
     if user:
         return JSONResponse(content={"success": True, "found": True, "data": user})
     else:
@@ -210,70 +513,255 @@ async def lookup_aadhaar(data: dict = Body(...)):
 #  STEP 3: FULL VERIFICATION (QR + FRAUD)
 # ==========================================================
 @app.post("/api/verify-full")
+@execution.heavy
 async def verify_full_process(
-    file: UploadFile = File(...), 
-    qr_file: Optional[UploadFile] = File(None)
+    request: Request,
+    file: Optional[UploadFile] = File(None), 
+    qr_file: Optional[UploadFile] = File(None),
+    verification_token: Optional[str] = Body(None),
+    timings: bool = False
 ):
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".jpg")
-    tmp.write(await file.read())
-    tmp.close()
-    raw_image_path = tmp.name
-    image_path = raw_image_path 
+    qr_backup_bytes = await qr_file.read() if qr_file is not None else None
+
+    # With a token from analyze-card, only QR, forensics and fraud scoring
+    # are left to compute; the card upload is then optional
+    session = verification_sessions.get(verification_token, owner=request.session.get("user"))
+    if session is not None:
+        values = dict(session)
+    elif file is not None:
+        values = {"upload_bytes": await file.read()}
+    else:
+        return JSONResponse(content={"message": "Upload the card or pass a valid verification_token."}, status_code=400)
+    values["qr_backup_bytes"] = qr_backup_bytes
 
+    # Independent stages (CNN, OCR, QR, forensics) run concurrently;
+    # cached outputs for the same upload skip their stages entirely.
+    # With the cascade, stages that can no longer change the verdict are skipped.
     try:
-        clean_path = raw_image_path.replace(".jpg", "_clean.jpg")
-        processed_data = preprocess_document(raw_image_path)
-        cv2.imwrite(clean_path, processed_data["processed_image"])
-        image_path = clean_path 
-    except: pass
-
-    cnn_out = cnn_predict(cnn_model, image_path)
-    ocr_result = run_ocr(image_path)
-    aadhaar_fields = extract_fields(ocr_result)
-    qr_result = validate_qr(image_path)
-
-    if qr_result["status"] != "DECODED" and qr_file is not None:
-        tmp_qr = tempfile.NamedTemporaryFile(delete=False, suffix=".jpg")
-        tmp_qr.write(await qr_file.read())
-        tmp_qr.close()
-        qr_path = tmp_qr.name
-        
-        backup_qr = validate_qr(qr_path)
-        if backup_qr["status"] == "DECODED": qr_result = backup_qr
-        os.remove(qr_path)
-
-    validation = rule_validation(aadhaar_fields, qr_result["status"])
-    consistency = build_consistency(aadhaar_fields, qr_result)
-    forensics = analyze_image_forensics(raw_image_path)
-    fraud_rule = assess_fraud(validation, qr_result, consistency, forensics)
-
-    record_for_ml = {
-        "validation": validation, "consistency": consistency,
-        "image_forensics": forensics, "ocr_extracted": aadhaar_fields, "qr": qr_result
-    }
-    fraud_ml = predict_fraud(fraud_model, record_for_ml)
-    final_decision = make_final_decision(cnn_out, fraud_ml, fraud_rule)
-
-    if final_decision.get("final_decision") == "ACCEPTED" and aadhaar_fields.get("aadhaar_number"):
-        prob = fraud_ml.get("fraud_probability", 0)
-        db_data = {
-            "aadhaar_number": aadhaar_fields.get("aadhaar_number", "").replace(" ", ""),
-            "name": aadhaar_fields.get("name"),
-            "dob": aadhaar_fields.get("dob"),
-            "gender": aadhaar_fields.get("gender"),
-            "status": "ACCEPTED",
-            "confidence": (1 - prob) * 100
-        }
-        database.save_verified_user(db_data)
+        if cascade is not None:
+            results, stage_timings, cache_hits, cascade_report = await cascade.run(
+                values, execution.cpu_pool, result_cache
+            )
+        else:
+            results, stage_timings, cache_hits = await run_verification(
+                verification_graph, values, execution.cpu_pool, result_cache
+            )
+    except ImageDecodeError:
+        return JSONResponse(content={"message": "Could not read the uploaded image."}, status_code=400)
+    db_data = verified_user_record(results)
+    if db_data:
+        await database.asave_verified_user(db_data)
+
+    response = verification_response(results)
+    record_decision(response["final_decision"])
+    if cascade is not None:
+        response["cascade"] = cascade_report
+    if timings:
+        response["timings"] = timing_report(verification_graph, stage_timings)
+        response["timings"]["cache_hits"] = cache_hits
+    return response
+
+# ==========================================================
+#  STEP 3 (STREAMING): SERVER-SENT EVENTS
+# ==========================================================
+# Stage outputs sent to the client, under their verify-full names
+STREAMED_OUTPUTS = {
+    "cnn_out": "cnn_result", "aadhaar_fields": "ocr_extracted", "field_confidence": "ocr_confidence", "qr_result": "qr",
+    "forensics": "forensics", "validation": "validation", "consistency": "consistency",
+    "fraud_rule": "fraud_rule", "fraud_ml": "fraud_ml", "final_decision": "final_decision",
+}
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/api/verify-full/stream")
+@execution.heavy_stream("text/event-stream",
+                        timeout_message=sse_event("error", {"message": "Request deadline exceeded."}))
+async def verify_full_stream(
+    request: Request,
+    file: Optional[UploadFile] = File(None),
+    qr_file: Optional[UploadFile] = File(None),
+    verification_token: Optional[str] = Body(None)
+):
+    """
+    verify-full as Server-Sent Events: one `stage` event per completed stage,
+    then a `result` event with the verify-full response.
+    """
+    qr_backup_bytes = await qr_file.read() if qr_file is not None else None
+    session = verification_sessions.get(verification_token, owner=request.session.get("user"))
+    if session is not None:
+        values = dict(session)
+    elif file is not None:
+        values = {"upload_bytes": await file.read()}
+    else:
+        return JSONResponse(content={"message": "Upload the card or pass a valid verification_token."}, status_code=400)
+    values["qr_backup_bytes"] = qr_backup_bytes
+
+    async def events():
+        results = dict(values)
+        short_circuit = False
+        try:
+            async with aclosing(stream_verification(verification_graph, values, execution.cpu_pool,
+                                                    result_cache)) as stages:
+                async for event in stages:
+                    results.update(event["outputs"])
+                    short_circuit = event.get("short_circuit", False)
+                    public = {STREAMED_OUTPUTS[k]: v for k, v in event["outputs"].items() if k in STREAMED_OUTPUTS}
+                    if public:
+                        yield sse_event("stage", {**event, "outputs": public})
+        except ImageDecodeError:
+            yield sse_event("error", {"message": "Could not read the uploaded image."})
+            return
+
+        record_decision(results.get("final_decision"))
+        if short_circuit:
+            yield sse_event("result", {"cnn_result": results["cnn_out"], "final_decision": results["final_decision"],
+                                       "short_circuit": True})
+            return
+
+        db_data = verified_user_record(results)
+        if db_data:
+            await database.asave_verified_user(db_data)
+        yield sse_event("result", verification_response(results))
+
+    return events()
+
+# ==========================================================
+#  BATCH VERIFICATION
+# ==========================================================
+async def run_batch_job(job, items):
+    loop = asyncio.get_running_loop()
+    cnn_infer = cnn_infer_batcher(cnn_batcher)
+    try:
+        async with _batch_slots:
+            fraud_model = await execution.run_cpu(models.get, "fraud")
+            for i in range(0, len(items), BATCH_CHUNK):
+                chunk = items[i:i + BATCH_CHUNK]
+                # score_batch waits on the CPU pool, so it runs on the default executor
+                results = await loop.run_in_executor(None, score_batch, chunk, cnn_infer,
+                                                     fraud_model, execution.cpu_pool)
+                job.add(results)
+                for result in results:
+                    record_decision(result.get("final_decision"))
+                # Release the image bytes of finished chunks
+                items[i:i + BATCH_CHUNK] = [None] * len(chunk)
+        job.finish()
+    except Exception as e:
+        logger.exception("Batch job %s failed", job.job_id)
+        job.finish(error=str(e))
+
+@app.post("/api/verify-batch")
+async def verify_batch(files: List[UploadFile] = File(...)):
+    """Accepts a zip archive or several images; returns a job id."""
+    if not batch_jobs.reserve():
+        return JSONResponse(content={"success": False, "message": "Too many batch jobs, please retry."},
+                            status_code=503, headers={"Retry-After": str(batch_jobs.retry_after())})
+    try:
+        return await _start_batch_job(files)
+    finally:
+        batch_jobs.release()
+
+async def _start_batch_job(files):
+    max_bytes = int(BATCH_MAX_MB * 1024 * 1024)
+    too_large = JSONResponse(content={"message": f"At most {BATCH_MAX_MB:g} MB of images per batch."},
+                             status_code=413)
+    items, held = [], 0
+    try:
+        for upload in files:
+            if (upload.size or 0) > max_bytes:
+                return too_large
+            data = await upload.read()
+            if zipfile.is_zipfile(io.BytesIO(data)):
+                images = await execution.run_io(
+                    lambda d: list(iter_zip_images(d, max_files=BATCH_MAX_FILES, max_bytes=max_bytes - held)), data)
+            elif is_image_name(upload.filename or ""):
+                images = [(upload.filename, data)]
+            else:
+                continue
+            held += sum(len(image) for _, image in images)
+            if held > max_bytes:
+                return too_large
+            items.extend(images)
+    except (ValueError, zipfile.BadZipFile) as e:
+        return JSONResponse(content={"message": str(e)}, status_code=400)
+
+    if not items:
+        return JSONResponse(content={"message": "No images in the upload."}, status_code=400)
+    if len(items) > BATCH_MAX_FILES:
+        return JSONResponse(content={"message": f"At most {BATCH_MAX_FILES} images per batch."}, status_code=400)
+
+    job = batch_jobs.create(len(items))
+    task = asyncio.create_task(run_batch_job(job, items))
+    _batch_tasks.add(task)
+    task.add_done_callback(_batch_tasks.discard)
+    return {"job_id": job.job_id, "total": job.total, "results_url": f"/api/verify-batch/{job.job_id}"}
+
+@app.get("/api/verify-batch/{job_id}")
+async def verify_batch_results(job_id: str):
+    """Streams the job's results as NDJSON, ending with a summary line."""
+    job = batch_jobs.get(job_id)
+    if job is None:
+        return JSONResponse(content={"message": "Unknown job."}, status_code=404)
+    return StreamingResponse(job.stream(), media_type="application/x-ndjson")
 
+# ==========================================================
+#  HEALTH CHECK
+# ==========================================================
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and its event loop responds."""
+    return {"status": "ok", "pid": os.getpid()}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: every model is loaded and warmed up."""
+    ready = models.ready()
+    return JSONResponse(content={"ready": ready, "models": models.status()},
+                        status_code=200 if ready else 503)
+
+@app.post("/admin/warmup")
+async def warmup():
+    """Loads every model and runs a dummy inference on each."""
+    status = await execution.run_cpu(models.warmup)
+    return {"ready": models.ready(), "models": status}
+
+# ==========================================================
+#  ADMIN: RUNTIME STATS
+# ==========================================================
+@app.get("/admin/stats")
+async def runtime_stats():
     return {
-        "cnn_result": cnn_out, 
-        "ocr_extracted": aadhaar_fields,
-        "qr": qr_result, 
-        "final_decision": final_decision, 
-        "fraud_ml": fraud_ml
+        "cnn_batcher": cnn_batcher.stats(),
+        "ocr": ocr_stats(),
+        "ocr_layout": card_ocr.stats() if card_ocr else None,
+        "qr": qr_stats(),
+        "card_faces": card_faces.stats(),
+        "execution": execution.stats(),
+        "result_cache": result_cache.stats() if result_cache else None,
+        "batch_jobs": batch_jobs.stats(),
+        "storage": database.get_storage().stats(),
+        "verification_sessions": verification_sessions.stats(),
+        "cascade": cascade.stats() if cascade is not None else None,
     }
 
+# ==========================================================
+#  METRICS (PROMETHEUS)
+# ==========================================================
+# Values the components already track, read at scrape time
+CallbackMetric("raksha_requests_in_flight", "Heavy requests running.", lambda: execution.stats()["in_flight"])
+CallbackMetric("raksha_requests_waiting", "Heavy requests queued for admission.", lambda: execution.stats()["waiting"])
+CallbackMetric("raksha_requests_rejected_total", "Heavy requests rejected as overloaded.",
+               lambda: execution.stats()["rejected"], kind="counter")
+CallbackMetric("raksha_deadline_exceeded_total", "Heavy requests past their deadline.",
+               lambda: execution.stats()["deadline_exceeded"], kind="counter")
+CallbackMetric("raksha_cnn_queue_depth", "Tensors waiting for a CNN batch.", lambda: cnn_batcher.stats()["queue_depth"])
+CallbackMetric("raksha_result_cache_hit_rate", "Result cache hit rate.",
+               lambda: result_cache.stats()["hit_rate"] if result_cache else 0)
+
+@app.get("/metrics")
+async def metrics():
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # ==========================================================
 #  AUTO-OPEN BROWSER ON STARTUP
 # ==========================================================
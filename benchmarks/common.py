@@ -0,0 +1,164 @@
+# FILE: benchmarks/common.py
+"""Helpers shared by the benchmark scripts (run them from the repo root)."""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+# Make `Pipelines` importable when a script is run as benchmarks/x.py
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+CARD_SIZE = (640, 1000)  # h, w
+
+def card_with_lines(seed=0, size=CARD_SIZE):
+    """synthetic_card(seed, size) and the text lines printed on it."""
+    rng = np.random.default_rng(seed)
+    h, w = size
+    img = np.full((h, w, 3), 235, dtype=np.uint8)
+    img += rng.integers(0, 15, size=img.shape, dtype=np.uint8)
+    digits = "".join(str(d) for d in rng.integers(0, 10, 12))
+    lines = [
+        "Government of India",
+        f"Name {'ABCDEFGHJK'[seed % 10]}ramjeet Singh",
+        f"DOB: {1 + seed % 28:02d}/{1 + seed % 12:02d}/19{60 + seed % 40}",
+        "MALE" if seed % 2 == 0 else "FEMALE",
+        f"{digits[:4]} {digits[4:8]} {digits[8:]}",
+    ]
+    for i, text in enumerate(lines):
+        cv2.putText(img, text, (int(w * 0.35), int(h * 0.25) + i * 70),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.2, (20, 20, 20), 2, cv2.LINE_AA)
+    return img, lines
+
+def synthetic_card(seed=0, size=CARD_SIZE):
+    """A light card-sized image with Aadhaar-like text lines (for OCR load)."""
+    return card_with_lines(seed, size)[0]
+
+def qr_text(seed, uid, name=None):
+    """Aadhaar-style XML QR payload for a synthetic card."""
+    name = name or f"Test User {seed}"
+    return (f'<PrintLetterBarcodeData uid="{uid}" name="{name}" gender="{"MF"[seed % 2]}" '
+            f'dob="{1 + seed % 28:02d}/{1 + seed % 12:02d}/19{60 + seed % 40}"/>')
+
+def synthetic_scan_card(seed=0, size=CARD_SIZE):
+    """
+    A flat, scanned card: synthetic_card with its QR code printed left of
+    the text; the QR carries the printed fields.
+    Returns (image, encoded text, printed lines).
+    """
+    img, lines = card_with_lines(seed, size)
+    h, w = size
+    text = qr_text(seed, lines[4].replace(" ", ""), name=lines[1][len("Name "):])
+    side = int(h * 0.35)
+    qr = cv2.resize(cv2.QRCodeEncoder.create().encode(text), (side, side), interpolation=cv2.INTER_NEAREST)
+    y, x = int(h * 0.3), int(w * 0.04)
+    img[y:y + side, x:x + side] = cv2.cvtColor(qr, cv2.COLOR_GRAY2BGR)
+    return img, text, lines
+
+def synthetic_selfie(seed=0, size=(480, 360)):
+    """A plain portrait-sized image with a face-like shape (selfie uploads)."""
+    rng = np.random.default_rng(seed)
+    h, w = size
+    img = np.full((h, w, 3), 180, dtype=np.uint8)
+    img += rng.integers(0, 30, size=img.shape, dtype=np.uint8)
+    center = (w // 2, h // 2)
+    cv2.ellipse(img, center, (w // 5, h // 4), 0, 0, 360, (150, 175, 215), -1, cv2.LINE_AA)
+    for dx in (-w // 12, w // 12):
+        cv2.circle(img, (center[0] + dx, center[1] - h // 16), w // 40, (40, 40, 40), -1, cv2.LINE_AA)
+    cv2.ellipse(img, (center[0], center[1] + h // 10), (w // 14, h // 40), 0, 0, 180, (60, 60, 140), 3)
+    return img
+
+def jpeg_bytes(img, quality=90):
+    return cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+def card_corpus(count, seed=0, quality=90):
+    """
+    Deterministic upload corpus, alternating scanned cards and phone
+    photos of cards: dicts with name, JPEG bytes ("data"), the QR text
+    and (for scans) the printed lines.
+    """
+    corpus = []
+    for i in range(count):
+        if i % 2 == 0:
+            img, text, lines = synthetic_scan_card(seed + i)
+            name = f"scan_{seed + i:04d}.jpg"
+        else:
+            (img, text), lines = synthetic_qr_card(seed + i), None
+            name = f"photo_{seed + i:04d}.jpg"
+        corpus.append({"name": name, "data": jpeg_bytes(img, quality), "qr_text": text, "lines": lines})
+    return corpus
+
+def synthetic_qr_card(seed=0, size=(1944, 2592), qr_fraction=0.22, angle=None, blur=None):
+    """
+    A phone-photo-sized image of a card with an Aadhaar-style XML QR code,
+    randomly placed, rotated and blurred. Returns (image, encoded text).
+    """
+    rng = np.random.default_rng(seed)
+    h, w = size
+    uid = "".join(str(d) for d in rng.integers(0, 10, 12))
+    text = qr_text(seed, uid)
+    qr = cv2.QRCodeEncoder.create().encode(text)
+    side = int(min(h, w) * qr_fraction)
+    qr = cv2.resize(qr, (side, side), interpolation=cv2.INTER_NEAREST)
+
+    img = np.full((h, w, 3), 200, dtype=np.uint8)
+    img += rng.integers(0, 40, size=img.shape, dtype=np.uint8)
+    card = synthetic_card(seed, size=(int(h * 0.6), int(w * 0.6)))
+    cy, cx = (h - card.shape[0]) // 2, (w - card.shape[1]) // 2
+    img[cy:cy + card.shape[0], cx:cx + card.shape[1]] = card
+    y = cy + int(rng.integers(10, card.shape[0] - side - 10))
+    x = cx + int(rng.integers(10, card.shape[1] - side - 10))
+    img[y:y + side, x:x + side] = cv2.cvtColor(qr, cv2.COLOR_GRAY2BGR)
+
+    angle = float(rng.uniform(-8, 8)) if angle is None else angle
+    rot = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    img = cv2.warpAffine(img, rot, (w, h), borderMode=cv2.BORDER_REPLICATE)
+    blur = int(rng.choice([0, 3, 5])) if blur is None else blur
+    if blur:
+        img = cv2.GaussianBlur(img, (blur, blur), 0)
+    return img, text
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if len(values) else 0.0
+
+def git_commit():
+    """Short hash of the checked-out commit (with "+dirty" for local changes), or None."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return (commit + "+dirty" if dirty else commit) or None
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+    }
+
+def print_table(rows, columns):
+    """Prints rows (dicts) as a fixed-width table."""
+    widths = [max(len(c), *(len(str(r.get(c, ""))) for r in rows)) for c in columns]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(str(row.get(c, "")).ljust(w) for c, w in zip(columns, widths)))
+
+def write_results(path, name, results, **params):
+    """Writes {"benchmark", "environment", "params", "results"} as JSON."""
+    if not path:
+        return
+    payload = {"benchmark": name, "environment": environment(), "params": params, "results": results}
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
+    print(f"[bench] results written to {path}")
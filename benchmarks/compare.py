@@ -0,0 +1,104 @@
+# FILE: benchmarks/compare.py
+"""
+Compares two result files written by any benchmark (--json), typically
+from two commits, and flags metrics that got worse by more than
+--threshold percent. Exits non-zero when something regressed.
+
+    git checkout main && python benchmarks/verify_full.py --json base.json
+    git checkout my-branch && python benchmarks/verify_full.py --json new.json
+    python benchmarks/compare.py base.json new.json --threshold 10
+
+Latencies, sizes and error counts are better lower; rates, throughput
+and accuracy are better higher; other numbers are shown without a
+verdict. Rows of tables are matched by their name column (stage,
+endpoint, backend, ...), not by position.
+"""
+import argparse
+import json
+import sys
+
+from common import print_table
+
+# Columns that name a row in a list of results
+ROW_KEYS = ("stage", "step", "endpoint", "backend", "model", "feature", "size", "pool_size", "name")
+LOWER_IS_BETTER = ("_ms", "_s", "ms_", "latency", "seconds", "errors", "mismatch", "overloaded", "deadline",
+                   "dropped", "lag", "size_mb")
+HIGHER_IS_BETTER = ("per_sec", "rate", "throughput", "speedup", "accuracy", "agreement", "ok")
+
+
+def row_name(row, index):
+    parts = [f"{k}={row[k]}" for k in ROW_KEYS if k in row and not isinstance(row[k], (dict, list))]
+    return ",".join(parts) if parts else str(index)
+
+def flatten(value, path=""):
+    """{"a.b[stage=ocr].p50_ms": 12.3, ...} for every numeric leaf."""
+    out = {}
+    if isinstance(value, dict):
+        for key, item in value.items():
+            out.update(flatten(item, f"{path}.{key}" if path else str(key)))
+    elif isinstance(value, list):
+        for i, item in enumerate(value):
+            name = row_name(item, i) if isinstance(item, dict) else str(i)
+            out.update(flatten(item, f"{path}[{name}]"))
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        out[path] = float(value)
+    return out
+
+def direction(path):
+    """-1 when lower is better, +1 when higher is better, 0 when unknown."""
+    metric = path.rsplit(".", 1)[-1].lower()
+    if any(token in metric for token in HIGHER_IS_BETTER):
+        return 1
+    if any(token in metric for token in LOWER_IS_BETTER):
+        return -1
+    return 0
+
+def compare(base, new, threshold):
+    """Rows for every metric present in both files, and the regressions among them."""
+    base_metrics, new_metrics = flatten(base["results"]), flatten(new["results"])
+    rows, regressions = [], []
+    for path in sorted(set(base_metrics) & set(new_metrics)):
+        old, cur = base_metrics[path], new_metrics[path]
+        change = (cur - old) / abs(old) * 100 if old else (0.0 if cur == old else float("inf"))
+        sign = direction(path)
+        verdict = ""
+        if sign and abs(change) > threshold:
+            verdict = "better" if change * sign > 0 else "WORSE"
+        row = {"metric": path, "base": round(old, 4), "new": round(cur, 4), "change": f"{change:+.1f}%",
+               "verdict": verdict}
+        rows.append(row)
+        if verdict == "WORSE":
+            regressions.append(row)
+    return rows, regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Percent change that counts")
+    parser.add_argument("--all", action="store_true", help="Also list metrics within the threshold")
+    args = parser.parse_args(argv)
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    if base.get("benchmark") != new.get("benchmark"):
+        sys.exit(f"Different benchmarks: {base.get('benchmark')} vs {new.get('benchmark')}")
+    for label, payload in (("base", base), ("new", new)):
+        env = payload.get("environment", {})
+        print(f"[compare] {label}: commit {env.get('commit')}, {env.get('time')}, {env.get('cpus')} CPUs")
+    if base.get("params") != new.get("params"):
+        print(f"[compare] parameters differ: {base.get('params')} vs {new.get('params')}")
+
+    rows, regressions = compare(base, new, args.threshold)
+    shown = rows if args.all else [r for r in rows if r["verdict"]]
+    if shown:
+        print_table(shown, ["metric", "base", "new", "change", "verdict"])
+    print(f"[compare] {len(rows)} metrics, {len(regressions)} worse by more than {args.threshold}%")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
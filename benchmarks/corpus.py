@@ -0,0 +1,67 @@
+# FILE: benchmarks/corpus.py
+"""
+Writes the synthetic benchmark corpus to disk: rendered cards with
+Aadhaar-style QR codes (flat scans and phone photos, alternating) and
+selfie-sized portraits, plus manifest.json with each card's QR text and
+printed lines.
+
+    python benchmarks/corpus.py --output bench_corpus/ --count 50
+
+The same seed always gives the same files, so results from different
+commits are measured on identical inputs. load_test.py reads this
+directory (or generates the corpus in memory when none is given).
+"""
+import argparse
+import json
+import os
+
+from common import card_corpus, jpeg_bytes, synthetic_selfie
+
+MANIFEST = "manifest.json"
+
+
+def write_corpus(output, count, seed=0, selfies=4):
+    os.makedirs(output, exist_ok=True)
+    cards = card_corpus(count, seed)
+    manifest = {"seed": seed, "cards": [], "selfies": []}
+    for card in cards:
+        with open(os.path.join(output, card["name"]), "wb") as f:
+            f.write(card["data"])
+        manifest["cards"].append({k: card[k] for k in ("name", "qr_text", "lines")})
+    for i in range(selfies):
+        name = f"selfie_{seed + i:04d}.jpg"
+        with open(os.path.join(output, name), "wb") as f:
+            f.write(jpeg_bytes(synthetic_selfie(seed + i)))
+        manifest["selfies"].append(name)
+    with open(os.path.join(output, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def read_corpus(directory):
+    """(cards, selfies) as written by write_corpus; cards carry their bytes under "data"."""
+    with open(os.path.join(directory, MANIFEST)) as f:
+        manifest = json.load(f)
+    cards = []
+    for card in manifest["cards"]:
+        with open(os.path.join(directory, card["name"]), "rb") as f:
+            cards.append({**card, "data": f.read()})
+    selfies = []
+    for name in manifest["selfies"]:
+        with open(os.path.join(directory, name), "rb") as f:
+            selfies.append(f.read())
+    return cards, selfies
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write the synthetic benchmark corpus")
+    parser.add_argument("--output", default="bench_corpus")
+    parser.add_argument("--count", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--selfies", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    manifest = write_corpus(args.output, args.count, args.seed, args.selfies)
+    print(f"[corpus] {len(manifest['cards'])} cards and {len(manifest['selfies'])} selfies written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# FILE: benchmarks/extract_fields.py
+"""
+Golden-output parity and a microbenchmark for extract_fields.
+
+    python benchmarks/extract_fields.py
+    python benchmarks/extract_fields.py --repeat 200 --json extract_fields.json
+
+golden/extract_fields.json holds OCR outputs (several rec_texts shapes,
+Hindi lines, invalid dates, numbers split across lines) with the fields
+the original multi-pass extractor returned for them. extract_fields and
+extract_fields_detailed (what the verification graph calls) are both
+checked against it; the script exits non-zero if any result differs.
+Both are timed against the original extractor, kept unchanged in
+extract_fields_baseline.py. The extractors alternate over several rounds
+and the fastest round of each is reported, so the speedups are less
+sensitive to load on the machine than single timings.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import extract_fields_baseline
+from common import print_table, write_results
+from Pipelines.extract_Aadhaar import extract_fields, extract_fields_detailed
+
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden", "extract_fields.json")
+
+# (name, extractor returning the four fields); the first is the baseline
+EXTRACTORS = [
+    ("baseline", extract_fields_baseline.extract_fields),
+    ("extract_fields", extract_fields),
+    ("extract_fields_detailed", lambda ocr_json: extract_fields_detailed(ocr_json)[0]),
+]
+
+def load_golden(path=GOLDEN):
+    with open(path, encoding="utf-8") as f:
+        cases = json.load(f)["cases"]
+    for case in cases:
+        if case.get("tuple_lines"):
+            # (text, score) lines, stored as JSON lists
+            case["ocr"]["rec_texts"] = [[tuple(sub) for sub in page] for page in case["ocr"]["rec_texts"]]
+    return cases
+
+def check_parity(cases):
+    mismatches = []
+    for name, fn in EXTRACTORS:
+        for i, case in enumerate(cases):
+            got = fn(case["ocr"])
+            if got != case["expected"]:
+                mismatches.append({"extractor": name, "case": i, "expected": case["expected"], "got": got})
+    return mismatches
+
+def time_per_call(fn, cases, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for case in cases:
+            fn(case["ocr"])
+    return (time.perf_counter() - t0) * 1e6 / (repeat * len(cases))
+
+def best_times(cases, repeat, rounds):
+    """Fastest of `rounds` timings per extractor; extractors alternate within each round."""
+    best = {name: float("inf") for name, _ in EXTRACTORS}
+    for _ in range(rounds):
+        for name, fn in EXTRACTORS:
+            best[name] = min(best[name], time_per_call(fn, cases, repeat))
+    return best
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="extract_fields parity and speed")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=7, help="Timing rounds; the fastest one is reported")
+    parser.add_argument("--json", default=None, help="Write results to this file")
+    args = parser.parse_args(argv)
+
+    cases = load_golden()
+
+    mismatches = check_parity(cases)
+    for name, _ in EXTRACTORS:
+        failed = sum(1 for m in mismatches if m["extractor"] == name)
+        print(f"[bench] golden parity, {name}: {len(cases) - failed}/{len(cases)} cases match")
+    for m in mismatches[:10]:
+        print(f"  {m['extractor']} case {m['case']}: expected {m['expected']}, got {m['got']}")
+
+    best = best_times(cases, args.repeat, args.rounds)
+    rows = [{"extractor": name, "us_per_call": round(best[name], 2)} for name, _ in EXTRACTORS]
+    for row in rows:
+        row["speedup"] = round(rows[0]["us_per_call"] / row["us_per_call"], 2)
+    print_table(rows, ["extractor", "us_per_call", "speedup"])
+    write_results(args.json, "extract_fields", {"mismatches": len(mismatches), "timings": rows},
+                  repeat=args.repeat, rounds=args.rounds, cases=len(cases))
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
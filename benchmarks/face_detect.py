@@ -0,0 +1,106 @@
+# FILE: benchmarks/face_detect.py
+"""
+Agreement and latency of detect_face against the previous detector (one
+cascade pass over the full-resolution image).
+
+    python benchmarks/face_detect.py
+    python benchmarks/face_detect.py --images cards/ --json face_detect.json
+
+Without --images, the sample cards in static/uploads are used. For each
+image both detectors must find a face or both must find none, and found
+boxes must overlap (IoU >= --min-iou). The LBPH distance between the two
+crops is reported as well: boxes may differ by a few pixels, so crops
+are close but not identical. Exits non-zero on any disagreement.
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+
+from common import ROOT, percentile, print_table, write_results
+from Pipelines.bulk_scoring import walk_images
+from Pipelines.face_matcher import (
+    DETECT_WIDTH, FACE_SIZE, detect_face_box, face_distance, face_histogram, get_face_cascade,
+)
+
+SAMPLES = os.path.join(ROOT, "static", "uploads")
+
+
+# Previous implementation, for comparison
+def baseline_detect_face_box(gray):
+    faces = get_face_cascade().detectMultiScale(gray, scaleFactor=1.3, minNeighbors=5)
+    return faces[0] if len(faces) else None
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    ih = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = iw * ih
+    return float(inter) / float(aw * ah + bw * bh - inter)
+
+def crop(gray, box):
+    x, y, w, h = box
+    return cv2.resize(gray[y:y + h, x:x + w], FACE_SIZE)
+
+def timed(fn, arg, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        out = fn(arg)
+    return out, (time.perf_counter() - t0) * 1000 / repeat
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Face detection agreement and latency")
+    parser.add_argument("--images", default=SAMPLES, help="Directory of card images")
+    parser.add_argument("--count", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--detect-width", type=int, default=DETECT_WIDTH)
+    parser.add_argument("--min-iou", type=float, default=0.5)
+    parser.add_argument("--json", default=None, help="Write results to this file")
+    args = parser.parse_args(argv)
+
+    rows, old_ms, new_ms = [], [], []
+    disagreements = 0
+    for name in walk_images(args.images)[:args.count]:
+        img = cv2.imread(os.path.join(args.images, name))
+        if img is None:
+            continue
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        old, t_old = timed(baseline_detect_face_box, gray, args.repeat)
+        new, t_new = timed(lambda g: detect_face_box(g, args.detect_width), gray, args.repeat)
+        old_ms.append(t_old)
+        new_ms.append(t_new)
+
+        row = {"name": name, "size": f"{gray.shape[1]}x{gray.shape[0]}", "old_box": None, "new_box": None,
+               "iou": None, "crop_distance": None, "old_ms": round(t_old, 1), "new_ms": round(t_new, 1)}
+        if old is not None:
+            row["old_box"] = [int(v) for v in old]
+        if new is not None:
+            row["new_box"] = [int(v) for v in new]
+        if old is not None and new is not None:
+            row["iou"] = round(iou(old, new), 3)
+            row["crop_distance"] = round(float(face_distance(face_histogram(crop(gray, old)),
+                                                             face_histogram(crop(gray, new)))), 2)
+            agree = row["iou"] >= args.min_iou
+        else:
+            agree = old is None and new is None
+        row["agree"] = agree
+        disagreements += not agree
+        rows.append(row)
+
+    print_table(rows, ["name", "size", "old_box", "new_box", "iou", "crop_distance", "old_ms", "new_ms", "agree"])
+    summary = {"old_p50_ms": round(percentile(old_ms, 50), 1) if old_ms else None,
+               "new_p50_ms": round(percentile(new_ms, 50), 1) if new_ms else None}
+    print(f"\n[bench] {len(rows)} images, {disagreements} disagree with the full-resolution detector, "
+          f"p50 {summary['old_p50_ms']} -> {summary['new_p50_ms']} ms")
+    write_results(args.json, "face_detect", {"images": rows, "summary": summary, "mismatches": disagreements},
+                  **{k: v for k, v in vars(args).items() if k != "json"})
+    if disagreements:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
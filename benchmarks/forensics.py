@@ -0,0 +1,94 @@
+# FILE: benchmarks/forensics.py
+"""
+Forensic feature cost: the time of each registered feature on its own
+(fresh intermediates for every image), of the default feature set, and of
+analyze_forensics_batch with a thread pool. Also reports how much the ELA
+score moves when ELA runs on a copy bounded to --ela-max-side.
+
+    python benchmarks/forensics.py --images cards/ --ela-max-side 1024 --json forensics.json
+
+Without --images, synthetic cards (scanned size and phone-photo size) are used.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from common import percentile, print_table, synthetic_card, synthetic_qr_card, write_results
+from Pipelines.bulk_scoring import walk_images
+from Pipelines.forensic_analyzer import (
+    DEFAULT_FEATURES, FEATURES, FORENSICS_CONFIG, ForensicContext, analyze_forensics_batch,
+)
+from Pipelines.image_buffer import ImageBuffer
+
+
+def load_corpus(images_dir, count):
+    if not images_dir:
+        half = count // 2
+        return ([synthetic_card(seed=i) for i in range(count - half)]
+                + [synthetic_qr_card(seed=i)[0] for i in range(half)])
+    imgs = [cv2.imread(os.path.join(images_dir, p)) for p in walk_images(images_dir)[:count]]
+    return [img for img in imgs if img is not None]
+
+def time_features(corpus, names, config):
+    latencies = []
+    for img in corpus:
+        ctx = ForensicContext(ImageBuffer(img, "<bench>"), config)  # fresh buffer: no cached views
+        t0 = time.perf_counter()
+        for name in names:
+            FEATURES[name](ctx)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return {
+        "features": "+".join(names),
+        "mean_ms": round(sum(latencies) / len(latencies), 1),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+    }
+
+def ela_drift(corpus, max_side):
+    full = dict(FORENSICS_CONFIG, ela_max_side=0)
+    bounded = dict(FORENSICS_CONFIG, ela_max_side=max_side)
+    deltas = []
+    for img in corpus:
+        a = FEATURES["ela_score"](ForensicContext(img, full))
+        b = FEATURES["ela_score"](ForensicContext(img, bounded))
+        deltas.append(abs(a - b))
+    return {"max_side": max_side, "mean_abs_delta": round(sum(deltas) / len(deltas), 4),
+            "max_abs_delta": round(max(deltas), 4)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Forensic feature benchmark")
+    parser.add_argument("--images", default=None, help="Directory of card images")
+    parser.add_argument("--count", type=int, default=20)
+    parser.add_argument("--ela-max-side", type=int, default=1024)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--json", default=None, help="Write results to this file")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.images, args.count)
+    config = dict(FORENSICS_CONFIG)
+    rows = [time_features(corpus, [name], config) for name in FEATURES]
+    rows.append(time_features(corpus, list(DEFAULT_FEATURES), config))
+    rows.append(time_features(corpus, list(DEFAULT_FEATURES), dict(config, ela_max_side=args.ela_max_side)))
+    rows[-1]["features"] += f" (ela<={args.ela_max_side})"
+
+    buffers = [ImageBuffer(img, "<bench>") for img in corpus]
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(args.workers) as executor:
+        analyze_forensics_batch(buffers, executor)
+    batch_s = time.perf_counter() - t0
+    drift = ela_drift(corpus, args.ela_max_side)
+
+    print_table(rows, ["features", "mean_ms", "p50_ms", "p95_ms"])
+    print(f"\n[bench] batch of {len(corpus)} on {args.workers} threads: {len(corpus) / batch_s:.1f} images/s")
+    print(f"[bench] ELA score change at max side {args.ela_max_side}: mean {drift['mean_abs_delta']}, "
+          f"max {drift['max_abs_delta']}")
+    write_results(args.json, "forensics",
+                  {"features": rows, "batch_images_per_s": round(len(corpus) / batch_s, 2), "ela_drift": drift},
+                  **{k: v for k, v in vars(args).items() if k != "json"})
+
+
+if __name__ == "__main__":
+    main()
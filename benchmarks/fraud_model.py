@@ -0,0 +1,116 @@
+# FILE: benchmarks/fraud_model.py
+"""
+Fraud model backends: load time, predict_fraud latency for one record and
+per record in batches, and bit-for-bit probability parity of the compiled
+forest with the pickled one.
+
+    python benchmarks/fraud_model.py --model Models/RandomForest_model.pkl --json fraud_model.json
+
+--synthetic trains a stand-in forest on random features instead (for
+checkouts without the model file). Exits non-zero on any parity mismatch.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from common import percentile, print_table, write_results
+from Pipelines.compiled_forest import CompiledForest, parity_sample, reference_proba
+from Pipelines.model_json import (
+    FEATURE_COLUMNS, FRAUD_MODEL_PATH, load_fraud_model, predict_fraud, predict_fraud_batch,
+)
+
+
+def synthetic_forest(path, n_estimators, seed=0):
+    import joblib
+    import pandas as pd
+    from sklearn.ensemble import RandomForestClassifier
+    rng = np.random.default_rng(seed)
+    X = rng.random((5000, len(FEATURE_COLUMNS))) * 100
+    X[:, :8] = X[:, :8] > 50
+    y = (X[:, 8] + rng.normal(0, 15, len(X)) > 50).astype(int)
+    model = RandomForestClassifier(n_estimators, random_state=seed).fit(pd.DataFrame(X, columns=FEATURE_COLUMNS), y)
+    joblib.dump(model, path)
+
+def random_record(rng):
+    return {
+        "validation": {k: bool(rng.integers(2)) for k in ("aadhaar_valid", "dob_valid", "name_valid", "gender_valid")},
+        "consistency": {"score": float(rng.random()), "matching_performed": bool(rng.integers(2))},
+        "image_forensics": {"ela_score": float(rng.random() * 5), "edge_density": float(rng.random() * 0.2),
+                            "sharpness": float(rng.random() * 1500)},
+        "ocr_extracted": {k: "x" if rng.integers(2) else None for k in ("name", "dob", "gender", "aadhaar_number")},
+        "qr": {"status": "DECODED" if rng.integers(2) else "NOT_DETECTED"},
+    }
+
+def timed_load(path, backend, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        model = load_fraud_model(path, backend=backend)
+        times.append((time.perf_counter() - t0) * 1000)
+    return model, percentile(times, 50)
+
+def latencies(fn, repeat):
+    out = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        out.append((time.perf_counter() - t0) * 1000)
+    return out
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fraud model backend benchmark")
+    parser.add_argument("--model", default=FRAUD_MODEL_PATH)
+    parser.add_argument("--synthetic", type=int, default=0, metavar="TREES",
+                        help="Train a stand-in forest with this many trees instead of loading --model")
+    parser.add_argument("--batch", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--json", default=None, help="Write results to this file")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="fraud_bench_")
+    pkl_path = args.model
+    if args.synthetic:
+        pkl_path = os.path.join(workdir, "forest.pkl")
+        synthetic_forest(pkl_path, args.synthetic)
+    npz_path = os.path.join(workdir, "forest.npz")
+    CompiledForest.from_sklearn(load_fraud_model(pkl_path, backend="sklearn")).save(npz_path)
+
+    sk_model, sk_load = timed_load(pkl_path, "sklearn", 3)
+    compiled, c_load = timed_load(npz_path, "compiled", 3)
+
+    X = parity_sample(compiled, 5000)
+    mismatches = int(np.sum(np.any(reference_proba(sk_model, X) != compiled.predict_proba(X), axis=1)))
+
+    rng = np.random.default_rng(0)
+    records = [random_record(rng) for _ in range(args.batch)]
+    for r in records:
+        assert predict_fraud(sk_model, r) == predict_fraud(compiled, r)
+
+    rows = []
+    for name, model, load_ms in (("sklearn", sk_model, sk_load), ("compiled", compiled, c_load)):
+        predict_fraud(model, records[0])  # warm-up
+        single = latencies(lambda: predict_fraud(model, records[0]), args.repeat)
+        batch = latencies(lambda: predict_fraud_batch(model, records), max(1, args.repeat // 10))
+        rows.append({
+            "backend": name,
+            "load_ms": round(load_ms, 1),
+            "one_p50_ms": round(percentile(single, 50), 3),
+            "one_p95_ms": round(percentile(single, 95), 3),
+            f"batch{args.batch}_per_record_ms": round(percentile(batch, 50) / args.batch, 4),
+        })
+
+    print_table(rows, list(rows[0]))
+    print(f"\n[bench] {compiled.n_trees} trees, {compiled.n_nodes} nodes, depth {compiled.max_depth}; "
+          f"{mismatches}/{len(X)} rows differ from sklearn")
+    write_results(args.json, "fraud_model", {"backends": rows, "parity_rows": len(X), "mismatches": mismatches},
+                  **{k: v for k, v in vars(args).items() if k != "json"})
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# FILE: benchmarks/layout_ocr.py
+"""
+Layout-aware (region) OCR against full-page OCR: time per card, how often
+the region path falls back, and per-field agreement of the extracted
+fields with the full-page path.
+
+    python benchmarks/layout_ocr.py --images cards/ --json layout_ocr.json
+
+Images should be fronts of Aadhaar cards (the CNN check is not run here).
+Without --images, synthetic cards are used.
+"""
+import argparse
+import os
+import time
+
+from common import percentile, print_table, synthetic_card, write_results
+from Pipelines.bulk_scoring import walk_images
+from Pipelines.image_buffer import ImageBuffer
+from Pipelines.extract_Aadhaar import extract_fields
+from Pipelines.layout_ocr import FIELDS, LayoutOCR
+from Pipelines.ocr_extractor import get_ocr_service, warmup_ocr
+from Pipelines.verification import preprocess_buffer
+
+
+def load_cards(images_dir, count):
+    if not images_dir:
+        return [(f"synthetic_{i}", ImageBuffer(synthetic_card(seed=i), "<synthetic>")) for i in range(count)]
+    paths = walk_images(images_dir)[:count]
+    return [(p, preprocess_buffer(ImageBuffer.from_path(os.path.join(images_dir, p)))) for p in paths]
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, (time.perf_counter() - t0) * 1000
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Region OCR vs full-page OCR")
+    parser.add_argument("--images", default=None, help="Directory of card images")
+    parser.add_argument("--count", type=int, default=20)
+    parser.add_argument("--min-score", type=float, default=0.8)
+    parser.add_argument("--json", default=None, help="Write results to this file")
+    args = parser.parse_args(argv)
+
+    warmup_ocr(get_ocr_service())
+    layout = LayoutOCR(min_score=args.min_score)
+    cards = load_cards(args.images, args.count)
+
+    full_ms, roi_ms, served_ms = [], [], []
+    agree = {f: 0 for f in FIELDS}
+    served_agree = {f: 0 for f in FIELDS}
+    per_card = []
+    for name, img in cards:
+        full, t_full = timed(layout.read_page, img)
+        (roi, reason), t_roi = timed(layout.read_regions, img)
+        full_fields = extract_fields(full)
+        roi_fields = extract_fields(roi) if roi is not None else dict.fromkeys(FIELDS)
+        # What the stage serves: the regions, or the full page after a fallback
+        served = roi_fields if reason is None else full_fields
+
+        full_ms.append(t_full)
+        roi_ms.append(t_roi)
+        served_ms.append(t_roi if reason is None else t_roi + t_full)
+        for f in FIELDS:
+            agree[f] += roi_fields[f] == full_fields[f]
+            served_agree[f] += served[f] == full_fields[f]
+        per_card.append({"image": name, "fallback_reason": reason, "full_ms": round(t_full, 1),
+                         "roi_ms": round(t_roi, 1), "full_fields": full_fields, "roi_fields": roi_fields})
+
+    n = len(cards)
+    fallbacks = sum(1 for c in per_card if c["fallback_reason"])
+    rows = [{"field": f, "roi_agreement": f"{agree[f] / n:.1%}", "served_agreement": f"{served_agree[f] / n:.1%}"}
+            for f in FIELDS]
+    summary = {
+        "cards": n,
+        "fallback_rate": round(fallbacks / n, 3) if n else 0.0,
+        "full_page_ms": {"p50": round(percentile(full_ms, 50), 1), "p95": round(percentile(full_ms, 95), 1)},
+        "roi_ms": {"p50": round(percentile(roi_ms, 50), 1), "p95": round(percentile(roi_ms, 95), 1)},
+        "served_ms": {"p50": round(percentile(served_ms, 50), 1), "p95": round(percentile(served_ms, 95), 1)},
+        "field_agreement": {f: round(agree[f] / n, 3) for f in FIELDS} if n else {},
+        "served_field_agreement": {f: round(served_agree[f] / n, 3) for f in FIELDS} if n else {},
+    }
+
+    print_table(rows, ["field", "roi_agreement", "served_agreement"])
+    print(f"\n[bench] {n} cards, fallback rate {summary['fallback_rate']:.1%}")
+    print(f"[bench] full page p50 {summary['full_page_ms']['p50']} ms, regions p50 {summary['roi_ms']['p50']} ms, "
+          f"served (with fallbacks) p50 {summary['served_ms']['p50']} ms")
+    write_results(args.json, "layout_ocr", {"summary": summary, "cards": per_card},
+                  **{k: v for k, v in vars(args).items() if k != "json"})
+
+
+if __name__ == "__main__":
+    main()
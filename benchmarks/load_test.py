@@ -0,0 +1,192 @@
+# FILE: benchmarks/load_test.py
+"""
+Load generator for a running API: sends requests at a fixed target rate
+(open loop, so a slow server builds a queue instead of slowing the
+client) and reports, per endpoint, p50/p95/p99 latency, throughput and
+errors by status.
+
+    python run_api.py &   # or uvicorn app:app / prefork.py
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --scenario flow --rps 2 --duration 60 --json load.json
+
+Scenarios:
+  analyze  POST /api/analyze-card
+  face     POST /api/verify-face (tokens prepared by untimed analyze-card calls)
+  full     POST /api/verify-full with the card upload
+  flow     analyze-card -> verify-face -> verify-full with the token, one journey per tick
+  mix      analyze / face / full in turn
+
+Cards come from --corpus (written by benchmarks/corpus.py) or are
+generated in memory. 503 (overloaded) and 504 (deadline) answers are
+counted separately from other errors. Needs httpx.
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from common import card_corpus, jpeg_bytes, percentile, print_table, synthetic_selfie, write_results
+
+SCENARIOS = ("analyze", "face", "full", "flow", "mix")
+
+
+class LoadRecorder:
+    def __init__(self):
+        self.latencies = {}
+        self.statuses = {}
+        self.lags = []
+
+    def add(self, endpoint, ms, status):
+        self.latencies.setdefault(endpoint, []).append(ms)
+        counts = self.statuses.setdefault(endpoint, {})
+        counts[status] = counts.get(status, 0) + 1
+
+    def rows(self, elapsed):
+        rows = []
+        for endpoint, ms in sorted(self.latencies.items()):
+            counts = self.statuses[endpoint]
+            ok = sum(n for s, n in counts.items() if isinstance(s, int) and s < 400)
+            rows.append({
+                "endpoint": endpoint, "requests": len(ms), "ok": ok,
+                "overloaded": counts.get(503, 0), "deadline": counts.get(504, 0),
+                "errors": len(ms) - ok - counts.get(503, 0) - counts.get(504, 0),
+                "p50_ms": round(percentile(ms, 50), 1), "p95_ms": round(percentile(ms, 95), 1),
+                "p99_ms": round(percentile(ms, 99), 1), "ok_per_sec": round(ok / elapsed, 3),
+                "statuses": {str(s): n for s, n in sorted(counts.items(), key=lambda i: str(i[0]))},
+            })
+        return rows
+
+
+class Driver:
+    """One request helper per endpoint, each recording its latency and status."""
+
+    def __init__(self, client, recorder, cards, selfie):
+        self.client = client
+        self.recorder = recorder
+        self.cards = cards
+        self.selfie = selfie
+        self.tokens = []
+
+    async def post(self, endpoint, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            response = await self.client.post(endpoint, **kwargs)
+            status = response.status_code
+        except Exception as e:
+            response, status = None, type(e).__name__
+        self.recorder.add(endpoint, (time.perf_counter() - t0) * 1000, status)
+        return response
+
+    def card(self, i):
+        card = self.cards[i % len(self.cards)]
+        return {"file": ("bench_" + card["name"], card["data"], "image/jpeg")}
+
+    async def analyze(self, i):
+        response = await self.post("/api/analyze-card", files=self.card(i))
+        if response is not None and response.status_code == 200:
+            return response.json().get("verification_token")
+        return None
+
+    async def face(self, i, token=None):
+        token = token or self.tokens[i % len(self.tokens)]
+        await self.post("/api/verify-face", data={"verification_token": token},
+                        files={"person_image": ("selfie.jpg", self.selfie, "image/jpeg")})
+
+    async def full(self, i, token=None):
+        if token is not None:
+            await self.post("/api/verify-full", data={"verification_token": token})
+        else:
+            await self.post("/api/verify-full", files=self.card(i))
+
+    async def flow(self, i):
+        token = await self.analyze(i)
+        if token is not None:
+            await self.face(i, token)
+            await self.full(i, token)
+
+    async def mix(self, i):
+        await (self.analyze, self.face, self.full)[i % 3](i)
+
+    async def prepare_tokens(self, count):
+        """Untimed analyze-card calls whose tokens the face scenario reuses."""
+        for i in range(count):
+            response = await self.client.post("/api/analyze-card", files=self.card(i))
+            token = response.json().get("verification_token") if response.status_code == 200 else None
+            if token:
+                self.tokens.append(token)
+        if not self.tokens:
+            raise RuntimeError("analyze-card returned no verification token (is the CNN model loaded?)")
+
+async def run_load(args, cards, selfie):
+    import httpx
+    recorder = LoadRecorder()
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        driver = Driver(client, recorder, cards, selfie)
+        if args.scenario in ("face", "mix"):
+            await driver.prepare_tokens(min(len(cards), 8))
+        op = getattr(driver, args.scenario)
+
+        total = int(args.rps * args.duration)
+        tasks, dropped = set(), 0
+        started = time.perf_counter()
+        for i in range(total):
+            due = started + i / args.rps
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            recorder.lags.append(max(0.0, -delay) * 1000)
+            if len(tasks) >= args.max_in_flight:
+                dropped += 1  # the client itself is saturated
+                continue
+            task = asyncio.create_task(op(i))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        # Achieved send rate: one tick per operation, up to the last one
+        send_rate = (total - dropped) / (time.perf_counter() - started + 1 / args.rps)
+        if tasks:
+            await asyncio.wait(tasks)
+        elapsed = time.perf_counter() - started
+    return recorder, elapsed, total, dropped, send_rate
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fixed-rate load generator for the verification API")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--scenario", choices=SCENARIOS, default="full")
+    parser.add_argument("--rps", type=float, default=2.0, help="Target operations (journeys for flow) per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load")
+    parser.add_argument("--corpus", default=None, help="Directory written by benchmarks/corpus.py")
+    parser.add_argument("--count", type=int, default=20, help="Cards to generate when --corpus is not given")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Client timeout per request (s)")
+    parser.add_argument("--max-in-flight", type=int, default=256)
+    parser.add_argument("--json", default=None, help="Write results to this file")
+    args = parser.parse_args(argv)
+
+    try:
+        import httpx  # noqa: F401
+    except ImportError:
+        sys.exit("load_test.py needs httpx: pip install httpx")
+
+    if args.corpus:
+        from corpus import read_corpus
+        cards, selfies = read_corpus(args.corpus)
+        selfie = selfies[0] if selfies else jpeg_bytes(synthetic_selfie(args.seed))
+    else:
+        cards, selfie = card_corpus(args.count, args.seed), jpeg_bytes(synthetic_selfie(args.seed))
+
+    recorder, elapsed, total, dropped, send_rate = asyncio.run(run_load(args, cards, selfie))
+    rows = recorder.rows(elapsed)
+    print_table(rows, ["endpoint", "requests", "ok", "overloaded", "deadline", "errors",
+                       "p50_ms", "p95_ms", "p99_ms", "ok_per_sec"])
+    print(f"\n[load] {args.scenario}: {total} operations at {args.rps}/s target over {elapsed:.1f}s "
+          f"({send_rate:.2f}/s sent, {dropped} dropped); "
+          f"max schedule lag {max(recorder.lags, default=0):.1f} ms")
+    write_results(args.json, "load_test", {
+        "endpoints": rows, "elapsed_s": round(elapsed, 2), "operations": total, "dropped": dropped,
+        "sent_per_sec": round(send_rate, 3),
+        "max_schedule_lag_ms": round(max(recorder.lags, default=0), 1),
+    }, **{k: v for k, v in vars(args).items() if k != "json"})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# FILE: benchmarks/ocr_pool.py
+"""
+OCR throughput (pages/sec) for different engine-pool sizes and per-engine
+CPU thread counts, with concurrent clients submitting pages through the
+batched OCRService.
+
+    python benchmarks/ocr_pool.py --pool-sizes 1 2 4 --cpu-threads 1 2 4 --pages 64
+
+A good setting keeps pool size x threads close to the cores given to OCR.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import percentile, print_table, synthetic_card, write_results
+from Pipelines.ocr_extractor import OCREnginePool, OCRService, create_ocr_engine, warmup_ocr
+
+
+def run_config(pool_size, cpu_threads, pages, clients, max_batch, max_wait_ms, mkldnn, rec_batch):
+    pool = OCREnginePool(pool_size, lambda: create_ocr_engine(cpu_threads, mkldnn, rec_batch)).fill()
+    service = OCRService(pool, max_batch=max_batch, max_wait_ms=max_wait_ms)
+    warmup_ocr(service)
+
+    latencies = []
+    def one(img):
+        t0 = time.perf_counter()
+        service.recognize(img)
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as clients_pool:
+        list(clients_pool.map(one, pages))
+    elapsed = time.perf_counter() - started
+
+    batcher = service.batcher.stats()
+    service.batcher.close()
+    return {
+        "pool_size": pool_size,
+        "cpu_threads": cpu_threads or "default",
+        "pages_per_sec": round(len(pages) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "avg_batch": batcher["mean_batch_size"],
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OCR engine pool throughput")
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--cpu-threads", type=int, nargs="+", default=[0],
+                        help="Threads per engine; 0 = Paddle default")
+    parser.add_argument("--pages", type=int, default=32)
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent submitting threads")
+    parser.add_argument("--max-batch", type=int, default=4)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--mkldnn", choices=["on", "off", "default"], default="default")
+    parser.add_argument("--rec-batch", type=int, default=0)
+    parser.add_argument("--json", default=None, help="Write results to this file")
+    args = parser.parse_args(argv)
+
+    mkldnn = {"on": True, "off": False}.get(args.mkldnn)
+    pages = [synthetic_card(seed=i) for i in range(args.pages)]
+    rows = []
+    for pool_size in args.pool_sizes:
+        for threads in args.cpu_threads:
+            row = run_config(pool_size, threads or None, pages, args.clients,
+                             args.max_batch, args.max_wait_ms, mkldnn, args.rec_batch or None)
+            print(f"[bench] pool={pool_size} threads={row['cpu_threads']}: {row['pages_per_sec']} pages/sec")
+            rows.append(row)
+
+    print()
+    print_table(rows, ["pool_size", "cpu_threads", "pages_per_sec", "p50_ms", "p95_ms", "avg_batch"])
+    write_results(args.json, "ocr_pool", rows, **{k: v for k, v in vars(args).items() if k != "json"})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# FILE: benchmarks/pipeline_stages.py
+"""
+Microbenchmark of every Pipelines/ stage function on the synthetic card
+corpus (scans and phone photos with QR codes): p50/p95/p99 and calls/sec
+per stage, each call on a freshly decoded buffer so no cached view is
+reused between calls.
+
+    python benchmarks/pipeline_stages.py --count 20 --repeat 3 --json stages.json
+
+Stages whose model cannot be loaded here (CNN, OCR, fraud model) are
+reported as skipped; downstream stages then get stand-in inputs (the
+printed card text as OCR output, the CNN fallback result). --synthetic-fraud
+trains a stand-in forest so predict_fraud can still be timed. Compare two
+result files with benchmarks/compare.py.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from common import card_corpus, jpeg_bytes, percentile, print_table, synthetic_selfie, write_results
+from Pipelines.image_buffer import ImageBuffer
+from Pipelines.result_cache import content_digest
+from Pipelines.verification import build_ml_record, preprocess_buffer, validate_qr_with_backup
+from Pipelines.CNN_predict import cnn_predict_batch, fallback_result, load_cnn_model, preprocess_single_image
+from Pipelines.ocr_extractor import run_ocr
+from Pipelines.extract_Aadhaar import extract_fields_detailed
+from Pipelines.rule_validator import rule_validation
+from Pipelines.consistency_checker import build_consistency
+from Pipelines.forensic_analyzer import analyze_image_forensics
+from Pipelines.tamper_map import analyze_tamper_map
+from Pipelines.fraud_assement import assess_fraud
+from Pipelines.model_json import load_fraud_model, predict_fraud
+from Pipelines.final_decision import make_final_decision
+from Pipelines.face_matcher import verify_face
+
+
+def fresh(buffer):
+    """Same pixels, no cached views."""
+    return ImageBuffer(buffer.bgr, "<bench>")
+
+def printed_ocr(card):
+    """OCR-shaped result holding the card's printed lines (when OCR is unavailable)."""
+    lines = card["lines"] or []
+    return {"rec_texts": lines, "rec_scores": [1.0] * len(lines)}
+
+def load_models(args):
+    """{"cnn", "fraud"} models (None when unavailable) and skip reasons."""
+    models, skipped = {}, {}
+    try:
+        models["cnn"] = load_cnn_model()
+    except Exception as e:
+        models["cnn"], skipped["cnn"] = None, f"CNN model not loadable ({e.__class__.__name__})"
+    try:
+        models["fraud"] = load_fraud_model()
+    except Exception as e:
+        models["fraud"] = None
+        if args.synthetic_fraud:
+            from fraud_model import synthetic_forest
+            path = os.path.join(tempfile.mkdtemp(prefix="stage_bench_"), "forest.pkl")
+            synthetic_forest(path, args.synthetic_fraud)
+            models["fraud"] = load_fraud_model(path, backend="sklearn")
+        else:
+            skipped["predict_fraud"] = f"fraud model not loadable ({e.__class__.__name__}); try --synthetic-fraud 100"
+    return models, skipped
+
+def stage_inputs(card, selfie, models, skipped):
+    """Runs the pipeline once on `card`; returns every stage's inputs and outputs."""
+    v = {"upload_bytes": card["data"], "selfie": selfie, "qr_backup_bytes": None}
+    v["raw_image"] = ImageBuffer.from_bytes(v["upload_bytes"])
+    v["image"] = preprocess_buffer(fresh(v["raw_image"]))
+    v["tensor"] = preprocess_single_image(fresh(v["image"]))
+    v["cnn_out"] = cnn_predict_batch(models["cnn"], [v["tensor"]])[0] if models["cnn"] else fallback_result()
+    v["ocr_result"] = None
+    if "ocr" not in skipped:
+        try:
+            v["ocr_result"] = run_ocr(fresh(v["image"]))
+        except Exception as e:
+            skipped["ocr"] = f"OCR engine unavailable ({e.__class__.__name__})"
+    if v["ocr_result"] is None:
+        v["ocr_result"] = printed_ocr(card)
+    v["aadhaar_fields"], _ = extract_fields_detailed(v["ocr_result"])
+    v["qr_result"] = validate_qr_with_backup(fresh(v["image"]), None)
+    v["forensics"] = analyze_image_forensics(fresh(v["raw_image"]))
+    v["validation"] = rule_validation(v["aadhaar_fields"], v["qr_result"]["status"])
+    v["consistency"] = build_consistency(v["aadhaar_fields"], v["qr_result"])
+    v["fraud_rule"] = assess_fraud(v["validation"], v["qr_result"], v["consistency"], v["forensics"])
+    v["record"] = build_ml_record(v["validation"], v["consistency"], v["forensics"], v["aadhaar_fields"],
+                                  v["qr_result"])
+    v["fraud_ml"] = (predict_fraud(models["fraud"], v["record"]) if models["fraud"] is not None
+                     else {"prediction": "REAL", "fraud_probability": 0.0})
+    return v
+
+# (stage, function of the stage inputs); skipped when its model is missing
+STAGES = [
+    ("content_digest", lambda v, m: content_digest(v["upload_bytes"])),
+    ("decode", lambda v, m: ImageBuffer.from_bytes(v["upload_bytes"])),
+    ("preprocess", lambda v, m: preprocess_buffer(fresh(v["raw_image"]))),
+    ("cnn_tensor", lambda v, m: preprocess_single_image(fresh(v["image"]))),
+    ("cnn", lambda v, m: cnn_predict_batch(m["cnn"], [v["tensor"]])),
+    ("ocr", lambda v, m: run_ocr(fresh(v["image"]))),
+    ("extract_fields", lambda v, m: extract_fields_detailed(v["ocr_result"])),
+    ("qr", lambda v, m: validate_qr_with_backup(fresh(v["image"]), None)),
+    ("forensics", lambda v, m: analyze_image_forensics(fresh(v["raw_image"]))),
+    ("tamper_map", lambda v, m: analyze_tamper_map(fresh(v["raw_image"]))),
+    ("rule_validation", lambda v, m: rule_validation(v["aadhaar_fields"], v["qr_result"]["status"])),
+    ("consistency", lambda v, m: build_consistency(v["aadhaar_fields"], v["qr_result"])),
+    ("assess_fraud", lambda v, m: assess_fraud(v["validation"], v["qr_result"], v["consistency"], v["forensics"])),
+    ("predict_fraud", lambda v, m: predict_fraud(m["fraud"], v["record"])),
+    ("final_decision", lambda v, m: make_final_decision(v["cnn_out"], v["fraud_ml"], v["fraud_rule"])),
+    ("face_match", lambda v, m: verify_face(fresh(v["raw_image"]), v["selfie"])),
+]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-stage microbenchmark of the verification pipeline")
+    parser.add_argument("--count", type=int, default=10, help="Corpus images (half scans, half photos)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Timed calls per image and stage")
+    parser.add_argument("--stages", nargs="*", default=None, help="Only these stages")
+    parser.add_argument("--synthetic-fraud", type=int, default=0, metavar="TREES",
+                        help="Stand-in forest with this many trees when the fraud model is missing")
+    parser.add_argument("--json", default=None, help="Write results to this file")
+    args = parser.parse_args(argv)
+
+    corpus = card_corpus(args.count, args.seed)
+    selfie = jpeg_bytes(synthetic_selfie(args.seed))
+    models, skipped = load_models(args)
+    inputs = [stage_inputs(card, selfie, models, skipped) for card in corpus]
+
+    rows = []
+    for name, func in STAGES:
+        if (args.stages and name not in args.stages) or name in skipped:
+            continue
+        func(inputs[0], models)  # warm-up (lazy engines, thread-local objects)
+        times = []
+        for v in inputs:
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                func(v, models)
+                times.append((time.perf_counter() - t0) * 1000)
+        mean = sum(times) / len(times)
+        rows.append({
+            "stage": name, "calls": len(times),
+            "p50_ms": round(percentile(times, 50), 3), "p95_ms": round(percentile(times, 95), 3),
+            "p99_ms": round(percentile(times, 99), 3), "mean_ms": round(mean, 3),
+            "per_sec": round(1000 / mean, 1) if mean else None,
+        })
+
+    print_table(rows, ["stage", "calls", "p50_ms", "p95_ms", "p99_ms", "mean_ms", "per_sec"])
+    for name, reason in skipped.items():
+        print(f"[bench] skipped {name}: {reason}")
+    write_results(args.json, "pipeline_stages", {"stages": rows, "skipped": skipped},
+                  **{k: v for k, v in vars(args).items() if k != "json"})
+
+
+if __name__ == "__main__":
+    main()
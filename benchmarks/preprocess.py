@@ -0,0 +1,114 @@
+# FILE: benchmarks/preprocess.py
+"""
+Per-step time of preprocess_document against the previous implementation
+of each step (a new CLAHE object per call with split/merge of the LAB
+channels, findNonZero for the crop, minAreaRect over every dark pixel at
+full size for the skew), plus a parity check of the steps that must give
+identical pixels.
+
+    python benchmarks/preprocess.py --images cards/ --json preprocess.json
+
+Without --images, synthetic cards (scanned size and phone-photo size) are
+used. Exits non-zero if the CLAHE or crop output differs from the old one.
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from common import percentile, print_table, synthetic_card, synthetic_qr_card, write_results
+from Pipelines.bulk_scoring import walk_images
+from Pipelines.preprocess import (
+    PREPROCESS_CONFIG, crop_background, estimate_skew, normalize_brightness, preprocess_document, resize_image,
+)
+
+
+# Previous implementations, for comparison
+def baseline_normalize_brightness(img):
+    lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
+    l, a, b = cv2.split(lab)
+    clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
+    l = clahe.apply(l)
+    return cv2.cvtColor(cv2.merge((l, a, b)), cv2.COLOR_LAB2BGR)
+
+def baseline_crop_background(img):
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    _, th = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    coords = cv2.findNonZero(th)
+    if coords is None: return img
+    x, y, w, h = cv2.boundingRect(coords)
+    return img[y:y + h, x:x + w]
+
+def baseline_estimate_skew(img):
+    gray = cv2.bitwise_not(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+    thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1]
+    coords = np.column_stack(np.where(thresh > 0)).astype(np.float32)
+    return cv2.minAreaRect(coords)[-1] if len(coords) else 0.0
+
+
+def load_corpus(images_dir, count):
+    if not images_dir:
+        half = count // 2
+        return ([synthetic_card(seed=i) for i in range(count - half)]
+                + [synthetic_qr_card(seed=i)[0] for i in range(half)])
+    imgs = [cv2.imread(os.path.join(images_dir, p)) for p in walk_images(images_dir)[:count]]
+    return [img for img in imgs if img is not None]
+
+def timed(fn, arg, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        out = fn(arg)
+    return out, (time.perf_counter() - t0) * 1000 / repeat
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Preprocessing per-step benchmark")
+    parser.add_argument("--images", default=None, help="Directory of card images")
+    parser.add_argument("--count", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", default=None, help="Write results to this file")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.images, args.count)
+    steps = {
+        "clahe": (baseline_normalize_brightness, normalize_brightness),
+        "crop": (baseline_crop_background, crop_background),
+        "skew_estimate": (baseline_estimate_skew, estimate_skew),
+    }
+    times = {name: ([], []) for name in steps}
+    mismatches = 0
+    pipeline = {}
+    for img in corpus:
+        resized = resize_image(img, PREPROCESS_CONFIG["size"])
+        for name, (old_fn, new_fn) in steps.items():
+            old, t_old = timed(old_fn, resized, args.repeat)
+            new, t_new = timed(new_fn, resized, args.repeat)
+            times[name][0].append(t_old)
+            times[name][1].append(t_new)
+            if name != "skew_estimate" and (old.shape != new.shape or not np.array_equal(old, new)):
+                mismatches += 1
+        step_ms = {}
+        preprocess_document(img, timings=step_ms)
+        for name, ms in step_ms.items():
+            pipeline.setdefault(name, []).append(ms)
+
+    rows = [{"step": name, "old_p50_ms": round(percentile(old, 50), 2), "new_p50_ms": round(percentile(new, 50), 2),
+             "speedup": f"{percentile(old, 50) / max(percentile(new, 50), 1e-6):.1f}x"}
+            for name, (old, new) in times.items()]
+    pipeline_rows = [{"step": name, "p50_ms": round(percentile(ms, 50), 2), "p95_ms": round(percentile(ms, 95), 2)}
+                     for name, ms in pipeline.items()]
+
+    print_table(rows, ["step", "old_p50_ms", "new_p50_ms", "speedup"])
+    print()
+    print_table(pipeline_rows, ["step", "p50_ms", "p95_ms"])
+    print(f"\n[bench] {len(corpus)} images, {mismatches} CLAHE/crop outputs differ from the old steps")
+    write_results(args.json, "preprocess", {"steps": rows, "pipeline": pipeline_rows, "mismatches": mismatches},
+                  **{k: v for k, v in vars(args).items() if k != "json"})
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# FILE: benchmarks/qr_decode.py
+"""
+QR decode rate and latency: the localized multi-scale path used by
+validate_qr against decoding the whole frame.
+
+    python benchmarks/qr_decode.py --images cards/ --json qr_decode.json
+
+Without --images, synthetic phone-sized card photos with known QR text are
+generated (then the decoded text is also checked against the expected one).
+"""
+import argparse
+import os
+import time
+
+import cv2
+
+from common import percentile, print_table, synthetic_qr_card, write_results
+from Pipelines.bulk_scoring import walk_images
+from Pipelines.image_buffer import ImageBuffer
+from Pipelines.qr_validator import decode_full_frame, decode_qr_text
+
+
+def load_corpus(images_dir, count):
+    if not images_dir:
+        return [(f"synthetic_{i}",) + synthetic_qr_card(seed=i) for i in range(count)]
+    return [(p, cv2.imread(os.path.join(images_dir, p)), None) for p in walk_images(images_dir)[:count]]
+
+def run_method(name, decode, corpus):
+    latencies, decoded, correct = [], 0, 0
+    for _, img, expected in corpus:
+        buf = ImageBuffer(img, "<bench>")  # fresh buffer: no cached views
+        t0 = time.perf_counter()
+        text = decode(buf)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        decoded += bool(text)
+        correct += bool(text) and (expected is None or text == expected)
+    n = len(corpus)
+    return {
+        "method": name,
+        "decode_rate": f"{decoded / n:.1%}",
+        "correct": f"{correct / n:.1%}",
+        "mean_ms": round(sum(latencies) / n, 1),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "max_ms": round(max(latencies), 1),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="QR localization / decoding benchmark")
+    parser.add_argument("--images", default=None, help="Directory of card images")
+    parser.add_argument("--count", type=int, default=30)
+    parser.add_argument("--budget-ms", type=float, default=None, help="Override the decode budget")
+    parser.add_argument("--json", default=None, help="Write results to this file")
+    args = parser.parse_args(argv)
+
+    corpus = [c for c in load_corpus(args.images, args.count) if c[1] is not None]
+    methods = [
+        ("full_frame", decode_full_frame),
+        ("localized", lambda buf: decode_qr_text(buf, args.budget_ms)[0]),
+    ]
+    for _, decode in methods:  # warm up detectors / code paths
+        decode(ImageBuffer(corpus[0][1], "<warmup>"))
+
+    rows = [run_method(name, decode, corpus) for name, decode in methods]
+    print(f"[bench] {len(corpus)} images")
+    print_table(rows, ["method", "decode_rate", "correct", "mean_ms", "p50_ms", "p95_ms", "max_ms"])
+    write_results(args.json, "qr_decode", rows, **{k: v for k, v in vars(args).items() if k != "json"})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# FILE: benchmarks/tamper_map.py
+"""
+Tamper heat-map latency against image size, and how well it separates
+clean cards from cards with a pasted region.
+
+    python benchmarks/tamper_map.py --sizes 640x1000 1944x2592 3000x4000 --budget-ms 500 --json tamper_map.json
+
+For every size, synthetic card photos (with camera-like noise and JPEG
+compression) are analyzed as they are and with one region replaced
+(blurred, re-lettered, saved again). A hit is a tampered card whose top
+region overlaps the replaced one.
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from common import percentile, print_table, synthetic_qr_card, write_results
+from Pipelines.tamper_map import TAMPER_CONFIG, analyze_tamper_map, jpeg_roundtrip
+
+
+def camera(img, seed):
+    rng = np.random.default_rng(seed)
+    return jpeg_roundtrip(np.clip(img + rng.normal(0, 3, img.shape), 0, 255).astype(np.uint8), 88)
+
+def tamper(img):
+    """Replaces a number-sized region; returns (image, box)."""
+    h, w = img.shape[:2]
+    y, x, ph, pw = int(h * 0.55), int(w * 0.35), h // 8, w // 6
+    patch = cv2.GaussianBlur(img[y:y + ph, x:x + pw], (5, 5), 0)
+    cv2.putText(patch, "9876", (5, ph - 10), cv2.FONT_HERSHEY_SIMPLEX, ph / 60, (20, 20, 20), max(1, ph // 25))
+    out = img.copy()
+    out[y:y + ph, x:x + pw] = patch
+    return jpeg_roundtrip(out, 88), (x, y, x + pw, y + ph)
+
+def overlaps(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+def run_size(size, count, budget_ms):
+    latencies, coverage, exhausted = [], [], 0
+    clean_scores, tampered_scores, hits = [], [], 0
+    for seed in range(count):
+        clean = camera(synthetic_qr_card(seed, size=size)[0], seed)
+        forged, box = tamper(clean)
+        clean = jpeg_roundtrip(clean, 88)  # saved as often as the forged one
+        for img, scores in ((clean, clean_scores), (forged, tampered_scores)):
+            t0 = time.perf_counter()
+            result = analyze_tamper_map(img, budget_ms=budget_ms)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            coverage.append(result["coverage"])
+            exhausted += result["budget_exhausted"]
+            scores.append(result["max_score"])
+        hits += bool(result["regions"]) and overlaps(result["regions"][0]["box"], box)
+    runs = 2 * count
+    return {
+        "size": f"{size[0]}x{size[1]}",
+        "megapixels": round(size[0] * size[1] / 1e6, 1),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "max_ms": round(max(latencies), 1),
+        "coverage": round(sum(coverage) / runs, 3),
+        "budget_exhausted": f"{exhausted / runs:.0%}",
+        "clean_max_score": round(percentile(clean_scores, 50), 2),
+        "tampered_max_score": round(percentile(tampered_scores, 50), 2),
+        "hit_rate": f"{hits / count:.0%}",
+    }
+
+def parse_size(text):
+    h, w = text.lower().split("x")
+    return int(h), int(w)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tamper heat-map benchmark")
+    parser.add_argument("--sizes", nargs="+", type=parse_size,
+                        default=[(640, 1000), (1200, 1600), (1944, 2592), (3000, 4000)], help="HxW")
+    parser.add_argument("--count", type=int, default=5, help="Cards per size")
+    parser.add_argument("--budget-ms", type=float, default=TAMPER_CONFIG["budget_ms"])
+    parser.add_argument("--json", default=None, help="Write results to this file")
+    args = parser.parse_args(argv)
+
+    rows = [run_size(size, args.count, args.budget_ms) for size in args.sizes]
+    print_table(rows, ["size", "megapixels", "p50_ms", "p95_ms", "max_ms", "coverage", "budget_exhausted",
+                       "clean_max_score", "tampered_max_score", "hit_rate"])
+    print(f"\n[bench] budget {args.budget_ms} ms, threshold {TAMPER_CONFIG['threshold']}, "
+          f"{TAMPER_CONFIG['workers']} tile workers")
+    write_results(args.json, "tamper_map", rows,
+                  **{k: v for k, v in vars(args).items() if k != "json"})
+
+
+if __name__ == "__main__":
+    main()
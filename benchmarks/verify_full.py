@@ -0,0 +1,116 @@
+# FILE: benchmarks/verify_full.py
+"""
+End-to-end timing of the verification API in-process (FastAPI test
+client, no network): /api/verify-full on each corpus card, or with
+--flow the full user journey (analyze-card, verify-face with the returned
+token, verify-full with the token). Reports request latency
+percentiles, the mean time of every stage (from ?timings=true) and the
+decisions returned.
+
+    python benchmarks/verify_full.py --count 20 --json verify_full.json
+    python benchmarks/verify_full.py --flow --count 20
+
+The result cache is off (every request does the full work) unless
+--cache is given. --cascade on / shadow measures the early-exit cascade
+against the default concurrent graph. Verified users go to a temporary database and the
+uploads written by analyze-card are removed afterwards.
+"""
+import argparse
+import glob
+import os
+import tempfile
+import time
+
+from common import ROOT, card_corpus, jpeg_bytes, percentile, print_table, synthetic_selfie, write_results
+
+
+def make_client(cache, cascade):
+    """Imports app.py with benchmark settings and returns (app module, TestClient)."""
+    os.environ["RAKSHA_CASCADE"] = cascade
+    os.environ.setdefault("RAKSHA_DB_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="bench_db_"), "bench.db"))
+    os.environ.setdefault("RAKSHA_LOG_LEVEL", "WARNING")
+    if not cache:
+        os.environ["RAKSHA_CACHE_BACKEND"] = "none"
+    os.chdir(ROOT)  # app.py resolves templates, static files and models from the repo root
+    import app
+    from fastapi.testclient import TestClient
+    return app, TestClient(app.app)
+
+def timed_post(client, url, latencies, **kwargs):
+    t0 = time.perf_counter()
+    response = client.post(url, **kwargs)
+    latencies.setdefault(url.split("?")[0], []).append((time.perf_counter() - t0) * 1000)
+    return response
+
+def run_full(client, card, latencies):
+    response = timed_post(client, "/api/verify-full?timings=true", latencies,
+                          files={"file": (card["name"], card["data"], "image/jpeg")})
+    return response.json()
+
+def run_flow(client, card, selfie, latencies):
+    name = "bench_" + card["name"]
+    analyzed = timed_post(client, "/api/analyze-card", latencies,
+                          files={"file": (name, card["data"], "image/jpeg")}).json()
+    token = analyzed.get("verification_token")
+    if token is None:
+        return {"final_decision": {"final_decision": "REJECTED"}, "timings": None}
+    timed_post(client, "/api/verify-face", latencies, data={"verification_token": token},
+               files={"person_image": ("selfie.jpg", selfie, "image/jpeg")})
+    return timed_post(client, "/api/verify-full?timings=true", latencies, data={"verification_token": token}).json()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="In-process end-to-end benchmark of verify-full")
+    parser.add_argument("--count", type=int, default=10, help="Corpus images (half scans, half photos)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rounds", type=int, default=1, help="Passes over the corpus")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed requests first (model loading)")
+    parser.add_argument("--flow", action="store_true", help="analyze-card -> verify-face -> verify-full")
+    parser.add_argument("--cache", action="store_true", help="Keep the configured result cache")
+    parser.add_argument("--cascade", choices=("off", "on", "shadow"), default="off", help="RAKSHA_CASCADE mode")
+    parser.add_argument("--json", default=None, help="Write results to this file")
+    args = parser.parse_args(argv)
+
+    corpus = card_corpus(args.count, args.seed)
+    selfie = jpeg_bytes(synthetic_selfie(args.seed))
+    app, client = make_client(args.cache, args.cascade)
+
+    try:
+        for card in corpus[:args.warmup]:
+            run_flow(client, card, selfie, {}) if args.flow else run_full(client, card, {})
+
+        latencies, stages, decisions, early_stops = {}, {}, {}, 0
+        started = time.perf_counter()
+        for _ in range(args.rounds):
+            for card in corpus:
+                result = run_flow(client, card, selfie, latencies) if args.flow else run_full(client, card, latencies)
+                decision = (result.get("final_decision") or {}).get("final_decision", "ERROR")
+                decisions[decision] = decisions.get(decision, 0) + 1
+                early_stops += bool((result.get("cascade") or {}).get("stopped_by"))
+                for name, timing in ((result.get("timings") or {}).get("stages") or {}).items():
+                    stages.setdefault(name, []).append(timing["duration_ms"])
+        elapsed = time.perf_counter() - started
+    finally:
+        for path in glob.glob(os.path.join(app.UPLOAD_DIR, "bench_*")):
+            os.remove(path)
+
+    journeys = args.rounds * len(corpus)
+    endpoint_rows = [{"endpoint": url, "requests": len(ms), "p50_ms": round(percentile(ms, 50), 1),
+                      "p95_ms": round(percentile(ms, 95), 1), "p99_ms": round(percentile(ms, 99), 1)}
+                     for url, ms in latencies.items()]
+    stage_rows = sorted(({"stage": name, "runs": len(ms), "mean_ms": round(sum(ms) / len(ms), 2),
+                          "p95_ms": round(percentile(ms, 95), 2)} for name, ms in stages.items()),
+                        key=lambda r: -r["mean_ms"])
+
+    print_table(endpoint_rows, ["endpoint", "requests", "p50_ms", "p95_ms", "p99_ms"])
+    print()
+    print_table(stage_rows, ["stage", "runs", "mean_ms", "p95_ms"])
+    print(f"\n[bench] {journeys} {'journeys' if args.flow else 'requests'} in {elapsed:.1f}s "
+          f"({journeys / elapsed:.2f}/s); decisions {decisions}; cascade {args.cascade}, {early_stops} early stops")
+    write_results(args.json, "verify_full", {
+        "endpoints": endpoint_rows, "stages": stage_rows, "decisions": decisions,
+        "per_sec": round(journeys / elapsed, 3), "stopped_early": early_stops,
+    }, **{k: v for k, v in vars(args).items() if k != "json"})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#bulk_score.py
+"""
+Offline bulk scoring: runs every image below a directory through the
+verification pipeline and writes one JSON line per image.
+
+    python bulk_score.py scans/ --output results.ndjson --workers 8
+
+Images are processed in chunks: OCR/QR/forensics in parallel, one CNN
+batch and one RandomForest predict_proba per chunk. Each finished chunk
+is appended to the output and its paths to the checkpoint file, so an
+interrupted run continues where it stopped when started again with the
+same arguments.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from Pipelines.CNN_predict import load_cnn_model
+from Pipelines.model_json import load_fraud_model
+from Pipelines.bulk_scoring import cnn_infer_direct, score_batch, walk_images
+
+
+def read_checkpoint(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+def read_file(root, rel_path):
+    with open(os.path.join(root, rel_path), "rb") as f:
+        return rel_path, f.read()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="RakshaUID offline bulk scoring")
+    parser.add_argument("input_dir", help="Directory scanned recursively for card images")
+    parser.add_argument("--output", default="bulk_results.ndjson")
+    parser.add_argument("--checkpoint", default=None,
+                        help="Completed-paths file (default: <output>.checkpoint)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4,
+                        help="Threads for decoding, OCR, QR and forensics")
+    parser.add_argument("--chunk-size", type=int, default=64,
+                        help="Images per chunk (one RandomForest call each)")
+    parser.add_argument("--cnn-batch-size", type=int, default=32)
+    parser.add_argument("--cnn-backend", choices=["keras", "tflite"], default="keras")
+    parser.add_argument("--cnn-model", default=None, help="Model file (default: the backend's)")
+    parser.add_argument("--fraud-backend", choices=["sklearn", "compiled"], default="sklearn")
+    parser.add_argument("--fraud-model", default=None, help="Model file (default: the backend's)")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignore the checkpoint and overwrite the output")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.input_dir):
+        sys.exit(f"Not a directory: {args.input_dir}")
+    checkpoint = args.checkpoint or args.output + ".checkpoint"
+
+    if args.restart:
+        for path in (args.output, checkpoint):
+            if os.path.exists(path):
+                os.remove(path)
+
+    done = read_checkpoint(checkpoint)
+    pending = [p for p in walk_images(args.input_dir) if p not in done]
+    print(f"[bulk] {len(done)} already scored, {len(pending)} to go")
+    if not pending:
+        return
+
+    cnn_model = load_cnn_model(args.cnn_model, backend=args.cnn_backend)
+    fraud_model = load_fraud_model(args.fraud_model, backend=args.fraud_backend)
+    cnn_infer = cnn_infer_direct(cnn_model, batch_size=args.cnn_batch_size)
+
+    started = time.perf_counter()
+    scored = 0
+    with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="bulk") as pool, \
+            open(args.output, "a") as out, open(checkpoint, "a") as ckpt:
+        for i in range(0, len(pending), args.chunk_size):
+            chunk = list(pool.map(lambda p: read_file(args.input_dir, p), pending[i:i + args.chunk_size]))
+            results = score_batch(chunk, cnn_infer, fraud_model, pool)
+
+            # Results first, then the checkpoint: a crash in between re-scores
+            # (and duplicates) this chunk rather than losing it
+            for result in results:
+                out.write(json.dumps(result) + "\n")
+            out.flush()
+            os.fsync(out.fileno())
+            ckpt.writelines(rel_path + "\n" for rel_path, _ in chunk)
+            ckpt.flush()
+            os.fsync(ckpt.fileno())
+
+            scored += len(chunk)
+            elapsed = time.perf_counter() - started
+            print(f"[bulk] {len(done) + scored}/{len(done) + len(pending)} images, "
+                  f"{scored / elapsed:.2f} images/sec")
+
+    elapsed = time.perf_counter() - started
+    print(f"[bulk] scored {scored} images in {elapsed:.1f}s ({scored / elapsed:.2f} images/sec)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#compile_fraud_model.py
+"""
+Compiles the RandomForest fraud model into flat NumPy arrays (.npz) for
+the "compiled" backend, and checks that it gives bit-identical
+probabilities to the pickled model before writing it.
+
+    python compile_fraud_model.py --model Models/RandomForest_model.pkl --output Models/RandomForest_model.npz
+
+Serve the result with RAKSHA_FRAUD_BACKEND=compiled.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from Pipelines.compiled_forest import CompiledForest, parity_sample, reference_proba
+from Pipelines.model_json import FRAUD_COMPILED_PATH, FRAUD_MODEL_PATH, load_fraud_model
+
+
+def check_parity(model, compiled, X):
+    """Number of rows whose probabilities differ in any bit from the pickled model's predict_proba."""
+    expected = reference_proba(model, X)
+    got = compiled.predict_proba(X)
+    return int(np.sum(np.any(expected != got, axis=1)))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile the RandomForest fraud model to .npz")
+    parser.add_argument("--model", default=FRAUD_MODEL_PATH)
+    parser.add_argument("--output", default=FRAUD_COMPILED_PATH)
+    parser.add_argument("--parity-rows", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    model = load_fraud_model(args.model, backend="sklearn")
+    compiled = CompiledForest.from_sklearn(model)
+    print(f"[compile] {compiled.n_trees} trees, {compiled.n_nodes} nodes, depth {compiled.max_depth}")
+
+    X = parity_sample(compiled, args.parity_rows)
+    mismatches = check_parity(model, compiled, X)
+    if mismatches:
+        sys.exit(f"[compile] {mismatches}/{len(X)} rows differ from the pickled model; nothing written")
+    print(f"[compile] {len(X)} rows bit-identical (half of them on split thresholds)")
+
+    compiled.save(args.output)
+    t0 = time.perf_counter()
+    reloaded = CompiledForest.load(args.output)
+    load_ms = (time.perf_counter() - t0) * 1000
+    if check_parity(model, reloaded, X):
+        sys.exit(f"[compile] {args.output} does not reload identically")
+    print(f"[compile] wrote {args.output} (loads in {load_ms:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
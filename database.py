@@ -1,69 +1,239 @@
+import abc
+import asyncio
+import logging
+import os
 import sqlite3
+import threading
+
+from Pipelines.batching import MicroBatcher
+
+logger = logging.getLogger(__name__)
 
 DB_NAME = "raksha_database.db"
 
+# "<scheme>://<location>"; see create_backend()
+DB_URL = os.getenv("RAKSHA_DB_URL", f"sqlite:///{DB_NAME}")
+
+USER_COLUMNS = ("aadhaar_number", "name", "dob", "gender", "status", "confidence")
+
+# -------------------------------------------------
+# Backend interface
+# -------------------------------------------------
+class StorageBackend(abc.ABC):
+    """
+    What the storage layer needs from a database. A server database
+    backend implements these three calls and is added to BACKENDS.
+    """
+
+    @abc.abstractmethod
+    def init_schema(self):
+        """Creates the tables if they do not exist."""
+
+    @abc.abstractmethod
+    def get_user(self, aadhaar_number):
+        """Row as a dict, or None."""
+
+    @abc.abstractmethod
+    def insert_users(self, rows):
+        """
+        Inserts rows in one transaction, skipping Aadhaar numbers that
+        already exist. Returns one bool (inserted?) per row.
+        """
+
+    def close(self):
+        pass
+
+
+class SqliteBackend(StorageBackend):
+    """
+    One connection per thread (and per process after fork), in WAL mode so
+    lookups never wait for a writer. Statements are constant strings, so
+    sqlite's per-connection statement cache keeps them prepared.
+    """
+
+    SELECT_USER = "SELECT aadhaar_number, name, dob, gender, status, confidence FROM verified_users WHERE aadhaar_number=?"
+    INSERT_USER = '''
+        INSERT OR IGNORE INTO verified_users (aadhaar_number, name, dob, gender, status, confidence)
+        VALUES (?, ?, ?, ?, ?, ?)
+    '''
+
+    def __init__(self, path=DB_NAME, timeout=10.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._all = []
+        self._lock = threading.Lock()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False,
+                                   cached_statements=64)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            with self._lock:
+                self._all.append(conn)
+        return conn
+
+    def init_schema(self):
+        conn = self._conn()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS verified_users (
+                aadhaar_number TEXT PRIMARY KEY,
+                name TEXT,
+                dob TEXT,
+                gender TEXT,
+                status TEXT,
+                confidence REAL
+            )
+        ''')
+        conn.commit()
+
+    def get_user(self, aadhaar_number):
+        row = self._conn().execute(self.SELECT_USER, (aadhaar_number,)).fetchone()
+        return dict(zip(USER_COLUMNS, row)) if row else None
+
+    def insert_users(self, rows):
+        conn = self._conn()
+        inserted = []
+        with conn:
+            for row in rows:
+                cursor = conn.execute(self.INSERT_USER, tuple(row[c] for c in USER_COLUMNS))
+                inserted.append(cursor.rowcount == 1)
+        return inserted
+
+    def close(self):
+        with self._lock:
+            for conn in self._all:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._all.clear()
+        self._local = threading.local()
+
+
+# scheme -> factory(location)
+BACKENDS = {
+    "sqlite": SqliteBackend,
+}
+
+def create_backend(url=DB_URL):
+    """Backend for a URL such as sqlite:///raksha_database.db."""
+    scheme, sep, location = url.partition("://")
+    if not sep:
+        scheme, location = "sqlite", url
+    if scheme not in BACKENDS:
+        raise ValueError(f"Unknown database backend '{scheme}'")
+    if scheme == "sqlite" and location.startswith("/") and not location.startswith("//"):
+        # sqlite:///relative.db -> relative.db, sqlite:////abs.db -> /abs.db
+        location = location[1:]
+    return BACKENDS[scheme](location)
+
+# -------------------------------------------------
+# Storage layer
+# -------------------------------------------------
+class Storage:
+    """
+    Reads go straight to the backend. Writes are queued and committed in
+    groups: concurrent saves within `max_wait_ms` share one transaction.
+    The async methods run on `executor` (None = the loop's default).
+    """
+
+    def __init__(self, backend, max_batch=64, max_wait_ms=5.0, executor=None):
+        self.backend = backend
+        self.executor = executor
+        self._writer = MicroBatcher(backend.insert_users, max_batch_size=max_batch,
+                                    max_wait_ms=max_wait_ms, name="db-writer")
+        backend.init_schema()
+
+    def get_user(self, aadhaar_number):
+        return self.backend.get_user(aadhaar_number)
+
+    def save_user(self, row):
+        """Queues one row and returns a Future (True if inserted)."""
+        return self._writer.submit({c: row.get(c) for c in USER_COLUMNS})
+
+    async def aget_user(self, aadhaar_number):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.backend.get_user, aadhaar_number)
+
+    async def asave_user(self, row):
+        return await asyncio.wrap_future(self.save_user(row))
+
+    def stats(self):
+        return {"backend": type(self.backend).__name__, "writer": self._writer.stats()}
+
+    def close(self):
+        self._writer.close()
+        self.backend.close()
+
+
+# Defaults; app.py sets the executor via configure_storage()
+STORAGE_CONFIG = {
+    "url": DB_URL,
+    "executor": None,          # runs aget_user (None = the loop's default)
+    "max_batch": 64,
+    "max_wait_ms": 5.0,
+}
+
+_storage = None
+_storage_lock = threading.Lock()
+
+def configure_storage(**options):
+    """Sets storage options; call before the first database access."""
+    unknown = set(options) - set(STORAGE_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown storage options: {sorted(unknown)}")
+    STORAGE_CONFIG.update({k: v for k, v in options.items() if v is not None})
+    if _storage is not None:
+        _storage.executor = STORAGE_CONFIG["executor"]
+
+def get_storage():
+    """
+    The process-wide Storage, built on first use so importing this module
+    never opens (or switches to WAL) the database file.
+    """
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                cfg = STORAGE_CONFIG
+                _storage = Storage(create_backend(cfg["url"]), max_batch=cfg["max_batch"],
+                                   max_wait_ms=cfg["max_wait_ms"], executor=cfg["executor"])
+    return _storage
+
+# -------------------------------------------------
+# Module API
+# -------------------------------------------------
 def init_db():
     """Creates the table if it doesn't exist."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS verified_users (
-            aadhaar_number TEXT PRIMARY KEY,
-            name TEXT,
-            dob TEXT,
-            gender TEXT,
-            status TEXT,
-            confidence REAL
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    get_storage().backend.init_schema()
 
 def get_user_by_aadhaar(aadhaar_number):
     """Checks if Aadhaar exists in DB."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM verified_users WHERE aadhaar_number=?", (aadhaar_number,))
-    row = cursor.fetchone()
-    conn.close()
-    
-    if row:
-        return {
-            "aadhaar_number": row[0],
-            "name": row[1],
-            "dob": row[2],
-            "gender": row[3],
-            "status": row[4],
-            "confidence": row[5]
-        }
-    return None
+    return get_storage().get_user(aadhaar_number)
+
+def _log_saved(data, inserted):
+    if inserted:
+        logger.info("Saved %s to Database.", data["name"])
+    else:
+        logger.info("User already exists in Database. Skipping.")
+    return inserted
 
 def save_verified_user(data):
     """Saves a user ONLY if they are ACCEPTED and not already in DB."""
     if data.get("status") != "ACCEPTED":
-        return  # Don't save Fraud/Suspicious
-
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute('''
-            INSERT INTO verified_users (aadhaar_number, name, dob, gender, status, confidence)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
-            data['aadhaar_number'], 
-            data['name'], 
-            data['dob'], 
-            data['gender'], 
-            "ACCEPTED", 
-            data['confidence']
-        ))
-        conn.commit()
-        print(f"Saved {data['name']} to Database.")
-    except sqlite3.IntegrityError:
-        print("User already exists in Database. Skipping.")
-    
-    conn.close()
-
-# Initialize the DB immediately when this file is imported
-init_db()
\ No newline at end of file
+        return False  # Don't save Fraud/Suspicious
+    return _log_saved(data, get_storage().save_user(data).result())
+
+async def asave_verified_user(data):
+    """Awaitable save_verified_user; shares a commit with concurrent saves."""
+    if data.get("status") != "ACCEPTED":
+        return False
+    return _log_saved(data, await get_storage().asave_user(data))
+
+async def aget_user_by_aadhaar(aadhaar_number):
+    return await get_storage().aget_user(aadhaar_number)
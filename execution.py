@@ -0,0 +1,217 @@
+#execution.py
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack, asynccontextmanager
+
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from Pipelines.telemetry import QUEUE_WAIT_SECONDS
+
+
+class Overloaded(Exception):
+    """Raised when the admission queue is full."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Server busy, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request runs past its deadline."""
+
+
+# -------------------------------------------------
+# Execution layer
+# -------------------------------------------------
+class ExecutionLayer:
+    """
+    Keeps blocking work off the event loop.
+
+    - cpu_pool: OpenCV, PaddleOCR, TensorFlow pre/post-processing, forensics
+    - io_pool:  sqlite and file access
+    - admission: at most `max_in_flight` heavy requests run at once and at
+      most `max_queue` wait; anything beyond that is rejected immediately.
+    """
+
+    def __init__(self, cpu_workers=None, io_workers=8, max_in_flight=None,
+                 max_queue=32, default_deadline=60.0):
+        cpu_workers = cpu_workers or os.cpu_count() or 4
+        self.cpu_pool = ThreadPoolExecutor(max_workers=cpu_workers, thread_name_prefix="cpu")
+        self.io_pool = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="io")
+        self.max_in_flight = max_in_flight or cpu_workers
+        self.max_queue = max_queue
+        self.default_deadline = default_deadline
+
+        self._semaphore = None
+        self._in_flight = 0
+        self._waiting = 0
+        self._avg_service = 1.0
+        self._admitted = 0
+        self._rejected = 0
+        self._timed_out = 0
+
+    def _get_semaphore(self):
+        # Created lazily so it binds to the running loop of this process
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self._semaphore
+
+    def retry_after(self):
+        """Rough estimate (seconds) of when a slot will free up."""
+        backlog = (self._waiting + self._in_flight) / max(1, self.max_in_flight)
+        return max(1, int(round(backlog * self._avg_service)))
+
+    @asynccontextmanager
+    async def admit(self, deadline):
+        """Waits for a slot until `deadline` (monotonic time)."""
+        if self._waiting >= self.max_queue:
+            self._rejected += 1
+            raise Overloaded(self.retry_after())
+
+        semaphore = self._get_semaphore()
+        if not semaphore.locked():
+            # Free slot: take it without queueing
+            await semaphore.acquire()
+            QUEUE_WAIT_SECONDS.observe(0.0, queue="admission")
+        else:
+            self._waiting += 1
+            queued = time.monotonic()
+            try:
+                await asyncio.wait_for(semaphore.acquire(), max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded("Request deadline passed while queued")
+            finally:
+                self._waiting -= 1
+                QUEUE_WAIT_SECONDS.observe(time.monotonic() - queued, queue="admission")
+
+        self._in_flight += 1
+        self._admitted += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            semaphore.release()
+            # Exponential moving average of service time
+            self._avg_service = 0.8 * self._avg_service + 0.2 * (time.monotonic() - started)
+
+    async def run_cpu(self, func, *args, **kwargs):
+        """Runs CPU-heavy work; cancelling the caller cancels it if still queued."""
+        return await asyncio.wrap_future(self.cpu_pool.submit(func, *args, **kwargs))
+
+    async def run_io(self, func, *args, **kwargs):
+        """Runs blocking I/O (database, files) on the I/O pool."""
+        return await asyncio.wrap_future(self.io_pool.submit(func, *args, **kwargs))
+
+    def request_deadline(self, request):
+        """
+        Deadline for one request. Clients may shorten it with an
+        `X-Request-Timeout` header (seconds); it is never extended.
+        """
+        timeout = self.default_deadline
+        header = request.headers.get("x-request-timeout") if request is not None else None
+        if header:
+            try:
+                timeout = min(timeout, max(0.0, float(header)))
+            except ValueError:
+                pass
+        return time.monotonic() + timeout
+
+    def heavy(self, handler):
+        """
+        Decorator for CPU-heavy routes: admission control plus deadline.
+        The route must declare a `request: Request` parameter.
+        """
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            deadline = self.request_deadline(kwargs.get("request"))
+            try:
+                async with self.admit(deadline):
+                    remaining = max(0.0, deadline - time.monotonic())
+                    return await asyncio.wait_for(handler(*args, **kwargs), remaining)
+            except Overloaded as e:
+                return JSONResponse(
+                    content={"success": False, "message": "Server busy, please retry."},
+                    status_code=503, headers={"Retry-After": str(e.retry_after)}
+                )
+            except (DeadlineExceeded, asyncio.TimeoutError):
+                self._timed_out += 1
+                return JSONResponse(
+                    content={"success": False, "message": "Request deadline exceeded."},
+                    status_code=504
+                )
+        return wrapper
+
+    def heavy_stream(self, media_type, timeout_message=None):
+        """
+        Decorator for streaming heavy routes. The handler returns an async
+        generator (or a plain Response for errors); the admission slot is
+        held, and the deadline enforced, until the stream ends. On deadline
+        `timeout_message` is sent (if given) and the generator is closed.
+        """
+        def decorator(handler):
+            @functools.wraps(handler)
+            async def wrapper(*args, **kwargs):
+                deadline = self.request_deadline(kwargs.get("request"))
+                slot = AsyncExitStack()
+                try:
+                    await slot.enter_async_context(self.admit(deadline))
+                except Overloaded as e:
+                    return JSONResponse(
+                        content={"success": False, "message": "Server busy, please retry."},
+                        status_code=503, headers={"Retry-After": str(e.retry_after)}
+                    )
+                except DeadlineExceeded:
+                    self._timed_out += 1
+                    return JSONResponse(
+                        content={"success": False, "message": "Request deadline exceeded."},
+                        status_code=504
+                    )
+
+                try:
+                    events = await handler(*args, **kwargs)
+                except BaseException:
+                    await slot.aclose()
+                    raise
+                if isinstance(events, Response):
+                    await slot.aclose()
+                    return events
+
+                async def body():
+                    try:
+                        while True:
+                            remaining = max(0.0, deadline - time.monotonic())
+                            try:
+                                chunk = await asyncio.wait_for(events.__anext__(), remaining)
+                            except StopAsyncIteration:
+                                break
+                            except asyncio.TimeoutError:
+                                self._timed_out += 1
+                                if timeout_message is not None:
+                                    yield timeout_message
+                                break
+                            yield chunk
+                    finally:
+                        await events.aclose()
+                        await slot.aclose()
+
+                return StreamingResponse(body(), media_type=media_type)
+            return wrapper
+        return decorator
+
+    def stats(self):
+        return {
+            "cpu_workers": self.cpu_pool._max_workers,
+            "io_workers": self.io_pool._max_workers,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "admitted": self._admitted,
+            "rejected": self._rejected,
+            "deadline_exceeded": self._timed_out,
+            "avg_service_s": round(self._avg_service, 3),
+        }
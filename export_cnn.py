@@ -0,0 +1,172 @@
+#export_cnn.py
+"""
+Exports the Keras CNN to TFLite and compares the export with the .h5
+model on a set of card images.
+
+    python export_cnn.py --quantize int8 --calibration cards/ --eval eval_cards/ --report cnn_export.json
+
+--quantize: none (float32), float16, dynamic (int8 weights) or int8
+(weights and activations, calibrated on --calibration images). The
+calibration set is sampled evenly across the top-level class directories,
+in a random order fixed by --seed. Images are preprocessed exactly as the
+API does before the CNN sees them.
+
+The report gives, for both models, accuracy (when the eval images sit in
+aadhaar/ fake_aadhaar/ non_aadhaar/ sub-directories), top-1 agreement
+and score differences between them, single-image latency and file size.
+Serve the export with RAKSHA_CNN_BACKEND=tflite.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+from Pipelines.CNN_predict import (
+    CNN_MODEL_PATH, CNN_TFLITE_PATH, TRAIN_CLASS_NAMES, TFLiteModel, load_cnn_model, preprocess_single_image,
+)
+from Pipelines.bulk_scoring import walk_images
+from Pipelines.image_buffer import ImageBuffer
+from Pipelines.verification import preprocess_buffer
+
+
+def sample_paths(paths, limit, seed=0):
+    """
+    Up to `limit` paths, taken in turn from each top-level directory (class)
+    after shuffling each with `seed`, so every class is represented.
+    """
+    groups = {}
+    for rel_path in paths:
+        groups.setdefault(rel_path.replace("\\", "/").split("/")[0], []).append(rel_path)
+    rng = random.Random(seed)
+    for group in groups.values():
+        rng.shuffle(group)
+    sampled, rounds = [], max(map(len, groups.values()), default=0)
+    for i in range(rounds):
+        sampled.extend(group[i] for group in groups.values() if i < len(group))
+    return sampled[:limit]
+
+def load_tensors(images_dir, limit=None, seed=0):
+    """(relative path, (1, 224, 224, 3) float32 tensor) as the API builds them."""
+    paths = walk_images(images_dir)
+    if limit is not None:
+        paths = sample_paths(paths, limit, seed)
+    tensors = []
+    for rel_path in paths:
+        try:
+            raw = ImageBuffer.from_path(os.path.join(images_dir, rel_path))
+        except ValueError:
+            continue
+        tensors.append((rel_path, preprocess_single_image(preprocess_buffer(raw))))
+    return tensors
+
+def label_of(rel_path):
+    """The class named by the image's top-level directory, if any."""
+    top = rel_path.replace("\\", "/").split("/")[0]
+    return top if top in TRAIN_CLASS_NAMES else None
+
+def convert(keras_model, quantize, calibration):
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    if quantize == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantize == "dynamic":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    elif quantize == "int8":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = lambda: ([tensor] for _, tensor in calibration)
+        # Integer kernels throughout; float input / output keep the predict() contract
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    return converter.convert()
+
+def evaluate(model, tensors):
+    """Scores per image and single-image latencies (ms)."""
+    model.predict(tensors[0][1], verbose=0)  # warm-up
+    scores, latencies = [], []
+    for _, tensor in tensors:
+        t0 = time.perf_counter()
+        scores.append(np.asarray(model.predict(tensor, verbose=0))[0])
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return np.array(scores), latencies
+
+def summarize(name, path, scores, latencies, labels):
+    labelled = [i for i, label in enumerate(labels) if label is not None]
+    accuracy = None
+    if labelled:
+        hits = sum(TRAIN_CLASS_NAMES[int(np.argmax(scores[i]))] == labels[i] for i in labelled)
+        accuracy = round(hits / len(labelled), 4)
+    return {
+        "model": name,
+        "size_mb": round(os.path.getsize(path) / 1e6, 2),
+        "accuracy": accuracy,
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the CNN to TFLite and compare it with the .h5 model")
+    parser.add_argument("--keras-model", default=CNN_MODEL_PATH)
+    parser.add_argument("--output", default=CNN_TFLITE_PATH)
+    parser.add_argument("--quantize", choices=["none", "float16", "dynamic", "int8"], default="int8")
+    parser.add_argument("--calibration", default=None, help="Representative images for int8 calibration")
+    parser.add_argument("--calibration-count", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0, help="Seed for sampling the calibration images")
+    parser.add_argument("--eval", default=None, help="Images to compare on (default: the calibration images)")
+    parser.add_argument("--threads", type=int, default=None, help="TFLite interpreter threads")
+    parser.add_argument("--report", default=None, help="Write the comparison to this JSON file")
+    args = parser.parse_args(argv)
+
+    eval_dir = args.eval or args.calibration
+    if args.quantize == "int8" and not args.calibration:
+        sys.exit("--quantize int8 needs --calibration images")
+    if not eval_dir:
+        sys.exit("Pass --eval (or --calibration) images for the comparison report")
+
+    keras_model = load_cnn_model(args.keras_model, backend="keras")
+    calibration = load_tensors(args.calibration, args.calibration_count, args.seed) if args.calibration else []
+    print(f"[export] converting {args.keras_model} ({args.quantize}, {len(calibration)} calibration images)")
+    with open(args.output, "wb") as f:
+        f.write(convert(keras_model, args.quantize, calibration))
+    print(f"[export] wrote {args.output}")
+
+    tensors = load_tensors(eval_dir)
+    if not tensors:
+        sys.exit(f"No readable images in {eval_dir}")
+    labels = [label_of(rel_path) for rel_path, _ in tensors]
+    keras_scores, keras_ms = evaluate(keras_model, tensors)
+    tflite_scores, tflite_ms = evaluate(TFLiteModel(args.output, args.threads), tensors)
+
+    agreement = float(np.mean(keras_scores.argmax(axis=1) == tflite_scores.argmax(axis=1)))
+    diff = np.abs(keras_scores - tflite_scores)
+    rows = [summarize("keras", args.keras_model, keras_scores, keras_ms, labels),
+            summarize(f"tflite-{args.quantize}", args.output, tflite_scores, tflite_ms, labels)]
+    report = {
+        "quantize": args.quantize,
+        "images": len(tensors),
+        "labelled": sum(label is not None for label in labels),
+        "models": rows,
+        "top1_agreement": round(agreement, 4),
+        "max_abs_score_diff": round(float(diff.max()), 4),
+        "mean_abs_score_diff": round(float(diff.mean()), 4),
+        "disagreements": [rel_path for (rel_path, _), k, t in
+                          zip(tensors, keras_scores.argmax(axis=1), tflite_scores.argmax(axis=1)) if k != t],
+    }
+
+    print(f"{'model':<16}{'size_mb':>9}{'accuracy':>10}{'p50_ms':>9}{'p95_ms':>9}")
+    for row in rows:
+        accuracy = "-" if row["accuracy"] is None else f"{row['accuracy']:.2%}"
+        print(f"{row['model']:<16}{row['size_mb']:>9}{accuracy:>10}{row['p50_ms']:>9}{row['p95_ms']:>9}")
+    print(f"[export] top-1 agreement {agreement:.2%} on {len(tensors)} images, "
+          f"max score difference {report['max_abs_score_diff']}")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[export] report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+#prefork.py
+"""
+Pre-fork server for multi-core deployments (Linux only).
+
+The supervisor imports app.py and loads every fork-safe model once, so the
+RandomForest and (with RAKSHA_CNN_BACKEND=tflite) CNN weights exist a single
+time. Workers are then forked from it and share those read-only pages
+copy-on-write. A Keras CNN is loaded by each worker, because TensorFlow's
+runtime does not survive fork; so is PaddleOCR, whose inference threads
+have not been verified after fork. The supervisor restarts workers that
+exit, and kills and replaces workers whose event loop stops heart-beating.
+
+    python prefork.py --workers 4 --host 0.0.0.0 --port 8000
+
+Send SIGUSR1 to the supervisor to print a per-worker memory report.
+"""
+import argparse
+import asyncio
+import gc
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+
+HEARTBEAT_INTERVAL = 1.0
+logger = logging.getLogger("prefork")
+
+# -------------------------------------------------
+# Memory measurement
+# -------------------------------------------------
+def read_memory(pid):
+    """
+    Memory of one process in kB, from /proc/<pid>/smaps_rollup.
+    rss     - resident pages (shared pages counted in full)
+    pss     - proportional share (shared pages divided by sharers)
+    shared  - pages also mapped by other processes (e.g. model weights)
+    private - pages only this process owns (the real per-worker cost)
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1])
+    except OSError:
+        return None
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+        "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+def format_memory_report(rows):
+    lines = [f"{'process':<14}{'pid':>8}{'rss MB':>10}{'pss MB':>10}{'shared MB':>11}{'private MB':>12}"]
+    for name, pid, mem in rows:
+        if mem is None:
+            lines.append(f"{name:<14}{pid:>8}{'n/a':>10}")
+            continue
+        lines.append(f"{name:<14}{pid:>8}{mem['rss'] / 1024:>10.1f}{mem['pss'] / 1024:>10.1f}"
+                     f"{mem['shared'] / 1024:>11.1f}{mem['private'] / 1024:>12.1f}")
+    total_pss = sum(mem["pss"] for _, _, mem in rows if mem)
+    lines.append(f"total PSS: {total_pss / 1024:.1f} MB")
+    return "\n".join(lines)
+
+# -------------------------------------------------
+# Worker
+# -------------------------------------------------
+def run_worker(app, sock, slot, heartbeats, log_level):
+    import uvicorn
+
+    config = uvicorn.Config(app, log_level=log_level, access_log=False)
+    server = uvicorn.Server(config)
+
+    async def heartbeat():
+        # Written from the event loop, so a blocked loop stops the heartbeat
+        while True:
+            heartbeats[slot] = time.time()
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+    async def main():
+        task = asyncio.create_task(heartbeat())
+        try:
+            await server.serve(sockets=[sock])
+        finally:
+            task.cancel()
+
+    asyncio.run(main())
+
+# -------------------------------------------------
+# Supervisor
+# -------------------------------------------------
+class Supervisor:
+    def __init__(self, app_loader, sock, workers=2, heartbeat_timeout=30.0,
+                 startup_grace=120.0, log_level="info"):
+        self.app_loader = app_loader
+        self.sock = sock
+        self.workers = workers
+        self.heartbeat_timeout = heartbeat_timeout
+        self.startup_grace = startup_grace
+        self.log_level = log_level
+
+        # Shared memory survives fork; one timestamp per worker slot
+        self.heartbeats = multiprocessing.RawArray("d", workers)
+        self.pids = {}
+        self.restarts = [0] * workers
+        self._stopping = False
+        self._report_requested = False
+
+    def log(self, msg):
+        logger.info(msg)
+
+    def spawn(self, slot):
+        # Startup (imports, warm-up) is covered by the grace period
+        self.heartbeats[slot] = time.time() + self.startup_grace
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                run_worker(self.app_loader(), self.sock, slot, self.heartbeats, self.log_level)
+            except BaseException:
+                logger.exception("worker %d failed", slot)
+                code = 1
+            finally:
+                # os._exit skips atexit; write out queued logs and spans first
+                telemetry = sys.modules.get("Pipelines.telemetry")
+                if telemetry is not None:
+                    telemetry.flush_telemetry()
+                os._exit(code)
+        self.pids[slot] = pid
+        self.log(f"worker {slot} started (pid {pid})")
+
+    def reap(self):
+        while self.pids:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            slot = next((s for s, p in self.pids.items() if p == pid), None)
+            if slot is None:
+                continue
+            del self.pids[slot]
+            if self._stopping:
+                continue
+            self.restarts[slot] += 1
+            self.log(f"worker {slot} (pid {pid}) exited with status {status}; restarting")
+            # Back off a little when a slot keeps crashing
+            time.sleep(min(5.0, 0.5 * self.restarts[slot]))
+            self.spawn(slot)
+
+    def check_health(self):
+        now = time.time()
+        for slot, pid in list(self.pids.items()):
+            if now - self.heartbeats[slot] > self.heartbeat_timeout:
+                self.log(f"worker {slot} (pid {pid}) missed heartbeats; killing")
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    def memory_report(self):
+        rows = [("supervisor", os.getpid(), read_memory(os.getpid()))]
+        for slot, pid in sorted(self.pids.items()):
+            rows.append((f"worker {slot}", pid, read_memory(pid)))
+        return format_memory_report(rows)
+
+    def stop(self, *_):
+        self._stopping = True
+
+    def request_report(self, *_):
+        self._report_requested = True
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGUSR1, self.request_report)
+
+        for slot in range(self.workers):
+            self.spawn(slot)
+
+        while not self._stopping:
+            time.sleep(0.5)
+            self.reap()
+            self.check_health()
+            if self._report_requested:
+                self._report_requested = False
+                self.log("memory report\n" + self.memory_report())
+
+        self.shutdown()
+
+    def shutdown(self, timeout=15.0):
+        self.log("shutting down workers")
+        for pid in self.pids.values():
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.time() + timeout
+        while self.pids and time.time() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in self.pids.values():
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+
+def bind_socket(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="RakshaUID pre-fork server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--heartbeat-timeout", type=float, default=30.0)
+    parser.add_argument("--no-preload", action="store_true",
+                        help="Import the app (and models) in each worker instead of once in the supervisor")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    if not hasattr(os, "fork"):
+        sys.exit("prefork.py needs os.fork (Linux/macOS); use run_api.py instead.")
+
+    sock = bind_socket(args.host, args.port)
+
+    if args.no_preload:
+        # Workers import app.py (which configures logging) themselves
+        from Pipelines.telemetry import configure_logging
+        configure_logging(os.getenv("RAKSHA_LOG_LEVEL", "INFO"),
+                          json_format=os.getenv("RAKSHA_LOG_FORMAT", "text") == "json")
+        def app_loader():
+            import app
+            return app.app
+    else:
+        import app
+        # Load (but do not run) every fork-safe model before forking
+        app.models.load_all(fork_safe_only=True)
+        # Keep the garbage collector from touching (and un-sharing) the
+        # pages holding every object created during model loading.
+        gc.collect()
+        gc.freeze()
+        app_loader = lambda: app.app
+
+    Supervisor(app_loader, sock, workers=args.workers,
+               heartbeat_timeout=args.heartbeat_timeout,
+               log_level=args.log_level).run()
+
+
+if __name__ == "__main__":
+    main()
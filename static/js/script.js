@@ -3,6 +3,7 @@ let currentStep = 1;
 let cardFile = null;
 let qrFile = null;
 let savedAadhaarFilename = null; 
+let verificationToken = null;
 let cameraStream = null;
 
 document.addEventListener('DOMContentLoaded', () => {
@@ -204,6 +205,7 @@ async function executeStep1() {
 
         if (data.is_aadhaar) {
             savedAadhaarFilename = data.aadhaar_path; 
+            verificationToken = data.verification_token;
             displayIntermediateData(data);
             showToast("Aadhaar Detected! Proceeding to Face Verification.", "success");
             prepareStep2_Face(); 
@@ -289,6 +291,7 @@ async function uploadFaceForVerification(file) {
     const formData = new FormData();
     formData.append("person_image", file);
     formData.append("aadhaar_filename", savedAadhaarFilename);
+    if (verificationToken) formData.append("verification_token", verificationToken);
 
     try {
         const response = await fetch('/api/verify-face', { method: 'POST', body: formData });
@@ -345,10 +348,12 @@ async function executeStep3() {
     const formData = new FormData();
     formData.append("file", cardFile);    
     formData.append("qr_file", qrFile);   
+    if (verificationToken) formData.append("verification_token", verificationToken);
 
     try {
-        const response = await fetch('/api/verify-full', { method: 'POST', body: formData });
-        const data = await response.json();
+        // Stage results arrive as Server-Sent Events while the audit runs
+        const response = await fetch('/api/verify-full/stream', { method: 'POST', body: formData });
+        const data = await readVerificationStream(response);
         displayFinalVerdict(data);
     } catch (error) {
         console.error(error);
@@ -357,6 +362,62 @@ async function executeStep3() {
     }
 }
 
+const STAGE_LABELS = {
+    cnn: "Document classified",
+    extract_fields: "OCR fields extracted",
+    qr: "QR code checked",
+    forensics: "Image forensics done",
+    rule_validation: "Rules validated",
+    consistency: "QR / OCR cross-checked",
+    assess_fraud: "Fraud rules evaluated",
+    predict_fraud: "ML fraud score ready",
+    final_decision: "Final decision reached"
+};
+
+async function readVerificationStream(response) {
+    const type = response.headers.get('content-type') || '';
+    if (!type.startsWith('text/event-stream')) {
+        const body = await response.json();
+        throw new Error(body.message || `HTTP ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let result = null;
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) >= 0) {
+            const raw = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            let data = '';
+            raw.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            });
+            const payload = JSON.parse(data);
+
+            if (event === 'stage') {
+                document.getElementById('loader-subtext').innerText = STAGE_LABELS[payload.stage] || payload.stage;
+            } else if (event === 'result') {
+                result = payload;
+            } else if (event === 'error') {
+                throw new Error(payload.message);
+            }
+        }
+    }
+
+    if (!result) throw new Error("Verification stream ended early.");
+    return result;
+}
+
 // =========================================================
 // HELPER UTILS
 // =========================================================